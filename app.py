@@ -6,19 +6,55 @@ from routes.egresos_routes import egresos_bp
 from routes.reservas_routes import reservas_bp
 from routes.clientes import clientes_bp
 from routes.facturas_routes import facturas_bp
+from routes.admin_routes import admin_bp
+from routes.metricas_routes import metricas_bp
+from routes.salud_routes import salud_bp
+from services import admision, calentamiento, cola_facturas, estaticos, metricas, perfilador, plantillas
 import config
 
-app = Flask(__name__)
-app.secret_key = config.SECRET_KEY
 
-# Registrar blueprints
-app.register_blueprint(auth_bp)
-app.register_blueprint(usuarios_bp)
-app.register_blueprint(dashboard_bp)
-app.register_blueprint(egresos_bp)
-app.register_blueprint(reservas_bp)
-app.register_blueprint(clientes_bp)
-app.register_blueprint(facturas_bp)
+def create_app():
+    app = Flask(__name__)
+    app.secret_key = config.SECRET_KEY
+
+    # Bytecode Jinja en disco y {% cache %} para las filas de los listados
+    plantillas.init_app(app)
+
+    # Registrar blueprints
+    app.register_blueprint(auth_bp)
+    app.register_blueprint(usuarios_bp)
+    app.register_blueprint(dashboard_bp)
+    app.register_blueprint(egresos_bp)
+    app.register_blueprint(reservas_bp)
+    app.register_blueprint(clientes_bp)
+    app.register_blueprint(facturas_bp)
+    app.register_blueprint(admin_bp)
+    app.register_blueprint(metricas_bp)
+    app.register_blueprint(salud_bp)
+
+    # Latencias por endpoint, backend y plantilla
+    metricas.init_app(app)
+
+    # Perfil por muestreo de pila: X-Perfilar: 1 / ?perfilar=1 o 1 de cada PERFILADOR_MUESTREO
+    perfilador.init_app(app)
+
+    # 503 / aviso cuando una ruta del backend está saturada
+    admision.init_app(app)
+
+    # static/ con huellas de contenido, gzip precalculado y Cache-Control: immutable
+    estaticos.init_app(app)
+
+    # Sin red ni hilos: seguro antes del fork (gunicorn --preload). Conexiones
+    # y cachés se calientan en cada worker (gunicorn.conf.py).
+    calentamiento.precompilar_plantillas(app)
+
+    return app
+
+
+# gunicorn app:app / app:create_app()
+app = create_app()
 
 if __name__ == "__main__":
+    # Sin gunicorn.conf.py: la cola de facturas retoma sus trabajos al arrancar
+    cola_facturas.iniciar_workers()
     app.run(debug=True, port=5000)
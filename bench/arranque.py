@@ -0,0 +1,119 @@
+"""Latencia de la primera petición de un worker recién arrancado contra la estable.
+
+Levanta bench/stub_backend.py y la app bajo gunicorn (un worker) dos veces:
+sin calentamiento (-c con un archivo vacío, ignora gunicorn.conf.py) y con él. En cada
+arranque espera /readyz (o /healthz sin calentamiento), inicia sesión y mide
+la primera visita a cada ruta y la mediana de las siguientes:
+
+    python bench/arranque.py --latencia 0.02 --salida bench/resultados/arranque.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import requests
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(RAIZ, "bench"))
+
+from carga import esperar_http  # noqa: E402
+
+RUTAS = ["/dashboard", "/clientes/", "/reservas/", "/facturas", "/facturas/nueva", "/egresos"]
+
+
+def esperar_listo(url, segundos=60):
+    limite = time.monotonic() + segundos
+    while time.monotonic() < limite:
+        try:
+            if requests.get(url, timeout=1).status_code == 200:
+                return True
+        except requests.RequestException:
+            pass
+        time.sleep(0.1)
+    return False
+
+
+def medir(base, repeticiones):
+    sesion = requests.Session()
+    try:
+        sesion.post(f"{base}/login", data={"username": "bench", "password": "bench"}, allow_redirects=False)
+        resultados = {}
+        for ruta in RUTAS:
+            tiempos = []
+            for _ in range(repeticiones + 1):
+                inicio = time.perf_counter()
+                sesion.get(f"{base}{ruta}").content
+                tiempos.append((time.perf_counter() - inicio) * 1000)
+            resultados[ruta] = {
+                "primera_ms": round(tiempos[0], 1),
+                "estable_ms": round(statistics.median(tiempos[1:]), 1),
+            }
+        return resultados
+    finally:
+        sesion.close()   # gunicorn espera las conexiones keep-alive antes de salir
+
+
+def arrancar(args, calentar, env):
+    comando = [
+        sys.executable, "-m", "gunicorn", "app:app", "-w", "1", "--threads", "4",
+        "-b", f"127.0.0.1:{args.puerto_app}", "--log-level", "warning", "--preload",
+    ]
+    vacio = None
+    if not calentar:
+        vacio = tempfile.NamedTemporaryFile(suffix=".py")
+        comando[3:3] = ["-c", vacio.name]
+    app = subprocess.Popen(comando, cwd=RAIZ, env=env)
+    base = f"http://127.0.0.1:{args.puerto_app}"
+    try:
+        if not esperar_listo(f"{base}/readyz" if calentar else f"{base}/healthz"):
+            sys.exit("❌ No arrancó gunicorn")
+        return medir(base, args.repeticiones)
+    finally:
+        app.terminate()
+        app.wait(10)
+        if vacio is not None:
+            vacio.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latencia", type=float, default=0.02, help="segundos de latencia del stub")
+    parser.add_argument("--repeticiones", type=int, default=10)
+    parser.add_argument("--puerto-app", type=int, default=5057)
+    parser.add_argument("--puerto-stub", type=int, default=3057)
+    parser.add_argument("--salida", help="archivo JSON con los resultados")
+    args = parser.parse_args()
+
+    api = f"http://127.0.0.1:{args.puerto_stub}/api"
+    env = dict(os.environ, API_URL=api, API_URLS=api, PYTHONUNBUFFERED="1")
+    stub = subprocess.Popen(
+        [sys.executable, os.path.join(RAIZ, "bench", "stub_backend.py"),
+         "--puertos", str(args.puerto_stub), "--latencia", str(args.latencia)],
+        cwd=RAIZ, env=env, stdout=subprocess.DEVNULL,
+    )
+    try:
+        if not esperar_http(f"{api}/health", 60):
+            sys.exit("❌ No arrancó el stub")
+        resultados = {}
+        for nombre, calentar in (("frio", False), ("calentado", True)):
+            resultados[nombre] = arrancar(args, calentar, env)
+            print(f"--- {nombre}")
+            for ruta, fila in resultados[nombre].items():
+                print(f"{ruta:<16} primera {fila['primera_ms']:>8.1f} ms   estable {fila['estable_ms']:>8.1f} ms")
+
+        if args.salida:
+            os.makedirs(os.path.dirname(os.path.abspath(args.salida)), exist_ok=True)
+            with open(args.salida, "w", encoding="utf-8") as f:
+                json.dump({"parametros": vars(args), "resultados": resultados}, f, indent=2, ensure_ascii=False)
+    finally:
+        stub.terminate()
+        stub.wait(10)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+"""Prueba de carga reproducible del frontend contra el backend simulado.
+
+Levanta bench/stub_backend.py y la app bajo gunicorn (N workers x T hilos),
+inicia sesión con cada usuario virtual y recorre las rutas de cada blueprint
+durante un tiempo fijo. Guarda p50/p95/p99, peticiones/s y RSS por worker en
+JSON para comparar entre commits:
+
+    python bench/carga.py --workers 2 --threads 4 --usuarios 16 --duracion 30 \\
+        --latencia 0.02 --salida bench/resultados/$(git rev-parse --short HEAD).json
+
+Con --replicas 3 el stub escucha en tres puertos seguidos y la app reparte
+entre ellos (API_URLS).
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+import requests
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+RUTAS = [
+    "/dashboard",
+    "/clientes/",
+    "/reservas/",
+    "/reservas/clientes?identificacion=100",
+    "/facturas",
+    "/facturas/1",
+    "/facturas/nueva",
+    "/facturas/buscar_productos",
+    "/facturas/buscar_medios",
+    "/facturas/buscar_cliente?identificacion=10000037",
+    "/egresos",
+    "/egresos/1",
+    "/usuarios",
+]
+
+
+def percentil(valores, p):
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    k = (len(ordenados) - 1) * p / 100
+    i = int(k)
+    j = min(i + 1, len(ordenados) - 1)
+    return ordenados[i] + (ordenados[j] - ordenados[i]) * (k - i)
+
+
+def resumen(latencias, errores, segundos):
+    return {
+        "peticiones": len(latencias),
+        "errores": errores,
+        "rps": round(len(latencias) / segundos, 2) if segundos else None,
+        "p50_ms": _ms(percentil(latencias, 50)),
+        "p95_ms": _ms(percentil(latencias, 95)),
+        "p99_ms": _ms(percentil(latencias, 99)),
+        "max_ms": _ms(max(latencias) if latencias else None),
+    }
+
+
+def _ms(valor):
+    return None if valor is None else round(valor * 1000, 2)
+
+
+def rss_kb(pid):
+    """(VmRSS, VmHWM) en KB leídos de /proc (solo Linux)."""
+    valores = {}
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for linea in f:
+                if linea.startswith(("VmRSS:", "VmHWM:")):
+                    clave, valor = linea.split(":", 1)
+                    valores[clave] = int(valor.split()[0])
+    except OSError:
+        pass
+    return valores.get("VmRSS"), valores.get("VmHWM")
+
+
+def hijos(pid):
+    try:
+        salida = subprocess.run(["pgrep", "-P", str(pid)], capture_output=True, text=True).stdout
+        return [int(p) for p in salida.split()]
+    except FileNotFoundError:
+        return []
+
+
+def esperar_http(url, segundos=20):
+    limite = time.monotonic() + segundos
+    while time.monotonic() < limite:
+        try:
+            requests.get(url, timeout=1, allow_redirects=False)
+            return True
+        except requests.RequestException:
+            time.sleep(0.2)
+    return False
+
+
+def usuario_virtual(base, rutas, hasta, resultados, lock, numero):
+    sesion = requests.Session()
+    sesion.post(f"{base}/login", data={"username": f"bench{numero}", "password": "bench"}, allow_redirects=False)
+    locales = {ruta: {"latencias": [], "errores": 0} for ruta in rutas}
+    i = numero
+    while time.monotonic() < hasta:
+        ruta = rutas[i % len(rutas)]
+        i += 1
+        inicio = time.perf_counter()
+        try:
+            r = sesion.get(f"{base}{ruta}", allow_redirects=False, timeout=30)
+            r.content
+            ok = r.status_code < 400
+        except requests.RequestException:
+            ok = False
+        locales[ruta]["latencias"].append(time.perf_counter() - inicio)
+        if not ok:
+            locales[ruta]["errores"] += 1
+    with lock:
+        for ruta, local in locales.items():
+            acumulado = resultados.setdefault(ruta, {"latencias": [], "errores": 0})
+            acumulado["latencias"].extend(local["latencias"])
+            acumulado["errores"] += local["errores"]
+
+
+def commit_actual():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ,
+                              capture_output=True, text=True).stdout.strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--usuarios", type=int, default=8, help="usuarios virtuales concurrentes")
+    parser.add_argument("--duracion", type=float, default=20, help="segundos de medición")
+    parser.add_argument("--calentamiento", type=float, default=3, help="segundos antes de medir")
+    parser.add_argument("--latencia", type=float, default=0.01, help="latencia del stub en segundos")
+    parser.add_argument("--clientes", type=int, default=500)
+    parser.add_argument("--reservas", type=int, default=2000)
+    parser.add_argument("--facturas", type=int, default=2000)
+    parser.add_argument("--egresos", type=int, default=1000)
+    parser.add_argument("--paginar", action="store_true", help="el stub respeta limit/offset")
+    parser.add_argument("--puerto-app", type=int, default=5055)
+    parser.add_argument("--puerto-stub", type=int, default=3055)
+    parser.add_argument("--replicas", type=int, default=1,
+                        help="réplicas del stub en puertos consecutivos, balanceadas por la app (API_URLS)")
+    parser.add_argument("--rutas", help="lista separada por comas (por defecto todas)")
+    parser.add_argument("--salida", default="bench_resultado.json")
+    args = parser.parse_args()
+
+    rutas = args.rutas.split(",") if args.rutas else RUTAS
+    puertos = [args.puerto_stub + i for i in range(max(1, args.replicas))]
+    env = dict(
+        os.environ,
+        API_URL=f"http://127.0.0.1:{args.puerto_stub}/api",
+        API_URLS=",".join(f"http://127.0.0.1:{p}/api" for p in puertos),
+        PYTHONUNBUFFERED="1",
+    )
+
+    comando_stub = [
+        sys.executable, os.path.join(RAIZ, "bench", "stub_backend.py"),
+        "--puertos", ",".join(map(str, puertos)), "--latencia", str(args.latencia),
+        "--clientes", str(args.clientes), "--reservas", str(args.reservas),
+        "--facturas", str(args.facturas), "--egresos", str(args.egresos),
+    ]
+    if args.paginar:
+        comando_stub.append("--paginar")
+    comando_app = [
+        sys.executable, "-m", "gunicorn", "app:app",
+        "-w", str(args.workers), "--threads", str(args.threads),
+        "-b", f"127.0.0.1:{args.puerto_app}", "--log-level", "warning",
+    ]
+
+    stub = subprocess.Popen(comando_stub, cwd=RAIZ, env=env, stdout=subprocess.DEVNULL)
+    app = subprocess.Popen(comando_app, cwd=RAIZ, env=env)
+    base = f"http://127.0.0.1:{args.puerto_app}"
+    try:
+        if not esperar_http(f"http://127.0.0.1:{args.puerto_stub}/api/health") or not esperar_http(f"{base}/login"):
+            sys.exit("❌ No arrancó el stub o gunicorn")
+
+        # Calentamiento: mismas rutas, resultados descartados
+        descartados = {}
+        hilos = [threading.Thread(target=usuario_virtual,
+                                  args=(base, rutas, time.monotonic() + args.calentamiento, descartados, threading.Lock(), n))
+                 for n in range(args.usuarios)]
+        for h in hilos:
+            h.start()
+        for h in hilos:
+            h.join()
+
+        resultados, lock = {}, threading.Lock()
+        inicio = time.monotonic()
+        hasta = inicio + args.duracion
+        hilos = [threading.Thread(target=usuario_virtual, args=(base, rutas, hasta, resultados, lock, n))
+                 for n in range(args.usuarios)]
+        for h in hilos:
+            h.start()
+        for h in hilos:
+            h.join()
+        segundos = time.monotonic() - inicio
+
+        workers = {}
+        for pid in hijos(app.pid):
+            rss, pico = rss_kb(pid)
+            workers[str(pid)] = {"rss_kb": rss, "pico_rss_kb": pico}
+    finally:
+        app.terminate()
+        stub.terminate()
+        app.wait(10)
+        stub.wait(10)
+
+    todas = [lat for r in resultados.values() for lat in r["latencias"]]
+    errores = sum(r["errores"] for r in resultados.values())
+    salida = {
+        "commit": commit_actual(),
+        "fecha": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "parametros": vars(args),
+        "total": resumen(todas, errores, segundos),
+        "rutas": {ruta: resumen(r["latencias"], r["errores"], segundos) for ruta, r in sorted(resultados.items())},
+        "workers": workers,
+    }
+
+    with open(args.salida, "w") as f:
+        json.dump(salida, f, indent=2, ensure_ascii=False)
+
+    total = salida["total"]
+    print(f"✅ {total['peticiones']} peticiones, {total['rps']} req/s, "
+          f"p50 {total['p50_ms']} ms, p95 {total['p95_ms']} ms, p99 {total['p99_ms']} ms, "
+          f"errores {total['errores']} -> {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
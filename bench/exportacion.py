@@ -0,0 +1,125 @@
+"""Throughput y memoria de la exportación CSV/XLSX en streaming.
+
+Levanta bench/stub_backend.py con N facturas y egresos y la app bajo gunicorn
+(un worker), descarga /facturas/exportar y /egresos/exportar en cada formato
+y mide filas/s, MB/s y el RSS del worker antes y durante la descarga:
+
+    python bench/exportacion.py --filas 100000 --salida bench/resultados/exportacion.json
+
+Con --paginar el stub respeta limit/offset; sin él devuelve la colección
+completa en una sola respuesta (la app igual la lee por partes).
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import requests
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(RAIZ, "bench"))
+
+from carga import esperar_http, hijos, rss_kb  # noqa: E402
+
+RUTAS = ("/facturas/exportar", "/egresos/exportar")
+FORMATOS = ("csv", "xlsx")
+
+
+def medir(sesion, url, pid):
+    """Descarga `url` en streaming mientras otro hilo mira el RSS del worker."""
+    pico = {"rss": rss_kb(pid)[0] or 0}
+    terminado = threading.Event()
+
+    def vigilar():
+        while not terminado.wait(0.05):
+            pico["rss"] = max(pico["rss"], rss_kb(pid)[0] or 0)
+
+    antes = rss_kb(pid)[0]
+    vigia = threading.Thread(target=vigilar, daemon=True)
+    vigia.start()
+    inicio = time.perf_counter()
+    primer_byte = None
+    tamano = lineas = 0
+    with sesion.get(url, stream=True, timeout=600) as r:
+        r.raise_for_status()
+        for bloque in r.iter_content(chunk_size=65536):
+            if primer_byte is None:
+                primer_byte = time.perf_counter() - inicio
+            tamano += len(bloque)
+            lineas += bloque.count(b"\n")
+    segundos = time.perf_counter() - inicio
+    terminado.set()
+    vigia.join()
+    return {
+        "segundos": round(segundos, 3),
+        "primer_byte_ms": round((primer_byte or 0) * 1000, 1),
+        "bytes": tamano,
+        "lineas_csv": lineas,
+        "mb_s": round(tamano / segundos / 1e6, 2),
+        "rss_antes_kb": antes,
+        "rss_pico_kb": pico["rss"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filas", type=int, default=100000, help="facturas y egresos en el stub")
+    parser.add_argument("--paginar", action="store_true", help="el stub respeta limit/offset")
+    parser.add_argument("--puerto-app", type=int, default=5056)
+    parser.add_argument("--puerto-stub", type=int, default=3056)
+    parser.add_argument("--salida", help="archivo JSON con los resultados")
+    args = parser.parse_args()
+
+    env = dict(os.environ, API_URL=f"http://127.0.0.1:{args.puerto_stub}/api",
+               API_URLS=f"http://127.0.0.1:{args.puerto_stub}/api", PYTHONUNBUFFERED="1")
+    comando_stub = [
+        sys.executable, os.path.join(RAIZ, "bench", "stub_backend.py"),
+        "--puertos", str(args.puerto_stub), "--clientes", "100", "--reservas", "100",
+        "--facturas", str(args.filas), "--egresos", str(args.filas),
+    ]
+    if args.paginar:
+        comando_stub.append("--paginar")
+    comando_app = [
+        sys.executable, "-m", "gunicorn", "app:app", "-w", "1", "--threads", "2",
+        "-b", f"127.0.0.1:{args.puerto_app}", "--log-level", "warning", "--timeout", "600",
+    ]
+
+    stub = subprocess.Popen(comando_stub, cwd=RAIZ, env=env, stdout=subprocess.DEVNULL)
+    app = subprocess.Popen(comando_app, cwd=RAIZ, env=env)
+    base = f"http://127.0.0.1:{args.puerto_app}"
+    sesion = requests.Session()
+    try:
+        if not esperar_http(f"http://127.0.0.1:{args.puerto_stub}/api/health", 120) \
+                or not esperar_http(f"{base}/login"):
+            sys.exit("❌ No arrancó el stub o gunicorn")
+        worker = hijos(app.pid)[0]
+        sesion.post(f"{base}/login", data={"username": "bench", "password": "bench"}, allow_redirects=False)
+
+        resultados = []
+        for ruta in RUTAS:
+            for formato in FORMATOS:
+                fila = {"ruta": ruta, "formato": formato, **medir(sesion, f"{base}{ruta}?formato={formato}", worker)}
+                if formato == "csv":
+                    fila["filas_s"] = round((fila["lineas_csv"] - 1) / fila["segundos"])
+                resultados.append(fila)
+                print(f"{ruta:<20} {formato:<5} {fila['segundos']:>7.2f} s  {fila['mb_s']:>6.2f} MB/s  "
+                      f"primer byte {fila['primer_byte_ms']:>7.1f} ms  "
+                      f"RSS {fila['rss_antes_kb'] / 1024:.0f} -> {fila['rss_pico_kb'] / 1024:.0f} MB")
+
+        if args.salida:
+            os.makedirs(os.path.dirname(os.path.abspath(args.salida)), exist_ok=True)
+            with open(args.salida, "w", encoding="utf-8") as f:
+                json.dump({"parametros": vars(args), "resultados": resultados}, f, indent=2, ensure_ascii=False)
+    finally:
+        sesion.close()   # gunicorn espera las conexiones keep-alive antes de salir
+        app.terminate()
+        stub.terminate()
+        app.wait(10)
+        stub.wait(10)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""Micro-benchmark del decodificador de formularios de factura.
+
+Compara el parseo anterior de crear_factura (dos recorridos de request.form
+con replace/split por clave y float()) con services/formularios.py sobre
+facturas de 10, 100 y 1000 líneas (más un pago por cada 10 líneas):
+
+    python bench/formularios.py --repeticiones 200 --salida bench/resultados/formularios.json
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+from decimal import Decimal
+
+from werkzeug.datastructures import ImmutableMultiDict
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from routes.facturas_routes import FORMULARIO_FACTURA  # noqa: E402
+from services import formularios  # noqa: E402
+
+TAMANOS = (10, 100, 1000)
+
+
+def formulario(lineas):
+    campos = [("idcliente", "1"), ("observaciones", "Factura de prueba"), ("idreserva", "")]
+    for i in range(lineas):
+        campos += [
+            (f"detalles[{i}][idproducto]", str(i % 7 + 1)),
+            (f"detalles[{i}][cantidad]", str(i % 3 + 1)),
+            (f"detalles[{i}][valorunitario]", f"{1000 + i}.50"),
+        ]
+    for i in range(max(1, lineas // 10)):
+        campos += [
+            (f"pagos[{i}][idmedio]", "1"),
+            (f"pagos[{i}][valor]", "100.00"),
+            (f"pagos[{i}][due_date]", "2026-10-18"),
+        ]
+    return ImmutableMultiDict(campos)
+
+
+def anterior(form):
+    """Copia del parseo que tenía crear_factura antes de services/formularios.py."""
+    data = {"idcliente": form.get("idcliente"), "observaciones": form.get("observaciones"),
+            "detalles": [], "pagos": []}
+
+    detalles_temp = {}
+    for key, value in form.items():
+        if key.startswith("detalles["):
+            parts = key.replace("detalles[", "").replace("]", "").split("[")
+            index, field = int(parts[0]), parts[1]
+            if index not in detalles_temp:
+                detalles_temp[index] = {}
+            detalles_temp[index][field] = value
+
+    for d in detalles_temp.values():
+        cantidad = float(d.get("cantidad", 0))
+        valorunitario = float(d.get("valorunitario", 0))
+        data["detalles"].append({
+            "idproducto": int(d.get("idproducto")) if d.get("idproducto") else None,
+            "cantidad": cantidad,
+            "valorunitario": valorunitario,
+            "subtotal": cantidad * valorunitario,
+            "descripcion": d.get("descripcion"),
+            "descuento": float(d.get("descuento", 0)),
+            "impuesto_id": d.get("impuesto_id"),
+        })
+
+    pagos_temp = {}
+    for key, value in form.items():
+        if key.startswith("pagos["):
+            parts = key.replace("pagos[", "").replace("]", "").split("[")
+            index, field = int(parts[0]), parts[1]
+            if index not in pagos_temp:
+                pagos_temp[index] = {}
+            pagos_temp[index][field] = value
+
+    for p in pagos_temp.values():
+        data["pagos"].append({
+            "idmedio": int(p.get("idmedio")) if p.get("idmedio") else None,
+            "valor": float(p.get("valor", 0)),
+            "due_date": p.get("due_date"),
+            "siigo_pago_id": p.get("siigo_pago_id"),
+        })
+    return data
+
+
+def nuevo(form):
+    """Lo que hace crear_factura ahora: decodificar, subtotales en Decimal y a_json del esquema."""
+    datos, errores = FORMULARIO_FACTURA.decodificar(form)
+    for d in datos["detalles"]:
+        d["subtotal"] = float(formularios.dinero(Decimal(d["cantidad"]) * d["valorunitario"]))
+    return FORMULARIO_FACTURA.a_json(datos), errores
+
+
+def medir(funcion, form, repeticiones):
+    tiempos = timeit.repeat(lambda: funcion(form), number=1, repeat=repeticiones)
+    tiempos.sort()
+    return {
+        "p50_us": round(tiempos[len(tiempos) // 2] * 1e6, 1),
+        "min_us": round(tiempos[0] * 1e6, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeticiones", type=int, default=200)
+    parser.add_argument("--salida", help="archivo JSON con los resultados")
+    args = parser.parse_args()
+
+    resultados = []
+    for lineas in TAMANOS:
+        form = formulario(lineas)
+        _, errores = nuevo(form)
+        assert not errores, errores
+        fila = {
+            "lineas": lineas,
+            "campos": len(form),
+            "anterior": medir(anterior, form, args.repeticiones),
+            "formularios": medir(nuevo, form, args.repeticiones),
+        }
+        fila["formularios"]["us_por_linea"] = round(fila["formularios"]["p50_us"] / lineas, 2)
+        resultados.append(fila)
+        print(f"{lineas:>5} líneas  anterior p50 {fila['anterior']['p50_us']:>9.1f} µs   "
+              f"formularios p50 {fila['formularios']['p50_us']:>9.1f} µs "
+              f"({fila['formularios']['us_por_linea']} µs/línea)")
+
+    if args.salida:
+        os.makedirs(os.path.dirname(os.path.abspath(args.salida)), exist_ok=True)
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump({"repeticiones": args.repeticiones, "resultados": resultados}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Costo de volver a pintar las tablas grandes con y sin {% cache %} por fila.
+
+Renderiza clientes.html y facturas.html con N filas sintéticas (sin backend):
+sin caché de fragmentos, con la caché llena y con la caché llena pero
+--cambios filas modificadas. También mide cargar las plantillas desde el
+bytecode en disco contra compilarlas:
+
+    python bench/plantillas.py --filas 5000 --cambios 10
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import config  # noqa: E402
+
+
+def clientes(n):
+    return [{
+        "idcliente": i, "tipo_local": "NATURAL" if i % 3 else "JURIDICA", "id_type": "13",
+        "identificacion": str(10000000 + i), "check_digit": None, "nombres": f"Nombre{i}",
+        "apellidos": "Apellido", "razonsocial": f"Empresa {i} SAS", "direccion": f"Calle {i} # 1-2",
+        "telefono": f"300{i:07d}", "contact_email": f"cliente{i}@ejemplo.co",
+    } for i in range(1, n + 1)]
+
+
+def facturas(n):
+    return [{
+        "idfactura": i, "idcliente": i % 500 + 1, "total": f"{i * 1000}.00", "estado": "EMITIDA",
+        "siigo_number": f"FV-{i}", "public_url": None,
+    } for i in range(1, n + 1)]
+
+
+def mejor(funcion, veces=5):
+    tiempos = []
+    for _ in range(veces):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return min(tiempos) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filas", type=int, default=5000)
+    parser.add_argument("--cambios", type=int, default=10, help="filas distintas en cada render")
+    args = parser.parse_args()
+
+    config.PLANTILLAS_BYTECODE_DIR = tempfile.mkdtemp(prefix="bench-jinja-")
+    from flask import render_template
+    from app import create_app
+    from services import plantillas
+
+    app = create_app()
+    casos = (("clientes.html", "clientes", clientes(args.filas)),
+             ("facturas.html", "facturas", facturas(args.filas)))
+    with app.test_request_context():
+        for plantilla, variable, filas in casos:
+            def pintar(datos):
+                return render_template(plantilla, **{variable: datos}, pagina=None)
+
+            config.FRAGMENTOS_HABILITADO = False
+            sin = mejor(lambda: pintar(filas))
+            config.FRAGMENTOS_HABILITADO = True
+            plantillas.fragmentos.invalidar()
+            pintar(filas)
+            llena = mejor(lambda: pintar(filas))
+
+            def con_cambios():
+                for i in range(args.cambios):
+                    filas[i * len(filas) // args.cambios] = dict(filas[i * len(filas) // args.cambios],
+                                                                 estado=f"CAMBIO-{time.perf_counter()}")
+                pintar(filas)
+            cambios = mejor(con_cambios)
+            print(f"{plantilla:<15} {args.filas} filas: sin caché {sin:7.1f} ms   caché llena {llena:7.1f} ms   "
+                  f"{args.cambios} cambiadas {cambios:7.1f} ms")
+
+    # Bytecode: entorno nuevo (como un worker nuevo) compilando contra cargando de disco
+    for etiqueta in ("compilar", "bytecode"):
+        nueva = create_app()   # deja el bytecode de todas las plantillas en disco
+        if etiqueta == "compilar":
+            nueva.jinja_env.bytecode_cache = None
+        nueva.jinja_env.cache.clear()
+        inicio = time.perf_counter()
+        for nombre in nueva.jinja_env.list_templates():
+            nueva.jinja_env.get_template(nombre)
+        print(f"plantillas ({etiqueta}): {(time.perf_counter() - inicio) * 1000:.1f} ms")
+    shutil.rmtree(config.PLANTILLAS_BYTECODE_DIR, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
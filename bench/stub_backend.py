@@ -0,0 +1,267 @@
+"""Backend Express simulado para pruebas de carga.
+
+Sirve las rutas que usa el frontend (/api/auth/login, /api/clientes,
+/api/reservas, /api/facturas, /api/egresos, /api/productos, /api/medios,
+/api/usuarios) con datos sintéticos deterministas y latencia configurable.
+
+    python bench/stub_backend.py --puertos 3000 --latencia 0.02 --clientes 5000 --facturas 20000
+
+Con --paginar respeta limit/offset; sin él devuelve siempre la colección
+completa, como el backend actual. Varios puertos levantan réplicas
+independientes que comparten los mismos datos.
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+ESTADOS_RESERVA = ("RESERVADO", "FACTURADO", "CANCELADO")
+ESTADOS_EGRESO = ("PENDIENTE", "PAGADO", "ANULADO")
+
+
+class Datos:
+    def __init__(self, clientes, reservas, facturas, egresos, semilla=7):
+        rnd = random.Random(semilla)
+        hoy = date.today()
+        self.lock = threading.Lock()
+        self.productos = [
+            {"idproducto": i, "nombre": f"Producto {i}", "precio": 10000 * i} for i in range(1, 21)
+        ]
+        self.medios = [
+            {"idmedio": i, "nombre": n} for i, n in enumerate(("Efectivo", "Transferencia", "Tarjeta"), 1)
+        ]
+        self.usuarios = [
+            {"idusuario": 1, "nombrecompleto": "Administrador", "username": "admin", "rol": "ADMIN"}
+        ]
+        self.clientes = []
+        for i in range(1, clientes + 1):
+            juridica = i % 7 == 0
+            self.clientes.append({
+                "idcliente": i,
+                "tipo_local": "JURIDICA" if juridica else "NATURAL",
+                "id_type": "31" if juridica else "13",
+                "identificacion": str(10000000 + i * 37),
+                "check_digit": str(i % 10) if juridica else None,
+                "nombres": None if juridica else f"Nombre{i}",
+                "apellidos": None if juridica else f"Apellido{i % 500}",
+                "razonsocial": f"Empresa {i} SAS" if juridica else None,
+                "nombrecompleto": f"Empresa {i} SAS" if juridica else f"Nombre{i} Apellido{i % 500}",
+                "direccion": f"Calle {i % 200} # {i % 90}-{i % 50}",
+                "telefono": f"300{i:07d}",
+                "contact_email": f"cliente{i}@ejemplo.co",
+            })
+        self.reservas = []
+        for i in range(1, reservas + 1):
+            cliente = self.clientes[rnd.randrange(len(self.clientes))] if self.clientes else {}
+            producto = rnd.choice(self.productos)
+            medio = rnd.choice(self.medios)
+            self.reservas.append({
+                "id": i,
+                "fecha": (hoy - timedelta(days=rnd.randrange(120))).isoformat() + "T10:00:00",
+                "idcliente": cliente.get("idcliente"),
+                "identificacion": cliente.get("identificacion"),
+                "cliente": cliente.get("nombrecompleto"),
+                "nombre_cliente": cliente.get("nombrecompleto"),
+                "idproducto": producto["idproducto"],
+                "producto": producto["nombre"],
+                "precio": producto["precio"],
+                "valor": producto["precio"],
+                "abono": producto["precio"],
+                "idmedio": medio["idmedio"],
+                "medio": medio["nombre"],
+                "estado": rnd.choice(ESTADOS_RESERVA),
+            })
+        self.facturas = []
+        for i in range(1, facturas + 1):
+            self.facturas.append({
+                "idfactura": i,
+                "idcliente": rnd.randrange(1, max(clientes, 1) + 1),
+                "fecha": (hoy - timedelta(days=rnd.randrange(365))).isoformat(),
+                "total": round(rnd.uniform(10000, 900000), 2),
+                "estado": "EMITIDA",
+                "observaciones": "",
+                "siigo_number": f"FV-{i}",
+                "public_url": None,
+            })
+        self.egresos = []
+        for i in range(1, egresos + 1):
+            self.egresos.append({
+                "idegreso": i,
+                "fecha": (hoy - timedelta(days=rnd.randrange(365))).isoformat() + "T00:00:00",
+                "concepto": f"Concepto {i % 40}",
+                "proveedor": f"Proveedor {i % 60}",
+                "valor": round(rnd.uniform(1000, 500000), 2),
+                "metodopago": rnd.choice(("Efectivo", "Transferencia", "Tarjeta")),
+                "usuario": "admin",
+                "estado": rnd.choice(ESTADOS_EGRESO),
+            })
+
+
+def crear_handler(datos, latencia, paginar):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _enviar(self, estado, cuerpo):
+            contenido = json.dumps(cuerpo).encode()
+            self.send_response(estado)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(contenido)))
+            self.end_headers()
+            self.wfile.write(contenido)
+
+        def _cuerpo(self):
+            largo = int(self.headers.get("Content-Length") or 0)
+            return json.loads(self.rfile.read(largo)) if largo else {}
+
+        def _lista(self, filas, query):
+            if paginar and "limit" in query:
+                offset = int(query.get("offset", ["0"])[0])
+                limite = int(query["limit"][0])
+                return filas[offset:offset + limite]
+            return filas
+
+        def _esperar(self):
+            if latencia:
+                time.sleep(latencia)
+
+        def do_GET(self):
+            self._esperar()
+            partes = urlparse(self.path)
+            ruta, query = partes.path, parse_qs(partes.query)
+
+            if ruta in ("/api/health", "/health"):
+                return self._enviar(200, {"ok": True})
+            if ruta == "/api/productos":
+                return self._enviar(200, datos.productos)
+            if ruta == "/api/medios":
+                return self._enviar(200, datos.medios)
+            if ruta == "/api/usuarios":
+                return self._enviar(200, datos.usuarios)
+            if ruta == "/api/clientes":
+                filas = datos.clientes
+                identificacion = query.get("identificacion", [""])[0]
+                if identificacion:
+                    filas = [c for c in filas if c["identificacion"].startswith(identificacion)]
+                return self._enviar(200, self._lista(filas, query))
+            if ruta == "/api/reservas":
+                desde = query.get("fecha_inicio", [""])[0]
+                hasta = query.get("fecha_fin", ["9999-12-31"])[0]
+                filas = [r for r in datos.reservas if desde <= r["fecha"][:10] <= hasta]
+                return self._enviar(200, self._lista(filas, query))
+            if ruta == "/api/facturas":
+                return self._enviar(200, self._lista(datos.facturas, query))
+            if ruta == "/api/egresos":
+                return self._enviar(200, self._lista(datos.egresos, query))
+
+            m = re.fullmatch(r"/api/(clientes|facturas|egresos|reservas)/(\d+)", ruta)
+            if m:
+                coleccion = getattr(datos, m.group(1))
+                indice = int(m.group(2)) - 1
+                if 0 <= indice < len(coleccion):
+                    return self._enviar(200, coleccion[indice])
+                return self._enviar(404, {"error": "No encontrado"})
+
+            m = re.fullmatch(r"/api/reservas/cliente/(\w+)", ruta)
+            if m:
+                filas = [r for r in datos.reservas
+                         if r["identificacion"] == m.group(1) and r["estado"] == "RESERVADO"]
+                return self._enviar(200 if filas else 404, filas)
+
+            self._enviar(404, {"error": "Ruta no encontrada"})
+
+        def do_POST(self):
+            self._esperar()
+            ruta = urlparse(self.path).path
+            cuerpo = self._cuerpo()
+
+            if ruta == "/api/auth/login":
+                return self._enviar(200, {"success": True, "token": f"token-{cuerpo.get('username')}"})
+
+            with datos.lock:
+                if ruta == "/api/clientes":
+                    nuevo = dict(cuerpo, idcliente=len(datos.clientes) + 1)
+                    datos.clientes.append(nuevo)
+                    return self._enviar(201, nuevo)
+                if ruta == "/api/reservas":
+                    nuevo = dict(cuerpo, id=len(datos.reservas) + 1, estado="RESERVADO",
+                                 fecha=date.today().isoformat() + "T10:00:00",
+                                 valor=cuerpo.get("valorreserva"))
+                    datos.reservas.append(nuevo)
+                    return self._enviar(201, nuevo)
+                if ruta == "/api/facturas":
+                    total = sum(float(d.get("subtotal") or 0) for d in cuerpo.get("detalles", []))
+                    nuevo = dict(cuerpo, idfactura=len(datos.facturas) + 1, total=total,
+                                 estado="EMITIDA", fecha=date.today().isoformat(),
+                                 siigo_number=f"FV-{len(datos.facturas) + 1}")
+                    datos.facturas.append(nuevo)
+                    return self._enviar(201, nuevo)
+                if ruta == "/api/egresos":
+                    nuevo = dict(cuerpo, idegreso=len(datos.egresos) + 1, estado="PENDIENTE")
+                    datos.egresos.append(nuevo)
+                    return self._enviar(201, nuevo)
+            self._enviar(404, {"error": "Ruta no encontrada"})
+
+        def do_PUT(self):
+            self._esperar()
+            self._enviar(200, self._cuerpo())
+
+        def do_PATCH(self):
+            self._esperar()
+            ruta = urlparse(self.path).path
+            cuerpo = self._cuerpo()
+            m = re.fullmatch(r"/api/egresos/(\d+)/estado", ruta)
+            if m and 0 < int(m.group(1)) <= len(datos.egresos):
+                datos.egresos[int(m.group(1)) - 1]["estado"] = cuerpo.get("estado")
+                return self._enviar(200, datos.egresos[int(m.group(1)) - 1])
+            m = re.fullmatch(r"/api/reservas/(\d+)/facturar", ruta)
+            if m and 0 < int(m.group(1)) <= len(datos.reservas):
+                datos.reservas[int(m.group(1)) - 1]["estado"] = "FACTURADO"
+                return self._enviar(200, datos.reservas[int(m.group(1)) - 1])
+            self._enviar(404, {"error": "Ruta no encontrada"})
+
+    return Handler
+
+
+def iniciar(puertos, latencia=0.0, paginar=False, clientes=500, reservas=2000, facturas=2000, egresos=1000):
+    """Levanta el stub en cada puerto (hilos daemon). Devuelve los servidores."""
+    datos = Datos(clientes, reservas, facturas, egresos)
+    handler = crear_handler(datos, latencia, paginar)
+    servidores = []
+    for puerto in puertos:
+        servidor = ThreadingHTTPServer(("127.0.0.1", puerto), handler)
+        servidor.daemon_threads = True
+        threading.Thread(target=servidor.serve_forever, daemon=True).start()
+        servidores.append(servidor)
+    return servidores
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--puertos", default="3000", help="lista separada por comas, ej. 3001,3002,3003")
+    parser.add_argument("--latencia", type=float, default=0.0, help="segundos de espera por petición")
+    parser.add_argument("--paginar", action="store_true", help="respetar limit/offset")
+    parser.add_argument("--clientes", type=int, default=500)
+    parser.add_argument("--reservas", type=int, default=2000)
+    parser.add_argument("--facturas", type=int, default=2000)
+    parser.add_argument("--egresos", type=int, default=1000)
+    args = parser.parse_args()
+
+    puertos = [int(p) for p in args.puertos.split(",")]
+    iniciar(puertos, args.latencia, args.paginar, args.clientes, args.reservas, args.facturas, args.egresos)
+    print(f"Stub backend escuchando en {puertos} (latencia {args.latencia}s)", flush=True)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
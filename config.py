@@ -1,4 +1,165 @@
 # Configuración general del proyecto
+import os
 
-API_URL = "http://localhost:3000/api"   # URL backend Express
+API_URL = os.environ.get("API_URL", "http://localhost:3000/api")   # URL backend Express
+# Réplicas del backend separadas por coma; por defecto solo API_URL (services/balanceo.py)
+API_URLS = [u.strip().rstrip("/") for u in os.environ.get("API_URLS", API_URL).split(",") if u.strip()]
 SECRET_KEY = "clave_super_secreta"      # 🔑 cámbiala en producción
+
+# Cliente HTTP hacia el backend (services/backend.py)
+API_TIMEOUT_CONEXION = 3.05             # segundos para abrir la conexión TCP
+API_TIMEOUT_LECTURA = 15                # segundos esperando la respuesta
+API_REINTENTOS = 2                      # solo métodos idempotentes (GET, HEAD, PUT, DELETE...)
+API_BACKOFF = 0.3                       # espera entre reintentos: 0.3s, 0.6s, 1.2s...
+API_POOL_CONEXIONES = 4                 # pools por worker (uno por host)
+API_POOL_MAXSIZE = 16                   # conexiones keep-alive por host y worker
+API_SINGLE_FLIGHT = True                # colapsar GETs idénticos y simultáneos en una sola llamada
+
+# Circuit breaker por ruta del backend (services/circuito.py)
+CIRCUITO_UMBRAL_FALLOS = 5              # fallos seguidos para abrir el circuito
+CIRCUITO_UMBRAL_LENTO = 10              # segundos; una respuesta más lenta cuenta como fallo
+CIRCUITO_TIEMPO_ABIERTO = 30            # segundos rechazando antes de probar de nuevo
+CIRCUITO_PRUEBAS = 1                    # llamadas de prueba simultáneas en semi-abierto
+RESPALDO_TTL = 6 * 3600                 # antigüedad máxima de los datos servidos como obsoletos
+RESPALDO_MAX_ENTRADAS = 200
+
+# Llamadas concurrentes al backend (services/fanout.py)
+FANOUT_MAX_HILOS = 8                    # hilos por worker para llamadas en paralelo
+
+# Caché de catálogos de referencia (services/catalogos.py)
+CATALOGOS_TTL_DEFECTO = 300             # segundos que un catálogo se considera fresco
+CATALOGOS_TTL = {"productos": 300, "medios": 900}
+CATALOGOS_TTL_OBSOLETO = 3600           # ventana en la que se sirve viejo mientras se refresca
+CATALOGOS_MAX_ENTRADAS = 256            # (token, catálogo): un par de entradas por usuario activo
+
+# Usuarios con acceso a las rutas /admin
+ADMIN_USUARIOS = ["admin"]
+
+# Índice de autocompletado de clientes (services/indice_clientes.py)
+AUTOCOMPLETAR_LIMITE = 10               # sugerencias máximas por consulta
+INDICE_CLIENTES_RECONCILIAR = 300       # segundos entre reconstrucciones contra el backend
+INDICE_CLIENTES_MAX_ALCANCES = 20       # índices por token guardados por worker (LRU)
+
+# Paginación de listados (services/paginacion.py)
+PAGINA_POR_DEFECTO = 50
+PAGINA_MAXIMO = 500
+BACKEND_PAGINA = {}                     # ej. {"/facturas": True}; vacío = autodetectar
+STREAMING_FRAGMENTO = 8192              # bytes por fragmento al enviar HTML en streaming
+
+# Métricas (services/metricas.py, expuestas en /metrics)
+METRICAS_HABILITADAS = True
+METRICAS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Caché de reservas por día (services/reservas_dias.py)
+RESERVAS_TTL_PASADO = 6 * 3600          # días anteriores a hoy
+RESERVAS_TTL_HOY = 60                   # hoy y días futuros
+RESERVAS_MAX_RANGO = 400                # días de la consulta más larga que se cachea
+RESERVAS_MAX_DIAS_ALCANCE = 400         # días guardados por token
+RESERVAS_MAX_ENTRADAS = 4000            # días guardados en total, entre todos los tokens
+
+# Cola de facturas asíncrona (services/cola_facturas.py)
+FACTURAS_ENVIO_ASINCRONO = os.environ.get("FACTURAS_ENVIO_ASINCRONO", "0") == "1"
+COLA_FACTURAS_DB = os.environ.get(
+    "COLA_FACTURAS_DB",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "cola_facturas.db"),
+)
+COLA_FACTURAS_HILOS = 2                 # hilos que envían facturas, por worker
+COLA_FACTURAS_REINTENTOS = 5            # intentos si el POST no llegó (o 503) y del PATCH de la reserva
+COLA_FACTURAS_BACKOFF = 2               # segundos; se duplica en cada reintento
+COLA_FACTURAS_BLOQUEO = 300             # PROCESANDO más de esto = worker caído (INCIERTA sin factura)
+COLA_FACTURAS_ESPERA = 1                # segundos entre consultas de la cola vacía
+COLA_FACTURAS_RETENCION = 7 * 24 * 3600 # segundos que se guardan los trabajos terminados
+
+# Facturación de reservas por lotes (services/lote_facturas.py, usa COLA_FACTURAS_DB)
+LOTE_FACTURAS_CONCURRENCIA = 4          # facturas enviadas a la vez por lote
+LOTE_FACTURAS_MAXIMO = 1000             # reservas máximas por lote
+
+# Formularios con campos anidados (services/formularios.py)
+FORMULARIO_MAX_FILAS = 5000             # filas máximas por colección (detalles, pagos...)
+FORMULARIO_MAX_CLAVES = 20000           # nombres de campo anidados ya parseados que se recuerdan
+
+# Mapa de identidad para vistas de detalle (services/entidades.py)
+ENTIDADES_TTL = 120                     # segundos que una fila de un listado sirve para su detalle
+ENTIDADES_MAX_ENTRADAS = 5000           # por tipo de entidad (clientes, facturas, egresos)
+
+# Respuestas JSON de los proxies (services/respuestas.py)
+COMPRESION_MINIMO = 1024                # bytes; por debajo no vale la pena comprimir
+COMPRESION_NIVEL = 6
+COMPRESION_MAX_ENTRADAS = 64            # cuerpos comprimidos guardados por ETag
+
+# Control de admisión por ruta del backend (services/admision.py). Los límites son por worker.
+ADMISION_HABILITADA = True
+ADMISION_LIMITE_DEFECTO = 8             # llamadas simultáneas por ruta (/facturas, /clientes...)
+ADMISION_LIMITES = {"/facturas": 4, "/egresos": 4, "/reservas": 4}
+ADMISION_COLA_MAX = 32                  # llamadas esperando turno por ruta
+ADMISION_ESPERA = {"alta": 5.0, "normal": 2.0, "baja": 1.0}   # segundos máximos en cola
+ADMISION_PRIORIDADES = {                # endpoint de Flask -> prioridad (por defecto "normal")
+    "auth.login": "alta",
+    "facturas.proxy_buscar_cliente": "alta",
+    "facturas.proxy_productos": "alta",
+    "facturas.proxy_medios": "alta",
+    "reservas.buscar_clientes": "alta",
+    "facturas.listar_facturas": "baja",
+    "egresos.listar_egresos": "baja",
+    "clientes.listar_clientes": "baja",
+    "reservas.listar_reservas": "baja",
+    "facturas.facturar_lote": "baja",
+    "facturas.exportar_facturas": "baja",
+    "egresos.exportar_egresos": "baja",
+}
+
+# Balanceo entre réplicas de API_URLS (services/balanceo.py)
+BALANCEO_FALLOS = 3                     # fallos seguidos (conexión, 502/503/504) para expulsar una réplica
+BALANCEO_EXPULSION_BASE = 5             # segundos de la primera expulsión; se duplica en cada una
+BALANCEO_EXPULSION_MAX = 120            # tope de la expulsión, en segundos
+BALANCEO_SONDA_RUTA = "/health"         # relativa a cada URL base; < 500 = viva
+BALANCEO_SONDA_INTERVALO = 5            # segundos entre sondas activas
+BALANCEO_SONDA_TIMEOUT = 1              # segundos
+BALANCEO_AFINIDAD_TTL = 30              # segundos que las lecturas siguen al usuario tras escribir
+BALANCEO_AVISO_INTERVALO = 60           # segundos entre avisos en el log de reintentos por réplica
+
+# Indicadores del dashboard (services/kpis.py)
+KPIS_DIAS = 31                          # días acumulados por entidad (el panel usa hoy y 7 días)
+KPIS_RECONCILIAR = 300                  # segundos entre reconciliaciones contra el backend
+KPIS_MAX_ALCANCES = 20                  # acumulados por token guardados por worker (LRU)
+KPIS_ESTADOS_EXCLUIDOS = frozenset(["ANULADA", "ANULADO", "CANCELADA", "CANCELADO", "RECHAZADA"])
+
+# Exportación CSV/XLSX de facturas y egresos (services/exportacion.py)
+EXPORTACION_PAGINA = 1000               # filas por página pedida al backend
+EXPORTACION_LECTURA = 65536             # bytes leídos del socket por vez
+EXPORTACION_FRAGMENTO = 65536           # bytes por fragmento de la respuesta chunked
+
+# Archivos estáticos con huella de contenido (services/estaticos.py)
+ESTATICOS_HUELLAS = os.environ.get("ESTATICOS_HUELLAS", "1") != "0"   # "0" = handler por defecto de Flask
+ESTATICOS_MAX_AGE = 365 * 24 * 3600     # segundos; la URL cambia cuando cambia el contenido
+ESTATICOS_LARGO_HUELLA = 12             # caracteres del sha256 en el nombre
+ESTATICOS_COMPRIMIR = frozenset([".css", ".js", ".svg", ".json", ".txt", ".map"])
+ESTATICOS_NIVEL_GZIP = 9                # se comprime una sola vez al arrancar
+
+# Calentamiento de workers y /readyz (services/calentamiento.py, gunicorn.conf.py)
+CALENTAMIENTO_CONEXIONES = 4            # conexiones keep-alive abiertas por réplica y worker (<= API_POOL_MAXSIZE)
+CALENTAMIENTO_TIMEOUT = 2               # segundos por conexión abierta en el calentamiento
+READYZ_TTL = 2                          # segundos que /readyz reutiliza la comprobación del backend
+
+# Plantillas: bytecode Jinja en disco y caché de filas renderizadas (services/plantillas.py)
+PLANTILLAS_BYTECODE_DIR = os.environ.get(   # compartido entre workers y reinicios; "" = sin caché en disco
+    "PLANTILLAS_BYTECODE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "jinja"),
+)
+FRAGMENTOS_HABILITADO = True            # {% cache %} en templates/_filas.html
+FRAGMENTOS_MAX_ENTRADAS = 50000         # filas guardadas por worker
+FRAGMENTOS_MAX_BYTES = 64 * 1024 * 1024 # caracteres de HTML guardados por worker
+
+# Perfilador por muestreo de peticiones (services/perfilador.py)
+PERFILADOR_HABILITADO = True            # X-Perfilar: 1 / ?perfilar=1 (administradores) y muestreo
+PERFILADOR_MUESTREO = int(os.environ.get("PERFILADOR_MUESTREO", "0"))   # 1 de cada N peticiones; 0 = solo a pedido
+PERFILADOR_INTERVALO = 0.005            # segundos entre muestras de la pila
+PERFILADOR_MAX_SEGUNDOS = 300           # un perfil sin cerrar se abandona pasado este tiempo
+PERFILADOR_MAX_PERFILES = 200           # perfiles guardados en disco (entre todos los workers)
+PERFILADOR_DIR = os.environ.get(
+    "PERFILADOR_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "perfiles"),
+)
+PERFILADOR_EXCLUIDOS = frozenset([      # endpoints que nunca se perfilan
+    "static", "salud.healthz", "salud.readyz", "admin.listar_perfiles", "admin.descargar_perfil",
+])
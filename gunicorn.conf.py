@@ -0,0 +1,16 @@
+# Configuración de gunicorn: se lee sola al arrancar desde este directorio.
+#
+#     gunicorn app:app -w 4 --threads 4 --preload
+#
+# Con --preload la app (y sus plantillas compiladas) se crea una vez en el
+# proceso maestro y los workers la heredan. Cada worker se calienta antes de
+# aceptar peticiones (services/calentamiento.py): conexiones al backend y
+# cachés son por proceso y tienen que abrirse después del fork. Por lo mismo
+# los hilos de la cola de facturas arrancan aquí y no en create_app.
+
+
+def post_worker_init(worker):
+    from services import calentamiento, cola_facturas
+
+    calentamiento.calentar(worker.wsgi, latido=worker.notify)
+    cola_facturas.iniciar_workers()
@@ -0,0 +1,120 @@
+from functools import wraps
+
+from flask import Blueprint, jsonify, request, send_file, session
+import config
+from services import admision, backend, balanceo, cache, circuito, cola_facturas, estaticos, lote_facturas, perfilador
+
+admin_bp = Blueprint("admin", __name__, url_prefix="/admin")
+
+
+def admin_requerido(vista):
+    @wraps(vista)
+    def envoltura(*args, **kwargs):
+        if "token" not in session:
+            return jsonify({"error": "No autorizado"}), 401
+        if session.get("username") not in config.ADMIN_USUARIOS:
+            return jsonify({"error": "Solo administradores"}), 403
+        return vista(*args, **kwargs)
+    return envoltura
+
+
+# ================== CACHÉS ==================
+@admin_bp.route("/cache")
+@admin_requerido
+def estado_cache():
+    return jsonify({nombre: c.estadisticas() for nombre, c in cache.registro.items()})
+
+
+@admin_bp.route("/cache/invalidar", methods=["POST"])
+@admin_requerido
+def invalidar_cache():
+    nombre = request.values.get("cache")
+    clave = request.values.get("clave") or None
+
+    if nombre:
+        if nombre not in cache.registro:
+            return jsonify({"error": f"Caché '{nombre}' no existe"}), 404
+        objetivos = [cache.registro[nombre]]
+    else:
+        objetivos = list(cache.registro.values())
+
+    borradas = sum(c.invalidar(clave) for c in objetivos)
+    return jsonify({"invalidadas": borradas})
+
+
+# ================== SINGLE-FLIGHT ==================
+@admin_bp.route("/singleflight")
+@admin_requerido
+def estado_singleflight():
+    return jsonify(backend.vuelos.estadisticas())
+
+
+# ================== CIRCUIT BREAKERS ==================
+@admin_bp.route("/circuitos")
+@admin_requerido
+def estado_circuitos():
+    return jsonify(circuito.estadisticas())
+
+
+# ================== RÉPLICAS DEL BACKEND ==================
+@admin_bp.route("/replicas")
+@admin_requerido
+def estado_replicas():
+    return jsonify(balanceo.estadisticas())
+
+
+# ================== CONTROL DE ADMISIÓN ==================
+@admin_bp.route("/admision")
+@admin_requerido
+def estado_admision():
+    return jsonify(admision.estadisticas())
+
+
+# ================== ARCHIVOS ESTÁTICOS ==================
+@admin_bp.route("/estaticos")
+@admin_requerido
+def estado_estaticos():
+    return jsonify(estaticos.estadisticas())
+
+
+# ================== COLA DE FACTURAS ==================
+@admin_bp.route("/cola_facturas")
+@admin_requerido
+def estado_cola_facturas():
+    return jsonify(cola_facturas.estadisticas())
+
+
+# ================== FACTURACIÓN POR LOTES ==================
+@admin_bp.route("/lotes")
+@admin_requerido
+def estado_lotes():
+    return jsonify(lote_facturas.estadisticas())
+
+
+@admin_bp.route("/lotes/olvidar", methods=["POST"])
+@admin_requerido
+def olvidar_reserva_lote():
+    idreserva = request.values.get("idreserva")
+    if not idreserva:
+        return jsonify({"error": "Falta idreserva"}), 400
+    return jsonify({"borradas": lote_facturas.olvidar(idreserva)})
+
+
+# ================== PERFILES ==================
+@admin_bp.route("/perfiles")
+@admin_requerido
+def listar_perfiles():
+    return jsonify(perfilador.listar())
+
+
+@admin_bp.route("/perfiles/<identificador>")
+@admin_requerido
+def descargar_perfil(identificador):
+    """Pilas colapsadas (flamegraph.pl, speedscope); ?formato=json para los metadatos."""
+    json_pedido = request.args.get("formato") == "json"
+    ruta = perfilador.ruta_archivo(identificador, ".json" if json_pedido else ".folded")
+    if ruta is None:
+        return jsonify({"error": "Perfil no encontrado"}), 404
+    if json_pedido:
+        return send_file(ruta, mimetype="application/json")
+    return send_file(ruta, mimetype="text/plain", as_attachment=True, download_name=f"{identificador}.folded")
@@ -1,6 +1,5 @@
 from flask import Blueprint, render_template, request, redirect, url_for, session, flash
-import requests
-import config
+from services import backend
 
 auth_bp = Blueprint("auth", __name__)
 
@@ -11,7 +10,7 @@ def login():
         password = request.form["password"]
 
         try:
-            response = requests.post(f"{config.API_URL}/auth/login", json={
+            response = backend.post("/auth/login", token=None, json={
                 "username": username,
                 "password": password
             })
@@ -1,78 +1,114 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash
-import requests
+from services import backend, entidades, formularios, fragmentos, paginacion
+from services.formularios import Campo, Esquema, TEXTO
+from services.indice_clientes import indice
 
 clientes_bp = Blueprint("clientes", __name__, url_prefix="/clientes")
 
-API_URL = "http://localhost:3000/api/clientes"  # 👈 backend Express
-
 # =================== LISTAR CLIENTES ===================
 @clientes_bp.route("/")
 def listar_clientes():
     identificacion = request.args.get("identificacion")  # ✅ Capturar parámetro de búsqueda
-    clientes = []
+    clientes, pagina = [], None
 
     try:
         if identificacion:
             # Buscar cliente por identificación en backend
-            response = requests.get(f"{API_URL}?identificacion={identificacion}")
+            response, pagina = paginacion.obtener("/clientes", params={"identificacion": identificacion})
             if response.status_code == 200:
-                clientes = response.json()
+                clientes = pagina.items
+                entidades.clientes.guardar_lista(clientes)
                 if not clientes:
                     flash("⚠️ No se encontraron clientes con esa identificación", "warning")
             else:
                 flash("❌ Error en búsqueda de cliente", "danger")
         else:
             # Listar todos si no hay búsqueda
-            response = requests.get(API_URL)
-            clientes = response.json()
+            response, pagina = paginacion.obtener("/clientes")
+            clientes = pagina.items if pagina else response.json()
+            if response.status_code == 200:
+                entidades.clientes.guardar_lista(clientes)
     except Exception as e:
         flash(f"Error obteniendo clientes: {e}", "danger")
 
-    return render_template("clientes.html", clientes=clientes)
+    return paginacion.render_streaming("clientes.html", clientes=clientes, pagina=pagina)
 
 
 # =================== CREAR CLIENTE ===================
+FORMULARIO_CREAR = Esquema({
+    "tipo": Campo(TEXTO, requerido=True),
+    "id_type": Campo(TEXTO),
+    "identificacion": Campo(TEXTO, requerido=True),
+    "check_digit": Campo(TEXTO),
+    "nombres": Campo(TEXTO),
+    "apellidos": Campo(TEXTO),
+    "razonSocial": Campo(TEXTO),
+    "direccion": Campo(TEXTO),
+    "state_code": Campo(TEXTO),
+    "city_code": Campo(TEXTO),
+    "telefono": Campo(TEXTO),
+    "contact_first_name": Campo(TEXTO),
+    "contact_last_name": Campo(TEXTO),
+    "contact_email": Campo(TEXTO),
+    "observacion": Campo(TEXTO),
+})
+
+
 @clientes_bp.route("/crear", methods=["POST"])
 def crear_cliente():
+    destino = url_for("clientes.listar_clientes")
     try:
-        data = {
-            "tipo": request.form.get("tipo"),
-            "id_type": request.form.get("id_type"),
-            "identificacion": request.form.get("identificacion"),
-            "check_digit": request.form.get("check_digit"),
-            "nombres": request.form.get("nombres"),
-            "apellidos": request.form.get("apellidos"),
-            "razonSocial": request.form.get("razonSocial"),
-            "direccion": request.form.get("direccion"),
-            "country_code": "CO",
-            "state_code": request.form.get("state_code"),
-            "city_code": request.form.get("city_code"),
-            "telefono": request.form.get("telefono"),
-            "contact_first_name": request.form.get("contact_first_name"),
-            "contact_last_name": request.form.get("contact_last_name"),
-            "contact_email": request.form.get("contact_email"),
-            "observacion": request.form.get("observacion"),
-        }
-
-        r = requests.post(API_URL, json=data)
+        data, errores = FORMULARIO_CREAR.decodificar(request.form)
+        if errores:
+            if fragmentos.pedido():
+                return fragmentos.responder(" ".join(formularios.mensajes_error(errores)), "danger", destino)
+            for mensaje in formularios.mensajes_error(errores):
+                flash(mensaje, "danger")
+            return redirect(destino)
+        data["country_code"] = "CO"
+
+        r = backend.post("/clientes", json=data)
         if r.status_code == 201:
-            flash("✅ Cliente creado con éxito", "success")
-        else:
-            flash(f"❌ Error creando cliente: {r.json().get('error')}", "danger")
+            creado = r.json()
+            indice.guardar(creado)
+            cliente = _fila_cliente(data, creado)
+            entidades.clientes.guardar(cliente)
+            return fragmentos.responder("✅ Cliente creado con éxito", "success", destino,
+                                        macro="fila_cliente", entidad=cliente, status=201)
+        return fragmentos.responder(f"❌ Error creando cliente: {r.json().get('error')}", "danger", destino,
+                                    status=r.status_code)
 
     except Exception as e:
-        flash(f"Error en petición: {e}", "danger")
+        return fragmentos.responder(f"Error en petición: {e}", "danger", destino, status=502)
+
 
-    return redirect(url_for("clientes.listar_clientes"))
+def _fila_cliente(enviado, respuesta):
+    """Fila del listado tras una escritura: lo que devolvió el backend sobre lo enviado.
+
+    El formulario manda `tipo` y `razonSocial`; el listado pinta `tipo_local` y
+    `razonsocial`. Sin `idcliente` devuelve None (el navegador recarga).
+    """
+    cliente = {k.lower(): v for k, v in enviado.items()}
+    if isinstance(respuesta, dict):
+        cliente.update(respuesta)
+    if "tipo_local" not in cliente and cliente.get("tipo"):
+        cliente["tipo_local"] = cliente["tipo"]
+    return cliente if cliente.get("idcliente") is not None else None
 
 
 # =================== FORMULARIO EDITAR CLIENTE ===================
 @clientes_bp.route("/editar/<int:idCliente>")
 def editar_cliente_form(idCliente):
+    # Normalmente el cliente ya vino en el listado
+    cliente = entidades.clientes.obtener(idCliente)
+    if cliente is not None:
+        return render_template("editar_cliente.html", cliente=cliente)
+
     try:
-        r = requests.get(f"{API_URL}/{idCliente}")
+        r = backend.get(f"/clientes/{idCliente}")
         if r.status_code == 200:
             cliente = r.json()
+            entidades.clientes.guardar(cliente)
         else:
             flash("Cliente no encontrado", "warning")
             return redirect(url_for("clientes.listar_clientes"))
@@ -84,32 +120,64 @@ def editar_cliente_form(idCliente):
 
 
 # =================== ACTUALIZAR CLIENTE ===================
+FORMULARIO_ACTUALIZAR = Esquema({
+    "tipo": Campo(TEXTO, requerido=True),
+    "id_type": Campo(TEXTO),
+    "nombres": Campo(TEXTO),
+    "apellidos": Campo(TEXTO),
+    "razonsocial": Campo(TEXTO, origen="razonSocial"),
+    "direccion": Campo(TEXTO),
+    "state_code": Campo(TEXTO),
+    "city_code": Campo(TEXTO),
+    "telefono": Campo(TEXTO),
+    "contact_first_name": Campo(TEXTO),
+    "contact_last_name": Campo(TEXTO),
+    "contact_email": Campo(TEXTO),
+    "observacion": Campo(TEXTO),
+})
+
+
 @clientes_bp.route("/actualizar/<int:idCliente>", methods=["POST"])
 def actualizar_cliente(idCliente):
+    destino = url_for("clientes.listar_clientes")
     try:
-        data = {
-            "tipo": request.form.get("tipo"),
-            "id_type": request.form.get("id_type"),
-            "nombres": request.form.get("nombres"),
-            "apellidos": request.form.get("apellidos"),
-            "razonsocial": request.form.get("razonSocial"),
-            "direccion": request.form.get("direccion"),
-            "state_code": request.form.get("state_code"),
-            "city_code": request.form.get("city_code"),
-            "telefono": request.form.get("telefono"),
-            "contact_first_name": request.form.get("contact_first_name"),
-            "contact_last_name": request.form.get("contact_last_name"),
-            "contact_email": request.form.get("contact_email"),
-            "observacion": request.form.get("observacion"),
-        }
-
-        r = requests.put(f"{API_URL}/{idCliente}", json=data)
+        data, errores = FORMULARIO_ACTUALIZAR.decodificar(request.form)
+        if errores:
+            for mensaje in formularios.mensajes_error(errores):
+                flash(mensaje, "danger")
+            return redirect(url_for("clientes.editar_cliente_form", idCliente=idCliente))
+
+        r = backend.put(f"/clientes/{idCliente}", json=data)
         if r.status_code == 200:
-            flash("✅ Cliente actualizado con éxito", "success")
-        else:
-            flash(f"❌ Error actualizando cliente: {r.json().get('error')}", "danger")
+            indice.actualizar(idCliente, data)
+            try:
+                respuesta = r.json()
+            except ValueError:
+                respuesta = None
+            if not isinstance(respuesta, dict) or respuesta.get("idcliente") is None:
+                # El PUT no devolvió el cliente: lo conocido más lo editado
+                respuesta = entidades.clientes.obtener(idCliente) or _leer_cliente(idCliente)
+                if respuesta is not None:
+                    respuesta = dict(respuesta, **data)
+                    respuesta.pop("tipo_local", None)
+            cliente = _fila_cliente(data, respuesta)
+            if entidades.clientes.guardar(cliente) == 0:
+                entidades.clientes.invalidar(idCliente)   # fila incompleta: que la vuelva a pedir
+            return fragmentos.responder("✅ Cliente actualizado con éxito", "success", destino,
+                                        macro="fila_cliente", entidad=cliente)
+        entidades.clientes.invalidar(idCliente)
+        return fragmentos.responder(f"❌ Error actualizando cliente: {r.json().get('error')}", "danger", destino,
+                                    status=r.status_code)
 
     except Exception as e:
-        flash(f"Error en petición: {e}", "danger")
+        entidades.clientes.invalidar(idCliente)
+        return fragmentos.responder(f"Error en petición: {e}", "danger", destino, status=502)
 
-    return redirect(url_for("clientes.listar_clientes"))
+
+def _leer_cliente(idCliente):
+    try:
+        r = backend.get(f"/clientes/{idCliente}")
+        return r.json() if r.status_code == 200 else None
+    except Exception as e:
+        print("⚠️ No se pudo leer el cliente actualizado:", e)
+        return None
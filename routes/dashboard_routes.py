@@ -1,4 +1,5 @@
 from flask import Blueprint, render_template, session, redirect, url_for, flash
+from services import kpis
 
 dashboard_bp = Blueprint("dashboard", __name__)
 
@@ -13,4 +14,7 @@ def index():
     if "token" not in session:
         flash("Primero inicia sesión", "warning")
         return redirect(url_for("auth.login"))
-    return render_template("dashboard.html", username=session["username"])
+
+    # Las cifras salen de lo ya acumulado; si toca, se reconcilia en segundo plano
+    kpis.reconciliar_si_toca(session["token"])
+    return render_template("dashboard.html", username=session["username"], kpis=kpis.resumen())
@@ -1,6 +1,7 @@
 from flask import Blueprint, render_template, session, redirect, url_for, flash, request
-import requests
-import config
+from services import backend, entidades, exportacion, formularios, fragmentos, kpis, paginacion
+from services.backend import MENSAJE_OBSOLETO
+from services.formularios import Campo, Esquema, DECIMAL, FECHA, TEXTO
 
 egresos_bp = Blueprint("egresos", __name__)
 
@@ -12,12 +13,15 @@ def listar_egresos():
         return redirect(url_for("auth.login"))
 
     try:
-        headers = {"Authorization": f"Bearer {session['token']}"}
-        response = requests.get(f"{config.API_URL}/egresos", headers=headers)
+        response, pagina = paginacion.obtener("/egresos", respaldo=True)
 
         if response.status_code == 200:
-            egresos = response.json()
-            return render_template("egresos.html", egresos=egresos)
+            if backend.es_obsoleta(response):
+                flash(MENSAJE_OBSOLETO, "warning")
+            else:
+                entidades.egresos.guardar_lista(pagina.items)
+                kpis.egresos.registrar_lista(pagina.items)
+            return paginacion.render_streaming("egresos.html", egresos=pagina.items, pagina=pagina)
         else:
             flash("Error al obtener egresos", "danger")
             return redirect(url_for("dashboard.index"))
@@ -25,35 +29,84 @@ def listar_egresos():
         flash(f"Error conectando al backend: {e}", "danger")
         return redirect(url_for("dashboard.index"))
 
+# ================== EXPORTAR EGRESOS ==================
+COLUMNAS_EXPORTACION = [
+    ("idegreso", "ID"),
+    ("fecha", "Fecha"),
+    ("concepto", "Concepto"),
+    ("proveedor", "Proveedor"),
+    ("valor", "Valor"),
+    ("metodopago", "Método de pago"),
+    ("estado", "Estado"),
+    ("usuario", "Usuario"),
+    ("observacion", "Observación"),
+]
+
+
+@egresos_bp.route("/egresos/exportar")
+def exportar_egresos():
+    if "token" not in session:
+        flash("Debes iniciar sesión primero", "warning")
+        return redirect(url_for("auth.login"))
+
+    try:
+        return exportacion.responder("/egresos", COLUMNAS_EXPORTACION, "egresos")
+    except ValueError as e:
+        flash(f"❌ Exportación inválida: {e}", "danger")
+    except Exception as e:
+        flash(f"Error conectando al backend: {e}", "danger")
+    return redirect(url_for("egresos.listar_egresos"))
+
 # ================== CREAR EGRESO ==================
+FORMULARIO_EGRESO = Esquema({
+    "fecha": Campo(FECHA, requerido=True),
+    "concepto": Campo(TEXTO, requerido=True),
+    "proveedor": Campo(TEXTO, requerido=True),
+    "valor": Campo(DECIMAL, requerido=True),
+    "metodopago": Campo(TEXTO, requerido=True),
+    "observacion": Campo(TEXTO),
+})
+
+
 @egresos_bp.route("/egresos/nuevo", methods=["POST"])
 def crear_egreso():
     if "token" not in session:
         flash("Debes iniciar sesión primero", "warning")
         return redirect(url_for("auth.login"))
 
-    data = {
-        "fecha": request.form["fecha"],
-        "concepto": request.form["concepto"],
-        "proveedor": request.form["proveedor"],
-        "valor": request.form["valor"],
-        "metodopago": request.form["metodopago"],
-        "observacion": request.form.get("observacion"),
-        "idusuario": 1  # ⚠️ Aquí podrías usar session["idusuario"] si lo guardas en login
-    }
+    form, errores = FORMULARIO_EGRESO.decodificar(request.form)
+    destino = url_for("egresos.listar_egresos")
+    if errores:
+        if fragmentos.pedido():
+            return fragmentos.responder(" ".join(formularios.mensajes_error(errores)), "danger", destino)
+        for mensaje in formularios.mensajes_error(errores):
+            flash(mensaje, "danger")
+        return redirect(destino)
+
+    data = formularios.a_json(dict(
+        form,
+        idusuario=1  # ⚠️ Aquí podrías usar session["idusuario"] si lo guardas en login
+    ))
 
     try:
-        headers = {"Authorization": f"Bearer {session['token']}", "Content-Type": "application/json"}
-        response = requests.post(f"{config.API_URL}/egresos", headers=headers, json=data)
+        response = backend.post("/egresos", json=data)
 
         if response.status_code == 200 or response.status_code == 201:
-            flash("Egreso creado ✅", "success")
-        else:
-            flash("Error al crear egreso ❌", "danger")
+            egreso = None
+            try:
+                # Si la respuesta no trae algún campo (fecha, usuario...), vale el del formulario
+                egreso = dict(data, **response.json())
+                entidades.egresos.guardar(egreso)
+                kpis.egresos.registrar(egreso)
+            except (ValueError, TypeError):
+                pass
+            if egreso is not None and egreso.get("idegreso") is None:
+                egreso = None   # sin id no hay fila: el navegador recarga el listado
+            return fragmentos.responder("Egreso creado ✅", "success", destino,
+                                        macro="fila_egreso", entidad=egreso, status=201)
+        return fragmentos.responder("Error al crear egreso ❌", "danger", destino, status=response.status_code)
     except Exception as e:
-        flash(f"Error conectando al backend: {e}", "danger")
-
-    return redirect(url_for("egresos.listar_egresos"))
+        return fragmentos.responder(f"Error conectando al backend: {e}", "danger", destino, status=502)
 
 # ================== OBTENER EGRESO POR ID ==================
 @egresos_bp.route("/egresos/<int:id>")
@@ -62,12 +115,17 @@ def detalle_egreso(id):
         flash("Debes iniciar sesión primero", "warning")
         return redirect(url_for("auth.login"))
 
+    # Normalmente el egreso ya vino en el listado
+    egreso = entidades.egresos.obtener(id)
+    if egreso is not None:
+        return render_template("egreso_detalle.html", egreso=egreso)
+
     try:
-        headers = {"Authorization": f"Bearer {session['token']}"}
-        response = requests.get(f"{config.API_URL}/egresos/{id}", headers=headers)
+        response = backend.get(f"/egresos/{id}")
 
         if response.status_code == 200:
             egreso = response.json()
+            entidades.egresos.guardar(egreso)
             return render_template("egreso_detalle.html", egreso=egreso)
         else:
             flash("Egreso no encontrado ❌", "danger")
@@ -84,16 +142,47 @@ def actualizar_estado(id):
         return redirect(url_for("auth.login"))
 
     estado = request.form["estado"]
+    destino = url_for("egresos.listar_egresos")
 
     try:
-        headers = {"Authorization": f"Bearer {session['token']}", "Content-Type": "application/json"}
-        response = requests.patch(f"{config.API_URL}/egresos/{id}/estado", headers=headers, json={"estado": estado})
+        response = backend.patch(f"/egresos/{id}/estado", json={"estado": estado})
 
         if response.status_code == 200:
-            flash("Estado actualizado ✅", "success")
-        else:
-            flash("Error al actualizar estado ❌", "danger")
+            kpis.egresos.cambiar_estado(id, estado)
+            egreso = _egreso_actualizado(id, estado, response)
+            return fragmentos.responder("Estado actualizado ✅", "success", destino,
+                                        macro="fila_egreso", entidad=egreso)
+        entidades.egresos.invalidar(id)
+        return fragmentos.responder("Error al actualizar estado ❌", "danger", destino, status=response.status_code)
     except Exception as e:
-        flash(f"Error conectando al backend: {e}", "danger")
+        entidades.egresos.invalidar(id)
+        return fragmentos.responder(f"Error conectando al backend: {e}", "danger", destino, status=502)
 
-    return redirect(url_for("egresos.listar_egresos"))
+
+def _egreso_actualizado(id, estado, response):
+    """Egreso con el estado nuevo, sin volver a pedir el listado.
+
+    Vale la fila que devuelva el PATCH; si no trae una, la del mapa de identidad
+    con el estado cambiado, y como último recurso GET /egresos/<id>. Queda
+    guardada en entidades.egresos (escritura directa, sin invalidar).
+    """
+    try:
+        egreso = response.json()
+    except ValueError:
+        egreso = None
+    if not isinstance(egreso, dict) or egreso.get("idegreso") is None:
+        egreso = entidades.egresos.obtener(id)
+        if egreso is not None:
+            egreso = dict(egreso, estado=estado)
+    if egreso is None:
+        try:
+            r = backend.get(f"/egresos/{id}")
+            egreso = r.json() if r.status_code == 200 else None
+        except Exception as e:
+            print("⚠️ No se pudo leer el egreso actualizado:", e)
+        if not isinstance(egreso, dict):
+            # El estado sí cambió; el navegador recarga el listado
+            entidades.egresos.invalidar(id)
+            return None
+    entidades.egresos.guardar(egreso)
+    return egreso
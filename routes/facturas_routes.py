@@ -1,6 +1,13 @@
 from flask import Blueprint, render_template, session, redirect, url_for, flash, request, jsonify
 import requests
+from decimal import Decimal
 import config
+from services import backend, catalogos, cola_facturas, entidades, exportacion, formularios, kpis, lote_facturas, paginacion
+from services.backend import MENSAJE_OBSOLETO
+from services.facturacion import enviar_factura, factura_creada
+from services.formularios import Campo, Esquema, DECIMAL, ENTERO, FECHA, FLOTANTE, TEXTO
+from services.indice_clientes import indice
+from services.respuestas import json_condicional
 
 facturas_bp = Blueprint("facturas", __name__)
 
@@ -12,12 +19,15 @@ def listar_facturas():
         return redirect(url_for("auth.login"))
 
     try:
-        headers = {"Authorization": f"Bearer {session['token']}"}
-        response = requests.get(f"{config.API_URL}/facturas", headers=headers)
+        response, pagina = paginacion.obtener("/facturas", respaldo=True)
 
         if response.status_code == 200:
-            facturas = response.json()
-            return render_template("facturas.html", facturas=facturas)
+            if backend.es_obsoleta(response):
+                flash(MENSAJE_OBSOLETO, "warning")
+            else:
+                entidades.facturas.guardar_lista(pagina.items)
+                kpis.facturas.registrar_lista(pagina.items)
+            return paginacion.render_streaming("facturas.html", facturas=pagina.items, pagina=pagina)
         else:
             flash("Error al obtener facturas ❌", "danger")
             return redirect(url_for("dashboard.index"))
@@ -26,7 +36,57 @@ def listar_facturas():
         return redirect(url_for("dashboard.index"))
 
 
+# ================== EXPORTAR FACTURAS ==================
+COLUMNAS_EXPORTACION = [
+    ("idfactura", "ID"),
+    ("fecha", "Fecha"),
+    ("idcliente", "Cliente"),
+    ("total", "Total"),
+    ("estado", "Estado"),
+    ("siigo_number", "Número Siigo"),
+    ("observaciones", "Observaciones"),
+]
+
+
+@facturas_bp.route("/facturas/exportar")
+def exportar_facturas():
+    if "token" not in session:
+        flash("Debes iniciar sesión primero", "warning")
+        return redirect(url_for("auth.login"))
+
+    try:
+        return exportacion.responder("/facturas", COLUMNAS_EXPORTACION, "facturas")
+    except ValueError as e:
+        flash(f"❌ Exportación inválida: {e}", "danger")
+    except Exception as e:
+        flash(f"Error conectando al backend: {e}", "danger")
+    return redirect(url_for("facturas.listar_facturas"))
+
+
 # ================== CREAR FACTURA ==================
+FORMULARIO_FACTURA = Esquema(
+    {
+        "idcliente": Campo(TEXTO),
+        "observaciones": Campo(TEXTO),
+        "idreserva": Campo(TEXTO),
+    },
+    detalles={
+        "idproducto": Campo(ENTERO),
+        "cantidad": Campo(FLOTANTE, defecto=0.0),
+        "valorunitario": Campo(DECIMAL, defecto=Decimal(0)),
+        "descripcion": Campo(TEXTO),
+        "descuento": Campo(FLOTANTE, defecto=0.0),
+        "impuesto_id": Campo(TEXTO),
+    },
+    pagos={
+        "idmedio": Campo(ENTERO),
+        "valor": Campo(DECIMAL, defecto=Decimal(0)),
+        "due_date": Campo(FECHA),
+        "siigo_pago_id": Campo(TEXTO),
+    },
+)
+
+
 @facturas_bp.route("/facturas/nueva", methods=["GET", "POST"])
 def crear_factura():
     if "token" not in session:
@@ -34,84 +94,44 @@ def crear_factura():
         return redirect(url_for("auth.login"))
 
     if request.method == "POST":
-        data = {
-            "idcliente": request.form.get("idcliente"),
+        form, errores = FORMULARIO_FACTURA.decodificar(request.form)
+        if errores:
+            for mensaje in formularios.mensajes_error(errores):
+                flash(mensaje, "danger")
+            return render_template("crear_factura.html")
+
+        # El subtotal se calcula en Decimal y se redondea a centavos
+        for d in form["detalles"]:
+            d["subtotal"] = float(formularios.dinero(Decimal(d["cantidad"]) * d["valorunitario"]))
+
+        data = FORMULARIO_FACTURA.a_json({
+            "idcliente": form["idcliente"],
             "idusuario": session.get("idusuario", 1),  # ⚠️ Mejor usar el idusuario real de la sesión
-            "observaciones": request.form.get("observaciones"),
-            "detalles": [],
-            "pagos": []
-        }
-
-        # Procesar detalles dinámicos
-        detalles_temp = {}
-        for key, value in request.form.items():
-            if key.startswith("detalles["):
-                parts = key.replace("detalles[", "").replace("]", "").split("[")
-                index, field = int(parts[0]), parts[1]
-                if index not in detalles_temp:
-                    detalles_temp[index] = {}
-                detalles_temp[index][field] = value
-
-        for d in detalles_temp.values():
-            cantidad = float(d.get("cantidad", 0))
-            valorunitario = float(d.get("valorunitario", 0))
-            subtotal = cantidad * valorunitario
-            data["detalles"].append({
-                "idproducto": int(d.get("idproducto")) if d.get("idproducto") else None,
-                "cantidad": cantidad,
-                "valorunitario": valorunitario,
-                "subtotal": subtotal,
-                "descripcion": d.get("descripcion"),
-                "descuento": float(d.get("descuento", 0)),
-                "impuesto_id": d.get("impuesto_id")
-            })
-
-        # Procesar pagos dinámicos
-        pagos_temp = {}
-        for key, value in request.form.items():
-            if key.startswith("pagos["):
-                parts = key.replace("pagos[", "").replace("]", "").split("[")
-                index, field = int(parts[0]), parts[1]
-                if index not in pagos_temp:
-                    pagos_temp[index] = {}
-                pagos_temp[index][field] = value
-
-        for p in pagos_temp.values():
-            data["pagos"].append({
-                "idmedio": int(p.get("idmedio")) if p.get("idmedio") else None,
-                "valor": float(p.get("valor", 0)),
-                "due_date": p.get("due_date"),
-                "siigo_pago_id": p.get("siigo_pago_id")
-            })
+            "observaciones": form["observaciones"],
+            "detalles": form["detalles"],
+            "pagos": form["pagos"]
+        })
 
         # Si la factura viene desde una reserva
-        idreserva = request.form.get("idreserva")
+        idreserva = form["idreserva"]
+
+        # Modo asíncrono: se encola y el cajero sigue el estado en otra página
+        if config.FACTURAS_ENVIO_ASINCRONO:
+            try:
+                id_trabajo = cola_facturas.encolar(data, idreserva)
+                return redirect(url_for("facturas.estado_trabajo", id_trabajo=id_trabajo))
+            except Exception as e:
+                flash(f"❌ Error encolando la factura: {e}", "danger")
+                return render_template("crear_factura.html")
 
         # Llamada al backend Node
         try:
-            headers = {
-                "Authorization": f"Bearer {session['token']}",
-                "Content-Type": "application/json"
-            }
-            response = requests.post(f"{config.API_URL}/facturas", headers=headers, json=data)
-
-            if response.status_code in [200, 201]:
-                flash("✅ Factura creada correctamente", "success")
-
-                # Si la factura viene de una reserva -> actualizar estado
-                if idreserva:
-                    patch_resp = requests.patch(
-                        f"{config.API_URL}/reservas/{idreserva}/facturar",
-                        headers={"Authorization": f"Bearer {session['token']}"}
-                    )
-                    if patch_resp.status_code == 200:
-                        flash("✅ Reserva asociada marcada como FACTURADA", "info")
-                    else:
-                        flash("⚠️ La factura se creó pero no se pudo actualizar la reserva", "warning")
+            response, mensajes = enviar_factura(data, idreserva)
+            for categoria, mensaje in mensajes:
+                flash(mensaje, categoria)
 
+            if factura_creada(response):
                 return redirect(url_for("facturas.listar_facturas"))
-            else:
-                flash(f"❌ Error al crear factura: {response.text}", "danger")
 
         except Exception as e:
             flash(f"❌ Error conectando al backend: {e}", "danger")
@@ -119,6 +139,124 @@ def crear_factura():
     return render_template("crear_factura.html")
 
 
+# ================== ESTADO DE FACTURA EN COLA ==================
+@facturas_bp.route("/facturas/trabajos/<id_trabajo>")
+def estado_trabajo(id_trabajo):
+    if "token" not in session:
+        flash("Debes iniciar sesión primero", "warning")
+        return redirect(url_for("auth.login"))
+
+    trabajo = cola_facturas.consultar(id_trabajo)
+    if trabajo is None:
+        flash("Factura en cola no encontrada ❌", "danger")
+        return redirect(url_for("facturas.listar_facturas"))
+    if trabajo["terminado"]:
+        return redirect(url_for("facturas.finalizar_trabajo", id_trabajo=id_trabajo))
+
+    return render_template("factura_trabajo.html", trabajo=trabajo)
+
+
+@facturas_bp.route("/facturas/trabajos/<id_trabajo>/estado")
+def estado_trabajo_json(id_trabajo):
+    if "token" not in session:
+        return jsonify({"error": "No autorizado"}), 401
+
+    trabajo = cola_facturas.consultar(id_trabajo)
+    if trabajo is None:
+        return jsonify({"error": "Trabajo no encontrado"}), 404
+    return jsonify({k: trabajo[k] for k in ("id", "estado", "terminado", "intentos")})
+
+
+@facturas_bp.route("/facturas/trabajos/<id_trabajo>/finalizar")
+def finalizar_trabajo(id_trabajo):
+    if "token" not in session:
+        flash("Debes iniciar sesión primero", "warning")
+        return redirect(url_for("auth.login"))
+
+    trabajo = cola_facturas.consultar(id_trabajo)
+    if trabajo is None or not trabajo["terminado"]:
+        return redirect(url_for("facturas.estado_trabajo", id_trabajo=id_trabajo))
+
+    # Mismos mensajes y destino que el modo síncrono
+    for categoria, mensaje in trabajo["mensajes"]:
+        flash(mensaje, categoria)
+    # INCIERTA: no volver al formulario, la factura pudo haberse creado
+    if trabajo["estado"] in (cola_facturas.COMPLETADO, cola_facturas.INCIERTA):
+        return redirect(url_for("facturas.listar_facturas"))
+    return redirect(url_for("facturas.crear_factura"))
+
+
+# ================== FACTURAR RESERVAS EN LOTE ==================
+@facturas_bp.route("/facturas/lote", methods=["POST"])
+def facturar_lote():
+    if "token" not in session:
+        flash("Debes iniciar sesión primero", "warning")
+        return redirect(url_for("auth.login"))
+
+    seleccion = {str(i) for i in request.form.getlist("reservas") if i}
+    fecha_inicio = request.form.get("fecha_inicio") or None
+    fecha_fin = request.form.get("fecha_fin") or None
+    volver = redirect(url_for("reservas.listar_reservas", fecha_inicio=fecha_inicio, fecha_fin=fecha_fin))
+
+    if not seleccion and not (fecha_inicio and fecha_fin):
+        flash("Selecciona reservas o un rango de fechas para facturar", "warning")
+        return volver
+
+    # Estado actual desde el backend: la caché por días es de cada worker y
+    # puede no saber que una reserva ya se facturó por crear_factura
+    params = {}
+    if fecha_inicio:
+        params["fecha_inicio"] = fecha_inicio
+    if fecha_fin:
+        params["fecha_fin"] = fecha_fin
+    try:
+        response = backend.get("/reservas", params=params)
+        response.raise_for_status()
+        reservas = response.json()
+    except Exception as e:
+        flash(f"❌ Error conectando al backend: {e}", "danger")
+        return volver
+
+    if seleccion:
+        reservas = [r for r in reservas if str(r.get("id", r.get("idreserva"))) in seleccion]
+    else:
+        reservas = [r for r in reservas if r.get("estado") == "RESERVADO"]
+
+    if not reservas:
+        flash("No hay reservas para facturar", "info")
+        return volver
+    if len(reservas) > config.LOTE_FACTURAS_MAXIMO:
+        flash(f"Máximo {config.LOTE_FACTURAS_MAXIMO} reservas por lote ({len(reservas)} seleccionadas)", "warning")
+        return volver
+
+    id_lote = lote_facturas.iniciar(reservas, idusuario=session.get("idusuario", 1))
+    return redirect(url_for("facturas.reporte_lote", id_lote=id_lote))
+
+
+@facturas_bp.route("/facturas/lotes/<id_lote>")
+def reporte_lote(id_lote):
+    if "token" not in session:
+        flash("Debes iniciar sesión primero", "warning")
+        return redirect(url_for("auth.login"))
+
+    lote = lote_facturas.reporte(id_lote)
+    if lote is None:
+        flash("Lote no encontrado ❌", "danger")
+        return redirect(url_for("reservas.listar_reservas"))
+    return render_template("facturas_lote.html", lote=lote)
+
+
+@facturas_bp.route("/facturas/lotes/<id_lote>/estado")
+def reporte_lote_json(id_lote):
+    if "token" not in session:
+        return jsonify({"error": "No autorizado"}), 401
+
+    lote = lote_facturas.reporte(id_lote)
+    if lote is None:
+        return jsonify({"error": "Lote no encontrado"}), 404
+    return jsonify(lote)
+
+
 # ================== DETALLE FACTURA ==================
 @facturas_bp.route("/facturas/<int:id>")
 def detalle_factura(id):
@@ -126,12 +264,17 @@ def detalle_factura(id):
         flash("Debes iniciar sesión primero", "warning")
         return redirect(url_for("auth.login"))
 
+    # Normalmente la factura ya vino en el listado
+    factura = entidades.facturas.obtener(id)
+    if factura is not None:
+        return render_template("detalle_factura.html", factura=factura)
+
     try:
-        headers = {"Authorization": f"Bearer {session['token']}"}
-        response = requests.get(f"{config.API_URL}/facturas/{id}", headers=headers)
+        response = backend.get(f"/facturas/{id}")
 
         if response.status_code == 200:
             factura = response.json()
+            entidades.facturas.guardar(factura)
             return render_template("detalle_factura.html", factura=factura)
         else:
             flash("Factura no encontrada ❌", "danger")
@@ -148,12 +291,15 @@ def proxy_buscar_cliente():
         return jsonify({"error": "No autorizado"}), 401
 
     identificacion = request.args.get("identificacion", "")
-    headers = {"Authorization": f"Bearer {session['token']}"}
+
+    # Mientras el índice de este usuario se construye, se consulta el backend
+    if indice.asegurar():
+        return json_condicional(indice.buscar(identificacion))
 
     try:
-        resp = requests.get(f"{config.API_URL}/clientes", headers=headers, params={"identificacion": identificacion})
+        resp = backend.get("/clientes", params={"identificacion": identificacion})
         if resp.status_code == 200:
-            return jsonify(resp.json())
+            return json_condicional(resp.json())
         else:
             return jsonify([]), 404
     except Exception as e:
@@ -166,13 +312,10 @@ def proxy_productos():
     if "token" not in session:
         return jsonify({"error": "No autorizado"}), 401
 
-    headers = {"Authorization": f"Bearer {session['token']}"}
     try:
-        resp = requests.get(f"{config.API_URL}/productos", headers=headers)
-        if resp.status_code == 200:
-            return jsonify(resp.json())
-        else:
-            return jsonify([]), 404
+        return json_condicional(catalogos.obtener("productos"))
+    except requests.HTTPError:
+        return jsonify([]), 404
     except Exception as e:
         print("❌ Error en proxy productos:", e)
         return jsonify({"error": "Backend no disponible"}), 500
@@ -183,13 +326,10 @@ def proxy_medios():
     if "token" not in session:
         return jsonify({"error": "No autorizado"}), 401
 
-    headers = {"Authorization": f"Bearer {session['token']}"}
     try:
-        resp = requests.get(f"{config.API_URL}/medios", headers=headers)
-        if resp.status_code == 200:
-            return jsonify(resp.json())
-        else:
-            return jsonify([]), 404
+        return json_condicional(catalogos.obtener("medios"))
+    except requests.HTTPError:
+        return jsonify([]), 404
     except Exception as e:
         print("❌ Error en proxy medios:", e)
         return jsonify({"error": "Backend no disponible"}), 500
@@ -0,0 +1,9 @@
+from flask import Blueprint, Response
+from services import metricas
+
+metricas_bp = Blueprint("metricas", __name__)
+
+# ================== MÉTRICAS (Prometheus) ==================
+@metricas_bp.route("/metrics")
+def exportar():
+    return Response(metricas.registro.exportar(), mimetype="text/plain; version=0.0.4")
@@ -1,66 +1,70 @@
-from flask import Blueprint, render_template, request, redirect, url_for, jsonify
-import requests
+from datetime import date
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, session
+from services import backend, catalogos, fragmentos, kpis, reservas_dias
+from services.backend import MENSAJE_OBSOLETO
+from services.fanout import fanout
+from services.indice_clientes import indice
+from services.respuestas import json_condicional
 
 reservas_bp = Blueprint("reservas", __name__, url_prefix="/reservas")
 
-API_URL = "http://localhost:3000/api/reservas"
-API_CLIENTES = "http://localhost:3000/api/clientes"
-API_MEDIOS = "http://localhost:3000/api/medios"
-API_PRODUCTOS = "http://localhost:3000/api/productos"
-
 # ================== GET: Listar Reservas ==================
 @reservas_bp.route("/", methods=["GET"])
 def listar_reservas():
     fecha_inicio = request.args.get("fecha_inicio")
     fecha_fin = request.args.get("fecha_fin")
 
-    reservas = []
-    try:
-        params = {}
-        if fecha_inicio:
-            params["fecha_inicio"] = fecha_inicio
-        if fecha_fin:
-            params["fecha_fin"] = fecha_fin
+    # Reservas, medios de pago y productos son independientes: se piden en paralelo
+    resultados = fanout({
+        "reservas": lambda: reservas_dias.consultar(fecha_inicio, fecha_fin),
+        "medios": lambda: catalogos.obtener("medios"),
+        "productos": lambda: catalogos.obtener("productos"),
+    })
 
-        response = requests.get(API_URL, params=params)
-        reservas = response.json()
-    except Exception as e:
-        print("❌ Error consultando backend reservas:", e)
+    reservas = []
+    if resultados["reservas"].ok:
+        reservas, obsoleto = resultados["reservas"].valor
+        if obsoleto:
+            flash(MENSAJE_OBSOLETO, "warning")
+        else:
+            kpis.reservas.registrar_lista(reservas)
+    else:
+        print("❌ Error consultando backend reservas:", resultados["reservas"].error)
 
-    # Medios de pago y productos
-    medios, productos = [], []
-    try:
-        medios = requests.get(API_MEDIOS).json()
-    except Exception as e:
-        print("❌ Error consultando backend medios:", e)
-    try:
-        productos = requests.get(API_PRODUCTOS).json()
-    except Exception as e:
-        print("❌ Error consultando backend productos:", e)
+    datos = {}
+    for nombre in ("medios", "productos"):
+        if resultados[nombre].ok:
+            datos[nombre] = resultados[nombre].valor
+        else:
+            print(f"❌ Error consultando backend {nombre}:", resultados[nombre].error)
+            datos[nombre] = []
 
     return render_template(
         "reservas.html",
         reservas=reservas,
-        medios=medios,
-        productos=productos,
+        medios=datos["medios"],
+        productos=datos["productos"],
         request=request
     )
 
 # ================== POST: Crear Reserva ==================
 @reservas_bp.route("/crear", methods=["POST"])
 def crear_reserva():
+    destino = url_for("reservas.listar_reservas")
     try:
         idcliente = request.form.get("idcliente")  # capturamos hidden
         identificacion = request.form.get("identificacion")
 
         if not idcliente:
             # fallback: buscar por identificación si hidden no se llenó
-            cliente_resp = requests.get(API_CLIENTES, params={"identificacion": identificacion})
+            cliente_resp = backend.get("/clientes", params={"identificacion": identificacion})
             cliente_data = cliente_resp.json()
 
             if not cliente_data or len(cliente_data) == 0:
                 print("⚠️ Cliente no encontrado")
-                return redirect(url_for("reservas.listar_reservas"))
+                if fragmentos.pedido():
+                    return fragmentos.responder("⚠️ Cliente no encontrado", "warning", destino, status=404)
+                return redirect(destino)
 
             idcliente = cliente_data[0]["idcliente"]
 
@@ -73,25 +77,75 @@ def crear_reserva():
             "idusuario": 1,
             "observaciones": ""
         }
-        requests.post(API_URL, json=data)
+        response = backend.post("/reservas", json=data)
+        if response.status_code in (200, 201):
+            creada = dict(data, **response.json())
+            kpis.reservas.registrar(creada, dia=date.today())
+            fila = _fila_reserva(creada, identificacion)
+            if fila is not None:
+                reservas_dias.agregar(fila)
+            else:
+                reservas_dias.invalidar_hoy()
+            return fragmentos.responder("✅ Reserva creada", "success", destino,
+                                        macro="fila_reserva", entidad=fila, status=201)
+        reservas_dias.invalidar_hoy()
+        return fragmentos.responder("❌ Error creando reserva", "danger", destino, status=response.status_code)
     except Exception as e:
         print("❌ Error creando reserva:", e)
+        reservas_dias.invalidar_hoy()
+        if fragmentos.pedido():
+            return fragmentos.responder(f"❌ Error creando reserva: {e}", "danger", destino, status=502)
+
+    return redirect(destino)
+
 
-    return redirect(url_for("reservas.listar_reservas"))
+def _nombre_catalogo(nombre, clave, valor):
+    """Nombre de un producto o medio de pago por id, desde el catálogo en caché."""
+    try:
+        for item in catalogos.obtener(nombre):
+            if str(item.get(clave)) == str(valor):
+                return item.get("nombre")
+    except Exception as e:
+        print(f"⚠️ Catálogo {nombre} no disponible:", e)
+    return None
+
+
+def _fila_reserva(creada, identificacion):
+    """Fila como las del listado (cliente, producto y medio por nombre) para una reserva recién creada."""
+    fila = dict(creada)
+    fila.setdefault("valor", creada.get("valorreserva"))
+    fila.setdefault("estado", "RESERVADO")
+    if "id" not in fila and "idreserva" in fila:
+        fila["id"] = fila["idreserva"]
+    if not fila.get("cliente"):
+        resumen = indice.resumen(creada.get("idcliente"))
+        fila["cliente"] = (resumen or {}).get("nombrecompleto") or identificacion or ""
+    if not fila.get("producto"):
+        fila["producto"] = _nombre_catalogo("productos", "idproducto", creada.get("idproducto"))
+    if not fila.get("medio"):
+        fila["medio"] = _nombre_catalogo("medios", "idmedio", creada.get("idmedio"))
+    return fila if fila.get("id") is not None else None
 
 # ================== GET: Buscar clientes (proxy) ==================
 @reservas_bp.route("/clientes", methods=["GET"])
 def buscar_clientes():
+    if "token" not in session:
+        return jsonify({"error": "No autorizado"}), 401
+
     identificacion = request.args.get("identificacion", "")
+    # Mientras el índice de este usuario se construye, se consulta el backend
+    if indice.asegurar():
+        return json_condicional(indice.buscar(identificacion))
+
     clientes = []
     try:
         params = {}
         if identificacion:
             params["identificacion"] = identificacion
-        resp = requests.get(API_CLIENTES, params=params)
+        resp = backend.get("/clientes", params=params)
         if resp.status_code == 200:
             clientes = resp.json()
     except Exception as e:
         print("❌ Error consultando backend clientes:", e)
 
-    return jsonify(clientes)
+    return json_condicional(clientes)
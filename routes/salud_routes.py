@@ -0,0 +1,21 @@
+from flask import Blueprint, current_app, jsonify
+from services import calentamiento
+
+salud_bp = Blueprint("salud", __name__)
+
+# ================== LIVENESS ==================
+@salud_bp.route("/healthz")
+def healthz():
+    # El proceso responde; no mira el backend (eso es /readyz)
+    return jsonify({"ok": True})
+
+# ================== READINESS ==================
+@salud_bp.route("/readyz")
+def readyz():
+    estado = calentamiento.estado()
+    if not estado["listo"]:
+        # Sin gunicorn.conf.py (servidor de desarrollo, otro WSGI) nadie lo calentó
+        calentamiento.calentar_en_segundo_plano(current_app._get_current_object())
+    estado["backend"] = calentamiento.backend_disponible()
+    listo = estado["listo"] and estado["backend"]
+    return jsonify(dict(estado, listo=listo)), 200 if listo else 503
@@ -1,6 +1,5 @@
 from flask import Blueprint, render_template, session, redirect, url_for, flash
-import requests
-import config
+from services import backend
 
 usuarios_bp = Blueprint("usuarios", __name__)
 
@@ -11,8 +10,7 @@ def listar_usuarios():
         return redirect(url_for("auth.login"))
 
     try:
-        headers = {"Authorization": f"Bearer {session['token']}"}
-        response = requests.get(f"{config.API_URL}/usuarios", headers=headers)
+        response = backend.get("/usuarios")
 
         if response.status_code == 200:
             usuarios = response.json()
@@ -0,0 +1,232 @@
+# Control de admisión por ruta del backend (primer segmento: /facturas, /clientes...).
+#
+# Cada ruta tiene un máximo de llamadas simultáneas por worker
+# (ADMISION_LIMITES, o ADMISION_LIMITE_DEFECTO). Las que sobran esperan en una
+# cola acotada (ADMISION_COLA_MAX) ordenada por prioridad y luego por llegada:
+#
+#   alta   login y autocompletado (las pide alguien escribiendo)
+#   normal el resto
+#   baja   listados pesados, lotes y trabajos en segundo plano
+#
+# Cada prioridad tiene un presupuesto de espera (ADMISION_ESPERA). Si se vence,
+# o la cola está llena y no hay nadie de menor prioridad a quien desplazar, se
+# lanza Sobrecarga. Es un ConnectionError, así que el respaldo de datos
+# obsoletos, la cola de facturas y los lotes la tratan como "no se llamó al
+# backend". Si nadie la atiende, init_app la convierte en 503 con Retry-After
+# (JSON) o en un flash + redirect (HTML).
+import heapq
+import itertools
+import math
+import threading
+import time
+
+import requests
+from flask import flash, g, has_request_context, jsonify, redirect, request, url_for
+
+import config
+from services import metricas
+from services.circuito import nombre_circuito
+
+PRIORIDADES = {"alta": 0, "normal": 1, "baja": 2}
+NOMBRES = {v: k for k, v in PRIORIDADES.items()}
+
+
+class Sobrecarga(requests.ConnectionError):
+    """No se llamó al backend: la ruta está saturada en este worker."""
+
+    def __init__(self, ruta, reintentar):
+        self.ruta = ruta
+        self.reintentar = reintentar
+        super().__init__(f"⏳ Hay mucha carga en {ruta}; intenta de nuevo en {reintentar} s")
+
+
+class _Espera:
+    __slots__ = ("prioridad", "orden", "evento", "estado")
+
+    def __init__(self, prioridad, orden):
+        self.prioridad = prioridad
+        self.orden = orden
+        self.evento = threading.Event()
+        self.estado = None       # "admitida" | "desplazada"
+
+    def __lt__(self, otra):
+        return (self.prioridad, self.orden) < (otra.prioridad, otra.orden)
+
+
+class Limitador:
+    def __init__(self, nombre, limite, max_cola):
+        self.nombre = nombre
+        self.limite = limite
+        self.max_cola = max_cola
+        self.en_curso = 0
+        self._cola = []
+        self._orden = itertools.count()
+        self._lock = threading.Lock()
+        self.duracion_media = 0.1    # EWMA de la duración de las llamadas, para Retry-After
+        self.admitidas = 0
+        self.encoladas = 0
+        self.rechazadas = {"cola_llena": 0, "vencida": 0, "desplazada": 0}
+
+    def entrar(self, prioridad):
+        """Bloquea hasta tener turno. Lanza Sobrecarga si no llega dentro del presupuesto."""
+        with self._lock:
+            if self.en_curso < self.limite and not self._cola:
+                self.en_curso += 1
+                self.admitidas += 1
+                return 0.0
+
+            if len(self._cola) >= self.max_cola:
+                peor = max(self._cola)
+                if peor.prioridad <= prioridad:
+                    raise self._rechazar("cola_llena", prioridad)
+                # Se desplaza a la espera de menor prioridad (la más nueva)
+                self._cola.remove(peor)
+                heapq.heapify(self._cola)
+                peor.estado = "desplazada"
+                peor.evento.set()
+
+            espera = _Espera(prioridad, next(self._orden))
+            heapq.heappush(self._cola, espera)
+            self.encoladas += 1
+
+        inicio = time.monotonic()
+        espera.evento.wait(_presupuesto(prioridad))
+
+        with self._lock:
+            if espera.estado == "admitida":
+                self.admitidas += 1
+                return time.monotonic() - inicio
+            if espera.estado == "desplazada":
+                raise self._rechazar("desplazada", prioridad)
+            self._cola.remove(espera)
+            heapq.heapify(self._cola)
+            raise self._rechazar("vencida", prioridad)
+
+    def salir(self, segundos=None):
+        with self._lock:
+            if segundos is not None:
+                self.duracion_media += (segundos - self.duracion_media) * 0.2
+            # El cupo pasa directo a la siguiente espera, si hay
+            while self._cola:
+                siguiente = heapq.heappop(self._cola)
+                if siguiente.estado is None:
+                    siguiente.estado = "admitida"
+                    siguiente.evento.set()
+                    return
+            self.en_curso -= 1
+
+    def _rechazar(self, motivo, prioridad):
+        self.rechazadas[motivo] += 1
+        metricas.registro.incrementar(
+            "admision_rechazadas_total", ruta=self.nombre, motivo=motivo, prioridad=NOMBRES[prioridad]
+        )
+        reintentar = self.duracion_media * (len(self._cola) + 1) / max(1, self.limite)
+        return Sobrecarga(self.nombre, min(30, max(1, math.ceil(reintentar))))
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                "limite": self.limite,
+                "en_curso": self.en_curso,
+                "en_cola": len(self._cola),
+                "max_cola": self.max_cola,
+                "admitidas": self.admitidas,
+                "encoladas": self.encoladas,
+                "rechazadas": dict(self.rechazadas),
+                "duracion_media": round(self.duracion_media, 4),
+            }
+
+
+_limitadores = {}
+_lock = threading.Lock()
+
+
+def _presupuesto(prioridad):
+    return config.ADMISION_ESPERA.get(NOMBRES[prioridad], config.ADMISION_ESPERA["normal"])
+
+
+def para(ruta):
+    nombre = nombre_circuito(ruta)
+    limitador = _limitadores.get(nombre)
+    if limitador is None:
+        with _lock:
+            limitador = _limitadores.get(nombre)
+            if limitador is None:
+                limite = config.ADMISION_LIMITES.get(nombre, config.ADMISION_LIMITE_DEFECTO)
+                limitador = _limitadores[nombre] = Limitador(nombre, limite, config.ADMISION_COLA_MAX)
+    return limitador
+
+
+def prioridad_actual():
+    """Prioridad de la petición de Flask en curso; fuera de una petición, baja."""
+    if not has_request_context():
+        return PRIORIDADES["baja"]
+    return PRIORIDADES[config.ADMISION_PRIORIDADES.get(request.endpoint, "normal")]
+
+
+def admitir(ruta):
+    """Pide turno para llamar a `ruta`. Devuelve el limitador (llamar .salir al terminar) o None."""
+    if not config.ADMISION_HABILITADA:
+        return None
+    limitador = para(ruta)
+    try:
+        espera = limitador.entrar(prioridad_actual())
+    except Sobrecarga as e:
+        if has_request_context():
+            g.sobrecarga = e
+        raise
+    if espera:
+        metricas.registro.histograma("admision_espera_segundos", ruta=limitador.nombre).observar(espera)
+    return limitador
+
+
+def estadisticas():
+    return {nombre: l.estadisticas() for nombre, l in sorted(_limitadores.items())}
+
+
+def _medidas():
+    for nombre, limitador in sorted(_limitadores.items()):
+        datos = limitador.estadisticas()
+        yield "admision_en_cola", {"ruta": nombre}, datos["en_cola"]
+        yield "admision_en_curso", {"ruta": nombre}, datos["en_curso"]
+
+
+metricas.registro.describir("admision_en_cola", "gauge", "Llamadas esperando turno por ruta del backend")
+metricas.registro.describir("admision_en_curso", "gauge", "Llamadas en curso por ruta del backend")
+metricas.registro.describir("admision_rechazadas_total", "counter", "Llamadas descartadas por sobrecarga")
+metricas.registro.describir("admision_espera_segundos", "histogram", "Tiempo en cola antes de llamar al backend")
+metricas.registro.medidor(_medidas)
+
+
+# ================== FLASK ==================
+def _quiere_html():
+    return "text/html" in request.headers.get("Accept", "")
+
+
+def _sobrecarga(error):
+    if _quiere_html():
+        flash(f"⏳ El sistema está muy ocupado; intenta de nuevo en {error.reintentar} s", "warning")
+        destino = url_for("dashboard.index") if request.endpoint != "dashboard.index" else url_for("auth.login")
+        respuesta = redirect(destino)
+    else:
+        respuesta = jsonify({"error": "Servicio sobrecargado", "reintentar": error.reintentar})
+        respuesta.status_code = 503
+    respuesta.headers["Retry-After"] = str(error.reintentar)
+    return respuesta
+
+
+def _despues(respuesta):
+    # La vista atrapó la Sobrecarga y respondió un error JSON genérico: 503 rápido
+    error = g.get("sobrecarga")
+    if error is None:
+        return respuesta
+    if respuesta.mimetype == "application/json" and respuesta.status_code >= 500:
+        return _sobrecarga(error)
+    if respuesta.status_code >= 400:
+        respuesta.headers["Retry-After"] = str(error.reintentar)
+    return respuesta
+
+
+def init_app(app):
+    app.register_error_handler(Sobrecarga, _sobrecarga)
+    app.after_request(_despues)
@@ -0,0 +1,241 @@
+# Cliente HTTP compartido hacia el backend Express.
+#
+# Todas las rutas usan este módulo en lugar de llamar requests.get/post directo:
+# mantiene un pool de conexiones keep-alive por worker, aplica timeouts de
+# conexión/lectura, reintenta solo métodos idempotentes y agrega el token
+# Bearer de la sesión automáticamente. Los GET idénticos y simultáneos dentro
+# del worker se colapsan en una sola llamada (single-flight).
+#
+# Cada ruta tiene su circuit breaker (services/circuito.py). Las vistas de solo
+# lectura pueden pedir `respaldo=True`: si el backend falla o el circuito está
+# abierto se devuelve la última respuesta buena marcada con `obsoleto = True`.
+#
+# Con varias URLs en config.API_URLS cada llamada va a la réplica que elija
+# services/balanceo.py; un GET/PUT/DELETE que no logra conectar se reintenta
+# una vez en otra réplica.
+import copy
+import hashlib
+import os
+import threading
+import time
+
+import requests
+from flask import has_request_context, session
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import config
+from services import admision, balanceo, circuito, metricas
+from services.cache import CacheTTL
+from services.singleflight import Grupo
+
+METODOS_IDEMPOTENTES = frozenset(["GET", "HEAD", "OPTIONS", "PUT", "DELETE"])
+
+MENSAJE_OBSOLETO = "⚠️ El backend no responde: se muestran los últimos datos guardados"
+
+# Marca para "usar el token de la sesión actual"
+DE_SESION = object()
+
+_estado = {"pid": None, "sesion": None}
+_lock = threading.Lock()
+
+# GETs en vuelo compartidos entre hilos del worker
+vuelos = Grupo()
+
+# Últimas respuestas buenas de las vistas de solo lectura
+respaldos = CacheTTL(
+    "respaldo",
+    ttl=config.RESPALDO_TTL,
+    max_entradas=config.RESPALDO_MAX_ENTRADAS,
+)
+
+
+def _crear_sesion():
+    reintentos = Retry(
+        total=config.API_REINTENTOS,
+        backoff_factor=config.API_BACKOFF,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=METODOS_IDEMPOTENTES,
+        raise_on_status=False,
+    )
+    adaptador = HTTPAdapter(
+        pool_connections=config.API_POOL_CONEXIONES,
+        pool_maxsize=config.API_POOL_MAXSIZE,
+        max_retries=reintentos,
+    )
+    sesion = requests.Session()
+    sesion.mount("http://", adaptador)
+    sesion.mount("https://", adaptador)
+    return sesion
+
+
+def obtener_sesion():
+    """Sesión HTTP del worker actual (se recrea tras un fork de gunicorn)."""
+    pid = os.getpid()
+    if _estado["pid"] != pid:
+        with _lock:
+            if _estado["pid"] != pid:
+                _estado["sesion"] = _crear_sesion()
+                _estado["pid"] = pid
+    return _estado["sesion"]
+
+
+def es_absoluta(ruta):
+    return ruta.startswith(("http://", "https://"))
+
+
+def url(ruta, base=None):
+    if es_absoluta(ruta):
+        return ruta
+    return f"{base or config.API_URLS[0]}{ruta}"
+
+
+def token_actual():
+    if has_request_context():
+        return session.get("token")
+    return None
+
+
+def alcance(token):
+    """Identificador corto del token, para separar datos de distintos usuarios en claves de caché."""
+    if not token:
+        return "anonimo"
+    return hashlib.sha256(token.encode()).hexdigest()[:16]
+
+
+def _clave(metodo, ruta, token, headers, params):
+    if isinstance(params, dict):
+        params = sorted((k, str(v)) for k, v in params.items())
+    extra = sorted((k.lower(), v) for k, v in headers.items() if k != "Authorization")
+    return (metodo, ruta, repr(params), alcance(token), tuple(extra))
+
+
+def _en_replica(metodo, ruta, afinidad, headers, timeout, kwargs):
+    """Hace la llamada en la réplica que toque; si no conecta, prueba otra (solo idempotentes)."""
+    sesion = obtener_sesion()
+    if es_absoluta(ruta):
+        return sesion.request(metodo, ruta, headers=headers, timeout=timeout, **kwargs)
+
+    balanceador = balanceo.balanceador
+    usadas = []
+    while True:
+        replica = balanceador.elegir(metodo, afinidad, excluir=usadas)
+        inicio = time.perf_counter()
+        estado = "error"
+        try:
+            response = sesion.request(metodo, url(ruta, replica.base), headers=headers, timeout=timeout, **kwargs)
+            estado = response.status_code
+            return response
+        except requests.ConnectionError:
+            usadas.append(replica.base)
+            if metodo not in METODOS_IDEMPOTENTES or len(usadas) >= min(2, len(balanceador.replicas)):
+                raise
+            balanceador.reintento(replica, metodo, ruta)
+        finally:
+            balanceador.terminar(replica, estado, time.perf_counter() - inicio)
+
+
+def _enviar(metodo, ruta, afinidad, headers, timeout, kwargs):
+    turno = admision.admitir(ruta)
+    try:
+        protector = circuito.para(ruta)
+        protector.antes()
+    except Exception:
+        if turno is not None:
+            turno.salir()
+        raise
+
+    inicio = time.perf_counter()
+    estado = "error"
+    try:
+        response = _en_replica(metodo, ruta, afinidad, headers, timeout, kwargs)
+        if not kwargs.get("stream"):
+            response.content  # leer el cuerpo para poder compartir la respuesta entre hilos
+        estado = response.status_code
+        return response
+    finally:
+        segundos = time.perf_counter() - inicio
+        if turno is not None:
+            turno.salir(segundos)
+        protector.despues(estado != "error" and circuito.es_exito(estado, segundos))
+        metricas.observar_upstream(metodo, ruta, estado, segundos)
+
+
+def _obsoleta(response):
+    copia = copy.copy(response)
+    copia.obsoleto = True
+    return copia
+
+
+def es_obsoleta(response):
+    return getattr(response, "obsoleto", False)
+
+
+def _con_respaldo(clave, llamar):
+    try:
+        response = llamar()
+    except requests.RequestException:
+        guardada = respaldos.consultar(clave)
+        if guardada is None:
+            raise
+        return _obsoleta(guardada)
+
+    if response.status_code == 200:
+        respaldos.guardar(clave, response)
+    elif response.status_code >= 500:
+        guardada = respaldos.consultar(clave)
+        if guardada is not None:
+            return _obsoleta(guardada)
+    return response
+
+
+def request(metodo, ruta, token=DE_SESION, headers=None, timeout=None, respaldo=False, **kwargs):
+    """Hace una petición al backend. `ruta` es relativa a la URL base del backend (ej. "/clientes")."""
+    if token is DE_SESION:
+        token = token_actual()
+
+    headers = dict(headers or {})
+    if token and "Authorization" not in headers:
+        headers["Authorization"] = f"Bearer {token}"
+
+    if timeout is None:
+        timeout = (config.API_TIMEOUT_CONEXION, config.API_TIMEOUT_LECTURA)
+
+    afinidad = alcance(token) if token else None
+
+    def enviar():
+        return _enviar(metodo, ruta, afinidad, headers, timeout, kwargs)
+
+    if metodo != "GET" or kwargs.get("stream"):
+        return enviar()
+
+    clave = _clave(metodo, ruta, token, headers, kwargs.get("params"))
+
+    def llamar():
+        if config.API_SINGLE_FLIGHT:
+            return vuelos.hacer(clave, enviar)
+        return enviar()
+
+    if respaldo:
+        return _con_respaldo(clave, llamar)
+    return llamar()
+
+
+def get(ruta, **kwargs):
+    return request("GET", ruta, **kwargs)
+
+
+def post(ruta, **kwargs):
+    return request("POST", ruta, **kwargs)
+
+
+def put(ruta, **kwargs):
+    return request("PUT", ruta, **kwargs)
+
+
+def patch(ruta, **kwargs):
+    return request("PATCH", ruta, **kwargs)
+
+
+def delete(ruta, **kwargs):
+    return request("DELETE", ruta, **kwargs)
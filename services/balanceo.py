@@ -0,0 +1,206 @@
+# Balanceo entre varias réplicas del backend Express (config.API_URLS).
+#
+# Elección: "power of two choices". Se toman dos réplicas disponibles al azar y
+# se usa la que tiene menos peticiones en vuelo desde este worker (a igualdad,
+# la de menor latencia media). Con una sola URL no hay nada que elegir.
+#
+# Salud pasiva: un error de conexión/timeout o un 502/503/504 suma un fallo;
+# tras BALANCEO_FALLOS seguidos la réplica se expulsa BALANCEO_EXPULSION_BASE
+# segundos, el doble en cada expulsión siguiente (hasta BALANCEO_EXPULSION_MAX).
+# Salud activa: un hilo por worker pide BALANCEO_SONDA_RUTA a cada réplica
+# cada BALANCEO_SONDA_INTERVALO segundos; cualquier respuesta < 500 cuenta como
+# viva y readmite antes de tiempo a una réplica expulsada. Si todas están
+# expulsadas se reparte entre todas (mejor intentar que fallar seguro).
+#
+# Afinidad: las escrituras (POST, PUT, PATCH, DELETE) de un usuario van a la misma réplica,
+# y sus lecturas también durante BALANCEO_AFINIDAD_TTL segundos después de
+# escribir, para que vea lo que acaba de guardar aunque las réplicas tarden en
+# ponerse de acuerdo.
+#
+# Los reintentos en otra réplica se cuentan en balanceo_reintentos_total; el
+# aviso en el log sale como mucho una vez por réplica cada
+# BALANCEO_AVISO_INTERVALO segundos.
+import logging
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+
+import requests
+
+import config
+from services import metricas
+
+FALLOS_HTTP = frozenset([502, 503, 504])
+MAX_AFINIDADES = 10000
+
+log = logging.getLogger(__name__)
+
+
+class Replica:
+    def __init__(self, base):
+        self.base = base
+        self.en_vuelo = 0
+        self.latencia = 0.0          # EWMA en segundos
+        self.fallos = 0
+        self.expulsada_hasta = 0.0
+        self.expulsiones = 0
+        self.ultima_expulsion = 0.0
+        self.peticiones = 0
+        self.errores = 0
+        self.ultimo_aviso = None
+
+    def disponible(self, ahora):
+        return ahora >= self.expulsada_hasta
+
+    def estadisticas(self, ahora):
+        return {
+            "en_vuelo": self.en_vuelo,
+            "disponible": self.disponible(ahora),
+            "expulsada_por": round(max(0.0, self.expulsada_hasta - ahora), 1),
+            "expulsiones": self.expulsiones,
+            "fallos_seguidos": self.fallos,
+            "latencia_media": round(self.latencia, 4),
+            "peticiones": self.peticiones,
+            "errores": self.errores,
+        }
+
+
+class Balanceador:
+    def __init__(self, urls):
+        self.replicas = [Replica(u) for u in urls]
+        self._por_base = {r.base: r for r in self.replicas}
+        self._afinidad = OrderedDict()   # alcance -> (base, expira)
+        self._lock = threading.Lock()
+        self._sonda = {"pid": None}
+
+    # ---------- elección ----------
+    def elegir(self, metodo, alcance=None, excluir=()):
+        """Réplica para esta llamada. Llamar a terminar() con el resultado."""
+        if len(self.replicas) > 1:
+            self._iniciar_sonda()
+        escritura = metodo not in ("GET", "HEAD", "OPTIONS")
+        ahora = time.monotonic()
+        with self._lock:
+            replica = None
+            fija = self._afinidad.get(alcance) if alcance else None
+            if fija is not None and ahora < fija[1]:
+                candidata = self._por_base[fija[0]]
+                if candidata.disponible(ahora) and candidata.base not in excluir:
+                    replica = candidata
+            if replica is None:
+                replica = self._dos_opciones(ahora, excluir)
+            if escritura and alcance:
+                self._afinidad[alcance] = (replica.base, ahora + config.BALANCEO_AFINIDAD_TTL)
+                self._afinidad.move_to_end(alcance)
+                while len(self._afinidad) > MAX_AFINIDADES:
+                    self._afinidad.popitem(last=False)
+            replica.en_vuelo += 1
+            replica.peticiones += 1
+            return replica
+
+    def _dos_opciones(self, ahora, excluir):
+        candidatas = [r for r in self.replicas if r.disponible(ahora) and r.base not in excluir]
+        if not candidatas:
+            candidatas = [r for r in self.replicas if r.base not in excluir] or self.replicas
+        if len(candidatas) > 2:
+            candidatas = random.sample(candidatas, 2)
+        return min(candidatas, key=lambda r: (r.en_vuelo, r.latencia))
+
+    def reintento(self, replica, metodo, ruta):
+        """La llamada no conectó con `replica` y se repite en otra."""
+        metricas.registro.incrementar("balanceo_reintentos_total", replica=replica.base)
+        ahora = time.monotonic()
+        with self._lock:
+            if replica.ultimo_aviso is not None and ahora - replica.ultimo_aviso < config.BALANCEO_AVISO_INTERVALO:
+                return
+            replica.ultimo_aviso = ahora
+        log.warning("%s no responde, reintentando %s %s en otra réplica", replica.base, metodo, ruta)
+
+    # ---------- salud pasiva ----------
+    def terminar(self, replica, estado, segundos):
+        """`estado` es el código HTTP, o "error" si la llamada lanzó excepción."""
+        fallo = estado == "error" or estado in FALLOS_HTTP
+        with self._lock:
+            replica.en_vuelo -= 1
+            if not fallo:
+                replica.latencia += (segundos - replica.latencia) * 0.2
+            self._registrar(replica, not fallo)
+
+    def _registrar(self, replica, exito):
+        ahora = time.monotonic()
+        if exito:
+            replica.fallos = 0
+            # Una réplica que lleva un rato sana vuelve a empezar el backoff desde cero
+            if replica.expulsiones and ahora - replica.ultima_expulsion > config.BALANCEO_EXPULSION_MAX:
+                replica.expulsiones = 0
+            return
+        replica.errores += 1
+        replica.fallos += 1
+        if replica.fallos >= config.BALANCEO_FALLOS and replica.disponible(ahora) and len(self.replicas) > 1:
+            espera = min(
+                config.BALANCEO_EXPULSION_MAX,
+                config.BALANCEO_EXPULSION_BASE * 2 ** replica.expulsiones,
+            )
+            replica.expulsada_hasta = ahora + espera
+            replica.ultima_expulsion = ahora
+            replica.expulsiones += 1
+            replica.fallos = 0
+            metricas.registro.incrementar("balanceo_expulsiones_total", replica=replica.base)
+            log.warning("Réplica %s expulsada %.0f s", replica.base, espera)
+
+    # ---------- salud activa ----------
+    def _iniciar_sonda(self):
+        pid = os.getpid()
+        if self._sonda["pid"] == pid:
+            return
+        with self._lock:
+            if self._sonda["pid"] == pid:
+                return
+            threading.Thread(target=self._sondear, name="balanceo-sonda", daemon=True).start()
+            self._sonda["pid"] = pid
+
+    def _sondear(self):
+        sesion = requests.Session()
+        while True:
+            time.sleep(config.BALANCEO_SONDA_INTERVALO)
+            for replica in self.replicas:
+                try:
+                    vivo = sesion.get(
+                        f"{replica.base}{config.BALANCEO_SONDA_RUTA}",
+                        timeout=config.BALANCEO_SONDA_TIMEOUT,
+                        headers={"Connection": "close"},   # probar una conexión nueva, no una reciclada
+                    ).status_code < 500
+                except requests.RequestException:
+                    vivo = False
+                with self._lock:
+                    if vivo and not replica.disponible(time.monotonic()):
+                        replica.expulsada_hasta = 0.0
+                        log.warning("Réplica %s readmitida por la sonda", replica.base)
+                    self._registrar(replica, vivo)
+
+    def estadisticas(self):
+        ahora = time.monotonic()
+        with self._lock:
+            return {r.base: r.estadisticas(ahora) for r in self.replicas}
+
+
+balanceador = Balanceador(config.API_URLS)
+
+
+def estadisticas():
+    return balanceador.estadisticas()
+
+
+def _medidas():
+    for base, datos in balanceador.estadisticas().items():
+        yield "balanceo_en_vuelo", {"replica": base}, datos["en_vuelo"]
+        yield "balanceo_disponible", {"replica": base}, int(datos["disponible"])
+
+
+metricas.registro.describir("balanceo_en_vuelo", "gauge", "Peticiones en vuelo por réplica del backend")
+metricas.registro.describir("balanceo_disponible", "gauge", "1 si la réplica recibe tráfico, 0 si está expulsada")
+metricas.registro.describir("balanceo_expulsiones_total", "counter", "Expulsiones de réplicas por fallos seguidos")
+metricas.registro.describir("balanceo_reintentos_total", "counter", "Llamadas repetidas en otra réplica porque esta no conectó")
+metricas.registro.medidor(_medidas)
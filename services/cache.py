@@ -0,0 +1,119 @@
+# Caché en memoria (por worker) con TTL por clave, stale-while-revalidate y LRU.
+#
+# - Dentro del TTL la entrada se sirve tal cual (hit).
+# - Vencido el TTL pero dentro de la ventana "obsoleta" se sirve el valor viejo
+#   y se refresca en segundo plano (un solo refresco por clave a la vez).
+# - Pasada la ventana obsoleta se recarga de forma síncrona (miss).
+# - Al superar `max_entradas` se descarta la entrada usada hace más tiempo.
+import threading
+import time
+from collections import OrderedDict
+
+# Todas las cachés creadas, por nombre (para /admin/cache)
+registro = {}
+
+
+class _Entrada:
+    __slots__ = ("valor", "fresco_hasta", "expira", "ttl")
+
+    def __init__(self, valor, ttl, ttl_obsoleto):
+        ahora = time.monotonic()
+        self.valor = valor
+        self.ttl = ttl
+        self.fresco_hasta = ahora + ttl
+        self.expira = ahora + ttl + ttl_obsoleto
+
+
+class CacheTTL:
+    def __init__(self, nombre, ttl, ttl_obsoleto=0, max_entradas=256):
+        self.nombre = nombre
+        self.ttl = ttl
+        self.ttl_obsoleto = ttl_obsoleto
+        self.max_entradas = max_entradas
+        self._datos = OrderedDict()
+        self._refrescando = set()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.obsoletos = 0
+        self.refrescos = 0
+        self.errores_refresco = 0
+        self.descartes = 0
+        registro[nombre] = self
+
+    def obtener(self, clave, cargar, ttl=None):
+        """Devuelve el valor de `clave`, usando `cargar()` si no está o venció."""
+        ahora = time.monotonic()
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is not None and ahora < entrada.expira:
+                self._datos.move_to_end(clave)
+                if ahora < entrada.fresco_hasta:
+                    self.hits += 1
+                    return entrada.valor
+                self.obsoletos += 1
+                if clave not in self._refrescando:
+                    self._refrescando.add(clave)
+                    threading.Thread(
+                        target=self._refrescar, args=(clave, cargar, ttl or entrada.ttl), daemon=True
+                    ).start()
+                return entrada.valor
+            self.misses += 1
+
+        valor = cargar()
+        self.guardar(clave, valor, ttl)
+        return valor
+
+    def consultar(self, clave):
+        """Valor guardado si aún no expiró del todo, sin cargar nada. None si no hay."""
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None or time.monotonic() >= entrada.expira:
+                self.misses += 1
+                return None
+            self._datos.move_to_end(clave)
+            self.hits += 1
+            return entrada.valor
+
+    def guardar(self, clave, valor, ttl=None):
+        entrada = _Entrada(valor, ttl or self.ttl, self.ttl_obsoleto)
+        with self._lock:
+            self._datos[clave] = entrada
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.max_entradas:
+                self._datos.popitem(last=False)
+                self.descartes += 1
+
+    def _refrescar(self, clave, cargar, ttl):
+        try:
+            self.guardar(clave, cargar(), ttl)
+            self.refrescos += 1
+        except Exception as e:
+            # Se sigue sirviendo el valor obsoleto hasta que expire del todo
+            self.errores_refresco += 1
+            print(f"⚠️ Error refrescando caché {self.nombre}[{clave}]:", e)
+        finally:
+            with self._lock:
+                self._refrescando.discard(clave)
+
+    def invalidar(self, clave=None):
+        """Borra una clave, o toda la caché si no se indica ninguna. Devuelve cuántas se borraron."""
+        with self._lock:
+            if clave is None:
+                borradas = len(self._datos)
+                self._datos.clear()
+                return borradas
+            return 1 if self._datos.pop(clave, None) is not None else 0
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                "entradas": len(self._datos),
+                "max_entradas": self.max_entradas,
+                "hits": self.hits,
+                "misses": self.misses,
+                "obsoletos": self.obsoletos,
+                "refrescos": self.refrescos,
+                "errores_refresco": self.errores_refresco,
+                "descartes": self.descartes,
+            }
@@ -0,0 +1,126 @@
+# Calentamiento de cada worker antes de recibir tráfico.
+#
+# Lo primero que atiende un worker recién creado paga la compilación de las
+# plantillas Jinja y las conexiones TCP nuevas al backend. calentar(app) hace
+# las dos cosas por adelantado:
+#
+# - plantillas: compila todas las de templates/ (create_app ya lo hace antes
+#   del fork, así con --preload los workers las heredan compiladas);
+# - conexiones: abre CALENTAMIENTO_CONEXIONES conexiones keep-alive a cada
+#   réplica en el pool de services/backend.py.
+#
+# Las cachés de datos (catálogos, índice de clientes, KPIs) son por usuario:
+# se llenan con el token de cada uno en su primera visita, así que no hay nada
+# que precargar con un token de servicio.
+#
+# gunicorn.conf.py lo llama en post_worker_init: el worker no acepta
+# peticiones hasta terminar. Con otro servidor lo arranca en segundo plano la
+# primera consulta a /readyz, que responde 503 mientras tanto.
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+import config
+from services import backend, balanceo
+
+_lock = threading.Lock()
+_estado = {"pid": None, "listo": False, "inicio": None, "segundos": None, "pasos": {}}
+_backend = {"pid": None, "vivo": False, "comprobado": 0.0}
+
+
+def precompilar_plantillas(app):
+    """Compila todas las plantillas en el caché del entorno Jinja. Devuelve cuántas."""
+    compiladas = 0
+    for nombre in app.jinja_env.list_templates():
+        try:
+            app.jinja_env.get_template(nombre)
+            compiladas += 1
+        except Exception as e:
+            print(f"⚠️ No se pudo compilar la plantilla {nombre}:", e)
+    return compiladas
+
+
+def _abrir(base):
+    backend.obtener_sesion().get(f"{base}{config.BALANCEO_SONDA_RUTA}", timeout=config.CALENTAMIENTO_TIMEOUT)
+
+
+def abrir_conexiones():
+    """Deja conexiones keep-alive abiertas hacia cada réplica. Devuelve cuántas quedaron."""
+    bases = [r.base for r in balanceo.balanceador.replicas] * config.CALENTAMIENTO_CONEXIONES
+    # Peticiones simultáneas: cada una necesita su propia conexión del pool
+    with ThreadPoolExecutor(max_workers=len(bases) or 1) as ejecutor:
+        futuros = [ejecutor.submit(_abrir, base) for base in bases]
+    errores = [f.exception() for f in futuros if f.exception() is not None]
+    if errores and len(errores) == len(futuros):
+        raise errores[0]
+    return len(futuros) - len(errores)
+
+
+def calentar(app, latido=None):
+    """Calienta este worker (una vez por pid). `latido` se llama entre pasos (worker.notify)."""
+    pid = os.getpid()
+    with _lock:
+        if _estado["pid"] == pid:
+            return estado()
+        _estado.update(pid=pid, listo=False, inicio=time.time(), segundos=None, pasos={})
+
+    inicio = time.perf_counter()
+    pasos = (
+        ("plantillas", lambda: precompilar_plantillas(app)),
+        ("conexiones", abrir_conexiones),
+    )
+    for nombre, paso in pasos:
+        t = time.perf_counter()
+        try:
+            resultado = {"ok": True, "resultado": paso()}
+        except Exception as e:
+            # Lo que no se pudo precargar se carga en la primera petición, como siempre
+            resultado = {"ok": False, "error": str(e)}
+            print(f"⚠️ Calentamiento ({nombre}):", e)
+        resultado["segundos"] = round(time.perf_counter() - t, 3)
+        _estado["pasos"][nombre] = resultado
+        if latido is not None:
+            latido()
+
+    _estado["segundos"] = round(time.perf_counter() - inicio, 3)
+    _estado["listo"] = True
+    print(f"🔥 Worker {pid} calentado en {_estado['segundos']} s")
+    return estado()
+
+
+def calentar_en_segundo_plano(app):
+    if _estado["pid"] != os.getpid():
+        threading.Thread(target=calentar, args=(app,), name="calentamiento", daemon=True).start()
+
+
+def estado():
+    with _lock:
+        propio = _estado["pid"] == os.getpid()
+        return {
+            "listo": propio and _estado["listo"],
+            "segundos": _estado["segundos"] if propio else None,
+            "pasos": dict(_estado["pasos"]) if propio else {},
+        }
+
+
+def backend_disponible():
+    """Alguna réplica responde la sonda (< 500). Se reutiliza READYZ_TTL segundos."""
+    ahora = time.monotonic()
+    if _backend["pid"] == os.getpid() and ahora - _backend["comprobado"] < config.READYZ_TTL:
+        return _backend["vivo"]
+
+    vivo = False
+    for replica in balanceo.balanceador.replicas:
+        try:
+            # Sin el pool ni los reintentos del cliente: la respuesta tiene que ser rápida
+            vivo = requests.get(f"{replica.base}{config.BALANCEO_SONDA_RUTA}",
+                                timeout=config.BALANCEO_SONDA_TIMEOUT).status_code < 500
+        except requests.RequestException:
+            vivo = False
+        if vivo:
+            break
+    _backend.update(pid=os.getpid(), vivo=vivo, comprobado=ahora)
+    return vivo
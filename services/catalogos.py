@@ -0,0 +1,95 @@
+# Catálogos de referencia (productos, medios de pago) cacheados en memoria.
+#
+# Cambian pocas veces al día, así que se sirven desde CacheTTL y se refrescan
+# en segundo plano. Cada token (backend.alcance) tiene sus propias entradas,
+# como reservas_dias y kpis: el refresco usa el token de quien pidió el
+# catálogo (el hilo de fondo no tiene acceso a la sesión) y lo que trae solo
+# se le sirve a ese mismo usuario.
+#
+# Si el backend manda ETag o Last-Modified, el refresco los reenvía
+# (If-None-Match / If-Modified-Since) y con un 304 se reutiliza la lista
+# anterior sin volver a descargarla.
+import threading
+from collections import OrderedDict
+
+import config
+from services import backend
+from services.cache import CacheTTL
+
+
+class CacheCatalogos(CacheTTL):
+    """CacheTTL con claves (alcance, nombre); invalidar("productos") borra el de todos los tokens."""
+
+    def invalidar(self, clave=None):
+        if clave is None:
+            return super().invalidar()
+        with self._lock:
+            claves = [c for c in self._datos if c[1] == clave]
+            for c in claves:
+                del self._datos[c]
+            return len(claves)
+
+
+cache = CacheCatalogos(
+    "catalogos",
+    ttl=config.CATALOGOS_TTL_DEFECTO,
+    ttl_obsoleto=config.CATALOGOS_TTL_OBSOLETO,
+    max_entradas=config.CATALOGOS_MAX_ENTRADAS,
+)
+
+
+# (alcance, nombre) -> (datos, etag, last_modified) de la última respuesta 200
+_validadores = OrderedDict()
+_lock = threading.Lock()
+
+
+def _cargador(clave, token):
+    nombre = clave[1]
+
+    def cargar():
+        with _lock:
+            anterior = _validadores.get(clave)
+        headers = {}
+        if anterior is not None:
+            if anterior[1]:
+                headers["If-None-Match"] = anterior[1]
+            if anterior[2]:
+                headers["If-Modified-Since"] = anterior[2]
+
+        resp = backend.get(f"/{nombre}", token=token, headers=headers or None)
+        if resp.status_code == 304 and anterior is not None:
+            return anterior[0]
+        resp.raise_for_status()
+        datos = resp.json()
+
+        etag, modificado = resp.headers.get("ETag"), resp.headers.get("Last-Modified")
+        with _lock:
+            if etag or modificado:
+                _validadores[clave] = (datos, etag, modificado)
+                _validadores.move_to_end(clave)
+                while len(_validadores) > config.CATALOGOS_MAX_ENTRADAS:
+                    _validadores.popitem(last=False)
+            else:
+                _validadores.pop(clave, None)
+        return datos
+    return cargar
+
+
+def obtener(nombre, token=backend.DE_SESION):
+    """Lista del catálogo `nombre` ("productos", "medios"). Lanza excepción si el backend falla."""
+    if token is backend.DE_SESION:
+        token = backend.token_actual()
+    clave = (backend.alcance(token), nombre)
+    return cache.obtener(clave, _cargador(clave, token), ttl=config.CATALOGOS_TTL.get(nombre))
+
+
+def invalidar(nombre=None):
+    """Borra el catálogo `nombre` (o todos) en todos los tokens."""
+    # Invalidar obliga a descargar de nuevo, no solo a revalidar
+    with _lock:
+        if nombre is None:
+            _validadores.clear()
+        else:
+            for clave in [c for c in _validadores if c[1] == nombre]:
+                del _validadores[clave]
+    return cache.invalidar(nombre)
@@ -0,0 +1,109 @@
+# Circuit breaker por ruta del backend (primer segmento: /facturas, /reservas...).
+#
+# CERRADO:      las llamadas pasan. Un fallo (excepción, 5xx o respuesta más
+#               lenta que CIRCUITO_UMBRAL_LENTO) suma; un éxito reinicia.
+# ABIERTO:      tras CIRCUITO_UMBRAL_FALLOS fallos seguidos se rechaza todo
+#               de inmediato durante CIRCUITO_TIEMPO_ABIERTO segundos.
+# SEMI_ABIERTO: luego se dejan pasar hasta CIRCUITO_PRUEBAS llamadas de
+#               prueba; si salen bien se cierra, si fallan se vuelve a abrir.
+import threading
+import time
+
+import requests
+
+import config
+
+CERRADO = "CERRADO"
+ABIERTO = "ABIERTO"
+SEMI_ABIERTO = "SEMI_ABIERTO"
+
+
+class CircuitoAbierto(requests.ConnectionError):
+    """El backend de esta ruta está marcado como caído; no se intentó la llamada."""
+
+
+class Circuito:
+    def __init__(self, nombre):
+        self.nombre = nombre
+        self.estado = CERRADO
+        self.fallos = 0
+        self.abierto_hasta = 0.0
+        self.pruebas_en_curso = 0
+        self.rechazadas = 0
+        self.aperturas = 0
+        self._lock = threading.Lock()
+
+    def antes(self):
+        """Llamar antes de la petición. Lanza CircuitoAbierto si no se debe intentar."""
+        with self._lock:
+            if self.estado == ABIERTO:
+                if time.monotonic() < self.abierto_hasta:
+                    self.rechazadas += 1
+                    raise CircuitoAbierto(f"Circuito abierto para {self.nombre}")
+                self.estado = SEMI_ABIERTO
+                self.pruebas_en_curso = 0
+
+            if self.estado == SEMI_ABIERTO:
+                if self.pruebas_en_curso >= config.CIRCUITO_PRUEBAS:
+                    self.rechazadas += 1
+                    raise CircuitoAbierto(f"Circuito en prueba para {self.nombre}")
+                self.pruebas_en_curso += 1
+
+    def despues(self, exito):
+        with self._lock:
+            if self.estado == SEMI_ABIERTO:
+                self.pruebas_en_curso = max(0, self.pruebas_en_curso - 1)
+                if exito:
+                    self.estado = CERRADO
+                    self.fallos = 0
+                else:
+                    self._abrir()
+                return
+
+            if exito:
+                self.fallos = 0
+                return
+            self.fallos += 1
+            if self.fallos >= config.CIRCUITO_UMBRAL_FALLOS:
+                self._abrir()
+
+    def _abrir(self):
+        self.estado = ABIERTO
+        self.abierto_hasta = time.monotonic() + config.CIRCUITO_TIEMPO_ABIERTO
+        self.aperturas += 1
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                "estado": self.estado,
+                "fallos_seguidos": self.fallos,
+                "aperturas": self.aperturas,
+                "rechazadas": self.rechazadas,
+            }
+
+
+_circuitos = {}
+_lock = threading.Lock()
+
+
+def nombre_circuito(ruta):
+    """/facturas/15?x=1 -> /facturas"""
+    segmento = ruta.split("?", 1)[0].strip("/").split("/", 1)[0]
+    return f"/{segmento}"
+
+
+def para(ruta):
+    nombre = nombre_circuito(ruta)
+    circuito = _circuitos.get(nombre)
+    if circuito is None:
+        with _lock:
+            circuito = _circuitos.setdefault(nombre, Circuito(nombre))
+    return circuito
+
+
+def es_exito(estado, segundos):
+    return estado < 500 and segundos <= config.CIRCUITO_UMBRAL_LENTO
+
+
+def estadisticas():
+    return {nombre: c.estadisticas() for nombre, c in sorted(_circuitos.items())}
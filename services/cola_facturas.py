@@ -0,0 +1,341 @@
+# Cola durable (SQLite) para enviar facturas en segundo plano.
+#
+# crear_factura, en modo asíncrono, guarda aquí el payload ya validado y
+# responde de inmediato con el id del trabajo. Un pool de hilos por worker
+# (COLA_FACTURAS_HILOS) reclama trabajos de forma atómica, hace el POST
+# /facturas + PATCH de la reserva con services.facturacion y guarda los
+# mismos mensajes que mostraría el modo síncrono.
+#
+# El trabajo tiene dos pasos. En cuanto el POST devuelve la factura, se guarda
+# en el trabajo y desde ahí solo se reintenta el PATCH de la reserva: el POST
+# no se vuelve a enviar nunca. Antes de la factura solo se reintenta cuando
+# la petición seguro no llegó al backend (admisión, circuito abierto, no
+# conectó) o respondió 503. Un timeout de lectura, una conexión cortada, un
+# 502/504 o un trabajo que quedó PROCESANDO más de COLA_FACTURAS_BLOQUEO
+# segundos sin factura (worker caído) terminan INCIERTA, como en
+# services/lote_facturas.py: hay que revisar en Siigo si la factura se creó.
+#
+# El token del usuario solo se guarda mientras el trabajo tiene llamadas
+# pendientes: se borra al pasar a COMPLETADO, ERROR o INCIERTA, y el archivo
+# de la base se crea con permisos 0600. Los hilos arrancan con cada worker
+# (gunicorn.conf.py), así los trabajos que quedaron de antes de un reinicio
+# se retoman sin esperar a que alguien use la cola. Los trabajos terminados
+# hace más de COLA_FACTURAS_RETENCION segundos se eliminan.
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+import requests
+
+import config
+from services import backend
+from services.facturacion import enviar_factura, factura_creada, marcar_reserva, sin_enviar
+
+PENDIENTE = "PENDIENTE"
+PROCESANDO = "PROCESANDO"
+COMPLETADO = "COMPLETADO"
+ERROR = "ERROR"
+INCIERTA = "INCIERTA"            # no se sabe si se creó la factura: revisar en Siigo
+TERMINADOS = (COMPLETADO, ERROR, INCIERTA)
+
+_CREADA = [("success", "✅ Factura creada correctamente")]
+_INCIERTA = "⚠️ No se sabe si la factura se creó ({}): revísela en Siigo antes de volver a enviarla"
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS trabajos (
+    id TEXT PRIMARY KEY,
+    estado TEXT NOT NULL,
+    alcance TEXT NOT NULL,
+    token TEXT,
+    payload TEXT NOT NULL,
+    idreserva TEXT,
+    intentos INTEGER NOT NULL DEFAULT 0,
+    proximo_intento REAL NOT NULL,
+    mensajes TEXT,
+    factura TEXT,
+    creado REAL NOT NULL,
+    actualizado REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS trabajos_pendientes ON trabajos (estado, proximo_intento);
+"""
+
+_estado = {"pid": None, "hilos": [], "poda": 0.0}
+_lock = threading.Lock()
+_hay_trabajo = threading.Event()
+
+
+def conectar():
+    ruta = config.COLA_FACTURAS_DB
+    if not os.path.exists(ruta):
+        os.makedirs(os.path.dirname(os.path.abspath(ruta)), exist_ok=True)
+        # Guarda tokens: solo el usuario del proceso puede leerla (SQLite crea
+        # los -wal / -shm con los mismos permisos)
+        os.close(os.open(ruta, os.O_CREAT | os.O_WRONLY, 0o600))
+    conexion = sqlite3.connect(config.COLA_FACTURAS_DB, timeout=10, isolation_level=None)
+    conexion.row_factory = sqlite3.Row
+    conexion.execute("PRAGMA journal_mode=WAL")
+    return conexion
+
+
+def inicializar():
+    conexion = conectar()
+    try:
+        conexion.executescript(_ESQUEMA)
+        # Bases creadas antes de borrar el token en todos los estados finales
+        conexion.execute(
+            "UPDATE trabajos SET token = NULL WHERE token IS NOT NULL"
+            f" AND estado IN ({', '.join('?' * len(TERMINADOS))})",
+            TERMINADOS,
+        )
+    finally:
+        conexion.close()
+    for sufijo in ("", "-wal", "-shm"):
+        if os.path.exists(config.COLA_FACTURAS_DB + sufijo):
+            os.chmod(config.COLA_FACTURAS_DB + sufijo, 0o600)
+
+
+# ================== API ==================
+def encolar(data, idreserva=None, token=backend.DE_SESION):
+    """Guarda la factura para enviarla en segundo plano. Devuelve el id del trabajo."""
+    if token is backend.DE_SESION:
+        token = backend.token_actual()
+
+    iniciar_workers()
+    ahora = time.time()
+    id_trabajo = uuid.uuid4().hex
+    conexion = conectar()
+    try:
+        conexion.execute(
+            "INSERT INTO trabajos (id, estado, alcance, token, payload, idreserva, proximo_intento, creado, actualizado)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (id_trabajo, PENDIENTE, backend.alcance(token), token, json.dumps(data),
+             idreserva or None, ahora, ahora, ahora),
+        )
+    finally:
+        conexion.close()
+
+    _hay_trabajo.set()
+    return id_trabajo
+
+
+def consultar(id_trabajo, token=backend.DE_SESION):
+    """Estado del trabajo como dict, o None si no existe o es de otro usuario."""
+    if token is backend.DE_SESION:
+        token = backend.token_actual()
+
+    iniciar_workers()
+    conexion = conectar()
+    try:
+        fila = conexion.execute("SELECT * FROM trabajos WHERE id = ?", (id_trabajo,)).fetchone()
+    finally:
+        conexion.close()
+    if fila is None or fila["alcance"] != backend.alcance(token):
+        return None
+
+    return {
+        "id": fila["id"],
+        "estado": fila["estado"],
+        "terminado": fila["estado"] in TERMINADOS,
+        "intentos": fila["intentos"],
+        "mensajes": json.loads(fila["mensajes"] or "[]"),
+        "factura": json.loads(fila["factura"]) if fila["factura"] else None,
+        "idreserva": fila["idreserva"],
+    }
+
+
+def estadisticas():
+    iniciar_workers()
+    conexion = conectar()
+    try:
+        filas = conexion.execute("SELECT estado, COUNT(*) AS n FROM trabajos GROUP BY estado").fetchall()
+    finally:
+        conexion.close()
+    return {fila["estado"]: fila["n"] for fila in filas}
+
+
+# ================== WORKERS ==================
+def iniciar_workers():
+    """Arranca los hilos de este proceso (una vez por pid: tras un fork se recrean)."""
+    pid = os.getpid()
+    if _estado["pid"] == pid:
+        return
+    with _lock:
+        if _estado["pid"] == pid:
+            return
+        inicializar()
+        _estado["hilos"] = [
+            threading.Thread(target=_bucle, name=f"cola-facturas-{i}", daemon=True)
+            for i in range(config.COLA_FACTURAS_HILOS)
+        ]
+        for hilo in _estado["hilos"]:
+            hilo.start()
+        _estado["pid"] = pid
+
+
+def _reclamar():
+    ahora = time.time()
+    conexion = conectar()
+    try:
+        conexion.execute("BEGIN IMMEDIATE")
+        # Worker caído a mitad del trabajo: con la factura guardada solo falta el
+        # PATCH; sin ella no se sabe si el POST llegó a Siigo
+        limite = ahora - config.COLA_FACTURAS_BLOQUEO
+        conexion.execute(
+            "UPDATE trabajos SET estado = ?, actualizado = ?"
+            " WHERE estado = ? AND actualizado < ? AND factura IS NOT NULL",
+            (PENDIENTE, ahora, PROCESANDO, limite),
+        )
+        conexion.execute(
+            "UPDATE trabajos SET estado = ?, token = NULL, mensajes = ?, actualizado = ?"
+            " WHERE estado = ? AND actualizado < ? AND factura IS NULL",
+            (INCIERTA, json.dumps([("warning", _INCIERTA.format("el envío se interrumpió"))]),
+             ahora, PROCESANDO, limite),
+        )
+        fila = conexion.execute(
+            "SELECT * FROM trabajos WHERE estado = ? AND proximo_intento <= ? ORDER BY creado LIMIT 1",
+            (PENDIENTE, ahora),
+        ).fetchone()
+        if fila is not None:
+            conexion.execute(
+                "UPDATE trabajos SET estado = ?, intentos = intentos + 1, actualizado = ? WHERE id = ?",
+                (PROCESANDO, ahora, fila["id"]),
+            )
+        conexion.execute("COMMIT")
+        return fila
+    except Exception:
+        conexion.execute("ROLLBACK")
+        raise
+    finally:
+        conexion.close()
+
+
+def _terminar(id_trabajo, estado, mensajes, proximo_intento=None):
+    ahora = time.time()
+    conexion = conectar()
+    try:
+        # El token solo hace falta mientras quedan llamadas por hacer
+        conexion.execute(
+            "UPDATE trabajos SET estado = ?, mensajes = ?, proximo_intento = ?, actualizado = ?,"
+            " token = CASE WHEN ? THEN NULL ELSE token END WHERE id = ?",
+            (estado, json.dumps(mensajes), proximo_intento or ahora, ahora,
+             estado in TERMINADOS, id_trabajo),
+        )
+    finally:
+        conexion.close()
+
+
+def _guardar_factura(id_trabajo, factura):
+    """Marca el POST como hecho: desde aquí el trabajo solo reintenta el PATCH."""
+    conexion = conectar()
+    try:
+        conexion.execute(
+            "UPDATE trabajos SET factura = ?, actualizado = ? WHERE id = ?",
+            (json.dumps(factura), time.time(), id_trabajo),
+        )
+    finally:
+        conexion.close()
+
+
+def procesar(fila):
+    intentos = fila["intentos"] + 1
+    quedan = intentos <= config.COLA_FACTURAS_REINTENTOS
+    if fila["factura"] is not None:
+        _marcar(fila, intentos, quedan)
+        return
+
+    data = json.loads(fila["payload"])
+    try:
+        # Sin idreserva: el PATCH va aparte, después de guardar la factura
+        response, mensajes = enviar_factura(data, token=fila["token"])
+    except Exception as e:
+        if sin_enviar(e):
+            if quedan:
+                _reintentar(fila["id"], intentos, str(e))
+            else:
+                _terminar(fila["id"], ERROR, [("danger", f"❌ Error conectando al backend: {e}")])
+        else:
+            _terminar(fila["id"], INCIERTA, [("warning", _INCIERTA.format(e))])
+        return
+
+    if factura_creada(response):
+        try:
+            factura = response.json()
+        except ValueError:
+            factura = {}
+        _guardar_factura(fila["id"], factura)
+        if fila["idreserva"]:
+            _marcar(fila, intentos, quedan)
+        else:
+            _terminar(fila["id"], COMPLETADO, mensajes)
+    elif response.status_code == 503 and quedan:
+        _reintentar(fila["id"], intentos, "HTTP 503")
+    elif response.status_code in (502, 504):
+        _terminar(fila["id"], INCIERTA, [("warning", _INCIERTA.format(f"HTTP {response.status_code}"))])
+    else:
+        _terminar(fila["id"], ERROR, mensajes)
+
+
+def _marcar(fila, intentos, quedan):
+    """Paso 2: PATCH de la reserva. Se puede repetir sin riesgo."""
+    try:
+        marcada = marcar_reserva(fila["idreserva"], token=fila["token"])
+    except requests.RequestException as e:
+        if quedan:
+            _reintentar(fila["id"], intentos, f"reserva: {e}")
+            return
+        marcada = False
+
+    if marcada:
+        aviso = ("info", "✅ Reserva asociada marcada como FACTURADA")
+    else:
+        aviso = ("warning", "⚠️ La factura se creó pero no se pudo actualizar la reserva")
+    _terminar(fila["id"], COMPLETADO, _CREADA + [aviso])
+
+
+def _reintentar(id_trabajo, intentos, motivo):
+    espera = config.COLA_FACTURAS_BACKOFF * (2 ** (intentos - 1))
+    _terminar(id_trabajo, PENDIENTE, [("info", f"⏳ Reintentando envío ({motivo})")],
+              proximo_intento=time.time() + espera)
+    print(f"⚠️ Factura en cola {id_trabajo}: reintento {intentos} en {espera:.1f}s ({motivo})")
+
+
+def _podar():
+    """Borra los trabajos terminados hace más de COLA_FACTURAS_RETENCION segundos."""
+    ahora = time.time()
+    if ahora - _estado["poda"] < 3600:   # una vez por hora basta
+        return
+    _estado["poda"] = ahora
+    conexion = conectar()
+    try:
+        conexion.execute(
+            f"DELETE FROM trabajos WHERE estado IN ({', '.join('?' * len(TERMINADOS))}) AND actualizado < ?",
+            (*TERMINADOS, ahora - config.COLA_FACTURAS_RETENCION),
+        )
+    finally:
+        conexion.close()
+
+
+def _bucle():
+    while True:
+        try:
+            fila = _reclamar()
+        except Exception as e:
+            print("❌ Error leyendo la cola de facturas:", e)
+            fila = None
+
+        if fila is None:
+            try:
+                _podar()
+            except Exception as e:
+                print("❌ Error podando la cola de facturas:", e)
+            _hay_trabajo.wait(config.COLA_FACTURAS_ESPERA)
+            _hay_trabajo.clear()
+            continue
+
+        try:
+            procesar(fila)
+        except Exception as e:
+            print(f"❌ Error procesando factura en cola {fila['id']}:", e)
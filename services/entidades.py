@@ -0,0 +1,118 @@
+# Mapa de identidad por tipo de entidad (clientes, facturas, egresos).
+#
+# Los listados guardan aquí cada fila que traen del backend y las vistas de
+# detalle la leen antes de hacer GET /<tipo>/<id>: normalmente el usuario
+# llega al detalle desde una fila que ya se descargó. Solo se usa una fila si
+# trae todos los campos que pinta la plantilla de detalle (`campos`); si el
+# listado vino recortado se sigue pidiendo al backend.
+#
+# Las entradas son por token (alcance), viven ENTIDADES_TTL segundos y se
+# descartan por LRU. Las escrituras (actualizar_cliente, crear_egreso,
+# actualizar_estado, crear factura) invalidan o guardan la entidad al momento.
+import threading
+import time
+from collections import OrderedDict
+
+import config
+from services import backend
+from services.cache import registro
+
+
+class MapaIdentidad:
+    def __init__(self, nombre, clave_id, campos, max_entradas, ttl):
+        self.nombre = nombre
+        self.clave_id = clave_id
+        self.campos = frozenset(campos)
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self._datos = OrderedDict()   # (alcance, id) -> (entidad, expira)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.incompletas = 0
+        self.descartes = 0
+        registro[nombre] = self
+
+    def _id(self, entidad):
+        valor = entidad.get(self.clave_id) if isinstance(entidad, dict) else None
+        return str(valor) if valor is not None else None
+
+    def guardar_lista(self, filas, token=backend.DE_SESION):
+        """Guarda las filas completas de un listado. Devuelve cuántas se guardaron."""
+        alcance = backend.alcance(backend.token_actual() if token is backend.DE_SESION else token)
+        expira = time.monotonic() + self.ttl
+        nuevas = []
+        for fila in filas or ():
+            id_entidad = self._id(fila)
+            if id_entidad is None:
+                continue
+            if not self.campos <= fila.keys():
+                self.incompletas += 1
+                continue
+            nuevas.append(((alcance, id_entidad), (fila, expira)))
+
+        with self._lock:
+            for clave, entrada in nuevas:
+                self._datos[clave] = entrada
+                self._datos.move_to_end(clave)
+            while len(self._datos) > self.max_entradas:
+                self._datos.popitem(last=False)
+                self.descartes += 1
+        return len(nuevas)
+
+    def guardar(self, entidad, token=backend.DE_SESION):
+        return self.guardar_lista([entidad], token=token)
+
+    def obtener(self, id_entidad, token=backend.DE_SESION):
+        """Entidad guardada para este token, o None si no está o venció."""
+        alcance = backend.alcance(backend.token_actual() if token is backend.DE_SESION else token)
+        clave = (alcance, str(id_entidad))
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None or time.monotonic() >= entrada[1]:
+                if entrada is not None:
+                    del self._datos[clave]
+                self.misses += 1
+                return None
+            self._datos.move_to_end(clave)
+            self.hits += 1
+            return entrada[0]
+
+    def invalidar(self, clave=None):
+        """Misma interfaz que CacheTTL: `clave` es el id (en todos los tokens); sin clave, todo."""
+        with self._lock:
+            if clave is None:
+                borradas = len(self._datos)
+                self._datos.clear()
+                return borradas
+            id_entidad = str(clave)
+            claves = [c for c in self._datos if c[1] == id_entidad]
+            for c in claves:
+                del self._datos[c]
+            return len(claves)
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                "entradas": len(self._datos),
+                "max_entradas": self.max_entradas,
+                "hits": self.hits,
+                "misses": self.misses,
+                "incompletas": self.incompletas,
+                "descartes": self.descartes,
+            }
+
+
+clientes = MapaIdentidad("entidades_clientes", "idcliente", (
+    "idcliente", "tipo_local", "id_type", "nombres", "apellidos", "razonsocial", "direccion",
+    "state_code", "city_code", "telefono", "contact_first_name", "contact_last_name",
+    "contact_email", "observacion",
+), config.ENTIDADES_MAX_ENTRADAS, config.ENTIDADES_TTL)
+
+facturas = MapaIdentidad("entidades_facturas", "idfactura", (
+    "idfactura", "idcliente", "total", "estado", "observaciones", "siigo_number", "public_url",
+), config.ENTIDADES_MAX_ENTRADAS, config.ENTIDADES_TTL)
+
+egresos = MapaIdentidad("entidades_egresos", "idegreso", (
+    "idegreso", "fecha", "concepto", "proveedor", "valor", "metodopago", "usuario", "observacion",
+), config.ENTIDADES_MAX_ENTRADAS, config.ENTIDADES_TTL)
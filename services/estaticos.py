@@ -0,0 +1,121 @@
+# Archivos estáticos con huella de contenido y gzip precalculado.
+#
+# Al arrancar se recorre static/: cada archivo recibe un nombre con el hash de
+# su contenido (css/style.css -> css/style.3f9a1c0b7d2e.css) y los de texto
+# (css, js, svg...) se comprimen una sola vez. url_for("static", filename=...)
+# devuelve el nombre con huella sin tocar las plantillas, y esas URLs se sirven
+# desde memoria con Cache-Control: immutable y un max-age largo: el navegador
+# no vuelve a pedirlas hasta que cambie el contenido (y con él la URL).
+#
+# Los nombres sin huella se siguen sirviendo como antes (revalidando). Con
+# ESTATICOS_HUELLAS = False todo queda como el handler por defecto de Flask.
+import gzip
+import hashlib
+import mimetypes
+import os
+import threading
+
+from flask import request
+
+import config
+
+_lock = threading.Lock()
+_manifiesto = {}    # "css/style.css" -> "css/style.<hash>.css"
+_archivos = {}      # "css/style.<hash>.css" -> Archivo
+
+
+class Archivo:
+    __slots__ = ("contenido", "gzip", "mimetype", "etag")
+
+    def __init__(self, contenido, mimetype, etag, comprimido=None):
+        self.contenido = contenido
+        self.gzip = comprimido
+        self.mimetype = mimetype
+        self.etag = etag
+
+
+def _con_huella(nombre, resumen):
+    base, extension = os.path.splitext(nombre)
+    return f"{base}.{resumen}{extension}"
+
+
+def construir(carpeta):
+    """Calcula huellas y variantes gzip de todo lo que hay en `carpeta`."""
+    manifiesto, archivos = {}, {}
+    for raiz, _, nombres in os.walk(carpeta):
+        for nombre in nombres:
+            ruta = os.path.join(raiz, nombre)
+            logico = os.path.relpath(ruta, carpeta).replace(os.sep, "/")
+            with open(ruta, "rb") as f:
+                contenido = f.read()
+            resumen = hashlib.sha256(contenido).hexdigest()[:config.ESTATICOS_LARGO_HUELLA]
+            mimetype = mimetypes.guess_type(nombre)[0] or "application/octet-stream"
+            comprimido = None
+            if os.path.splitext(nombre)[1].lower() in config.ESTATICOS_COMPRIMIR:
+                comprimido = gzip.compress(contenido, compresslevel=config.ESTATICOS_NIVEL_GZIP, mtime=0)
+                if len(comprimido) >= len(contenido):
+                    comprimido = None
+            huella = _con_huella(logico, resumen)
+            manifiesto[logico] = huella
+            archivos[huella] = Archivo(contenido, mimetype, resumen, comprimido)
+
+    with _lock:
+        _manifiesto.clear()
+        _manifiesto.update(manifiesto)
+        _archivos.clear()
+        _archivos.update(archivos)
+    return manifiesto
+
+
+def url(filename):
+    """Nombre con huella de `filename`, o el mismo si no está en el manifiesto."""
+    return _manifiesto.get(filename, filename)
+
+
+def _url_defaults(endpoint, values):
+    # url_for("static", filename="css/style.css") -> /static/css/style.<hash>.css
+    if endpoint == "static" and "filename" in values:
+        values["filename"] = url(values["filename"])
+
+
+def _servir(app, original):
+    def static(filename):
+        archivo = _archivos.get(filename)
+        if archivo is None:
+            # Nombre sin huella (o archivo agregado después de arrancar)
+            return original(filename=filename)
+
+        gzip_ok = archivo.gzip is not None and request.accept_encodings.quality("gzip") > 0
+        etag = f"{archivo.etag}-gz" if gzip_ok else archivo.etag
+        if request.if_none_match.contains_weak(etag):
+            respuesta = app.response_class(status=304)
+        else:
+            respuesta = app.response_class(archivo.gzip if gzip_ok else archivo.contenido,
+                                           mimetype=archivo.mimetype)
+            if gzip_ok:
+                respuesta.headers["Content-Encoding"] = "gzip"
+        respuesta.set_etag(etag)
+        respuesta.headers["Cache-Control"] = f"public, max-age={config.ESTATICOS_MAX_AGE}, immutable"
+        if archivo.gzip is not None:
+            respuesta.vary.add("Accept-Encoding")
+        return respuesta
+
+    return static
+
+
+def estadisticas():
+    with _lock:
+        return {
+            "archivos": len(_archivos),
+            "bytes": sum(len(a.contenido) for a in _archivos.values()),
+            "bytes_gzip": sum(len(a.gzip) for a in _archivos.values() if a.gzip is not None),
+            "manifiesto": dict(_manifiesto),
+        }
+
+
+def init_app(app):
+    if not config.ESTATICOS_HUELLAS or not app.static_folder or "static" not in app.view_functions:
+        return
+    construir(app.static_folder)
+    app.url_defaults(_url_defaults)
+    app.view_functions["static"] = _servir(app, app.view_functions["static"])
@@ -0,0 +1,362 @@
+# Exportación de listados a CSV o XLSX en streaming, con memoria acotada.
+#
+# La cadena es de generadores y nada guarda la colección completa:
+#
+#   filas(ruta)  pide páginas de EXPORTACION_PAGINA filas al backend con
+#                limit/offset (o cursor) y las lee del socket a medida que
+#                llegan. Si el backend no pagina y devuelve todo en una sola
+#                respuesta, esa respuesta igual se decodifica elemento por
+#                elemento sin cargar el arreglo entero. Si respeta limit pero
+#                ignora offset, se vuelve a pedir sin paginar y se salta lo
+#                ya entregado.
+#   filtrar()    aplica fecha_inicio/fecha_fin/estado por si el backend los ignora.
+#   csv()/xlsx() escriben las filas y entregan bloques de ~EXPORTACION_FRAGMENTO
+#                bytes para una respuesta chunked.
+#
+# El XLSX se arma a mano (zip en modo streaming + hoja con celdas en línea),
+# así no hace falta openpyxl ni un archivo temporal.
+import codecs
+import csv as _csv
+import io
+import json
+import zipfile
+from datetime import date
+from xml.sax.saxutils import escape
+
+from flask import Response, request, stream_with_context
+
+import config
+from services import backend, paginacion
+
+_decodificador_json = json.JSONDecoder()
+_ESPACIOS = " \t\r\n"
+_SEPARADORES = _ESPACIOS + ","
+
+
+class ErrorExportacion(Exception):
+    """El backend respondió algo que no se puede exportar."""
+
+
+# ================== LECTURA DEL BACKEND ==================
+def _elementos(response, meta):
+    """Elementos de un arreglo JSON leído por partes del socket.
+
+    Si el cuerpo es un objeto ({"data": [...], "next_cursor": ...}) es una
+    página de tamaño acotado: se decodifica entero y el resto de sus claves
+    se copian en `meta`.
+    """
+    decodificar = codecs.getincrementaldecoder("utf-8")()
+    partes = response.iter_content(chunk_size=config.EXPORTACION_LECTURA)
+    buffer = ""
+
+    def leer():
+        nonlocal buffer
+        for parte in partes:
+            texto = decodificar.decode(parte)
+            if texto:
+                buffer += texto
+                return True
+        buffer += decodificar.decode(b"", final=True)
+        return False
+
+    hay_mas = True
+    while not buffer.lstrip(_ESPACIOS) and hay_mas:
+        hay_mas = leer()
+    buffer = buffer.lstrip(_ESPACIOS)
+    if buffer.startswith("{"):
+        while leer():
+            pass
+        objeto = json.loads(buffer)
+        filas_ = objeto.pop("data", None)
+        if filas_ is None:
+            filas_ = objeto.pop("items", [])
+        meta.update(objeto)
+        yield from filas_
+        return
+    if not buffer.startswith("["):
+        raise ErrorExportacion(f"Respuesta inesperada del backend: {buffer[:80]!r}")
+
+    pos = 1
+    while True:
+        while pos < len(buffer) and buffer[pos] in _SEPARADORES:
+            pos += 1
+        if pos >= len(buffer):
+            if not hay_mas:
+                raise ErrorExportacion("El arreglo JSON del backend quedó incompleto")
+            buffer, pos = "", 0
+            hay_mas = leer()
+            continue
+        if buffer[pos] == "]":
+            return
+        try:
+            elemento, fin = _decodificador_json.raw_decode(buffer, pos)
+            completo = fin < len(buffer) or not hay_mas   # un número al final podría seguir
+        except json.JSONDecodeError:
+            if not hay_mas:
+                raise
+            completo = False
+        if not completo:
+            buffer, pos = buffer[pos:], 0
+            hay_mas = leer()
+            continue
+        yield elemento
+        pos = fin
+        if pos > config.EXPORTACION_LECTURA:
+            buffer, pos = buffer[pos:], 0
+
+
+def _pagina(ruta, params, token, meta):
+    response = backend.get(ruta, params=params, token=token, stream=True)
+    try:
+        if response.status_code != 200:
+            raise ErrorExportacion(f"El backend respondió {response.status_code} en {ruta}")
+        yield from _elementos(response, meta)
+    finally:
+        response.close()
+
+
+def _huella(fila):
+    return json.dumps(fila, sort_keys=True, default=str)
+
+
+def _sin_paginar(ruta, params, token, entregadas, primera_fila):
+    """Colección completa en una respuesta, saltando las `entregadas` filas ya enviadas."""
+    for i, fila in enumerate(_pagina(ruta, dict(params), token, {})):
+        if i == 0 and _huella(fila) != primera_fila:
+            raise ErrorExportacion(f"{ruta} ignora offset y sin paginar devuelve otro orden")
+        if i >= entregadas:
+            yield fila
+
+
+def filas(ruta, params=None, token=backend.DE_SESION):
+    """Todas las filas de `ruta`, pidiendo la página siguiente solo cuando se consumió la anterior."""
+    if token is backend.DE_SESION:
+        token = backend.token_actual()
+    params = dict(params or {})
+    limite = config.EXPORTACION_PAGINA
+    offset, cursor, primera_fila = 0, None, None
+
+    while True:
+        pagina = paginacion._soporta_paginacion.get(ruta) is not False
+        pedido = dict(params)
+        if pagina:
+            pedido["limit"] = limite
+            if cursor:
+                pedido["cursor"] = cursor
+            else:
+                pedido["offset"] = offset
+
+        meta, cantidad = {}, 0
+        for fila in _pagina(ruta, pedido, token, meta):
+            if cantidad == 0:
+                huella = _huella(fila)
+                if offset and huella == primera_fila:
+                    # Misma primera fila que la página 1: el backend ignora offset
+                    paginacion._soporta_paginacion[ruta] = False
+                    yield from _sin_paginar(ruta, params, token, offset, primera_fila)
+                    return
+                if not offset:
+                    primera_fila = huella
+            cantidad += 1
+            yield fila
+
+        if not pagina or cantidad > limite:
+            # Llegó la colección completa en una sola respuesta: ya se entregó toda
+            if pagina:
+                paginacion._soporta_paginacion[ruta] = False
+            return
+        cursor = meta.get("next_cursor")
+        total = meta.get("total")
+        if not cursor and (cantidad < limite or (total is not None and offset + cantidad >= total)):
+            return
+        offset += cantidad
+
+
+def filtrar(filas_, fecha_inicio=None, fecha_fin=None, estado=None):
+    """Aplica los filtros localmente (fechas "YYYY-MM-DD" inclusive)."""
+    for fila in filas_:
+        fecha = str(fila.get("fecha") or "")[:10]
+        if fecha_inicio and fecha < fecha_inicio:
+            continue
+        if fecha_fin and fecha > fecha_fin:
+            continue
+        if estado and (fila.get("estado") or "").upper() != estado.upper():
+            continue
+        yield fila
+
+
+# ================== ESCRITURA ==================
+def _valor(fila, campo):
+    valor = fila.get(campo)
+    if campo == "fecha" and valor:
+        return str(valor)[:10]
+    return valor
+
+
+def csv(filas_, columnas):
+    """Bloques de bytes de un CSV UTF-8 (con BOM para que Excel respete las tildes)."""
+    salida = io.StringIO()
+    escritor = _csv.writer(salida)
+    salida.write("\ufeff")
+    escritor.writerow([titulo for _, titulo in columnas])
+    for fila in filas_:
+        escritor.writerow(["" if (v := _valor(fila, c)) is None else v for c, _ in columnas])
+        if salida.tell() >= config.EXPORTACION_FRAGMENTO:
+            yield salida.getvalue().encode("utf-8")
+            salida.seek(0)
+            salida.truncate()
+    yield salida.getvalue().encode("utf-8")
+
+
+class _Sumidero:
+    """Archivo de solo escritura (sin seek) donde zipfile deja los bytes que se van enviando."""
+
+    def __init__(self):
+        self.partes = []
+        self.tamano = 0
+
+    def write(self, datos):
+        self.partes.append(bytes(datos))
+        self.tamano += len(datos)
+        return len(datos)
+
+    def flush(self):
+        pass
+
+    def vaciar(self):
+        datos = b"".join(self.partes)
+        self.partes, self.tamano = [], 0
+        return datos
+
+
+_XLSX_FIJOS = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="xl/workbook.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+        '</Relationships>'
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="worksheets/sheet1.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+        '</Relationships>'
+    ),
+}
+
+
+def _libro(hoja):
+    return (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        f'<sheets><sheet name="{escape(hoja[:31])}" sheetId="1" r:id="rId1"/></sheets></workbook>'
+    )
+
+
+def _celda(valor):
+    if isinstance(valor, bool) or valor is None:
+        valor = "" if valor is None else str(valor)
+    if isinstance(valor, (int, float)):
+        return f"<c><v>{valor}</v></c>"
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{escape(str(valor))}</t></is></c>'
+
+
+def _fila_xml(valores):
+    return "<row>" + "".join(_celda(v) for v in valores) + "</row>"
+
+
+def xlsx(filas_, columnas, hoja="Datos"):
+    """Bloques de bytes de un XLSX de una hoja, escrito a medida que llegan las filas."""
+    sumidero = _Sumidero()
+    with zipfile.ZipFile(sumidero, "w", compression=zipfile.ZIP_DEFLATED) as libro:
+        for nombre, contenido in _XLSX_FIJOS.items():
+            libro.writestr(nombre, contenido)
+        libro.writestr("xl/workbook.xml", _libro(hoja))
+
+        with libro.open("xl/worksheets/sheet1.xml", "w", force_zip64=True) as destino:
+            destino.write((
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+                + _fila_xml(titulo for _, titulo in columnas)
+            ).encode("utf-8"))
+            for fila in filas_:
+                destino.write(_fila_xml(_valor(fila, c) for c, _ in columnas).encode("utf-8"))
+                if sumidero.tamano >= config.EXPORTACION_FRAGMENTO:
+                    yield sumidero.vaciar()
+            destino.write(b"</sheetData></worksheet>")
+    yield sumidero.vaciar()
+
+
+FORMATOS = {
+    "csv": (csv, "text/csv; charset=utf-8"),
+    "xlsx": (xlsx, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+}
+
+
+def nombre_archivo(base, formato, fecha_inicio=None, fecha_fin=None):
+    partes = [base, fecha_inicio or "", fecha_fin or date.today().isoformat()]
+    return "_".join(p for p in partes if p) + f".{formato}"
+
+
+# ================== RESPUESTA ==================
+def _fecha_arg(nombre):
+    texto = request.args.get(nombre) or None
+    if texto is None:
+        return None
+    date.fromisoformat(texto)   # ValueError si no es YYYY-MM-DD
+    return texto
+
+
+def responder(ruta, columnas, base):
+    """Respuesta chunked con la exportación de `ruta` según ?formato=&fecha_inicio=&fecha_fin=&estado=.
+
+    Lanza ValueError si los parámetros no son válidos y ErrorExportacion o
+    requests.RequestException si el backend falla antes del primer byte. A
+    partir de ahí un error queda en el log, el CSV termina con una fila que
+    avisa que está incompleto y la conexión se corta sin cerrar el chunked,
+    así el navegador marca la descarga como fallida en vez de darla por buena.
+    """
+    formato = (request.args.get("formato") or "csv").lower()
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato no soportado: {formato}")
+    fecha_inicio, fecha_fin = _fecha_arg("fecha_inicio"), _fecha_arg("fecha_fin")
+    estado = request.args.get("estado") or None
+
+    params = {k: v for k, v in (("fecha_inicio", fecha_inicio), ("fecha_fin", fecha_fin), ("estado", estado)) if v}
+    escribir, content_type = FORMATOS[formato]
+    bloques = escribir(filtrar(filas(ruta, params), fecha_inicio, fecha_fin, estado), columnas)
+    # El primer bloque se arma antes de responder: si el backend falla aún se puede avisar
+    primero = next(bloques)
+
+    def enviar():
+        yield primero
+        try:
+            yield from bloques
+        except Exception as e:
+            print(f"❌ Exportación de {ruta} interrumpida:", e)
+            if formato == "csv":
+                yield f"\r\n❌ EXPORTACIÓN INCOMPLETA: {e}\r\n".encode("utf-8")
+            raise
+
+    # content_type va tal cual; con mimetype= Werkzeug agregaría otro charset al CSV
+    respuesta = Response(stream_with_context(enviar()), content_type=content_type)
+    respuesta.headers["Content-Disposition"] = (
+        f'attachment; filename="{nombre_archivo(base, formato, fecha_inicio, fecha_fin)}"'
+    )
+    respuesta.headers["Cache-Control"] = "no-store"
+    respuesta.headers["X-Accel-Buffering"] = "no"   # que nginx no junte todo antes de enviar
+    return respuesta
@@ -0,0 +1,127 @@
+# Envío de una factura al backend (y de ahí a Siigo).
+#
+# Lo usan la vista crear_factura (modo síncrono), la cola de facturas
+# (modo asíncrono) y la facturación por lotes, así todos producen exactamente
+# los mismos mensajes y el mismo payload.
+from datetime import date
+from decimal import Decimal
+
+import requests
+from urllib3.exceptions import NewConnectionError
+
+from services import backend, entidades, formularios, kpis, reservas_dias
+from services.admision import Sobrecarga
+from services.circuito import CircuitoAbierto
+
+
+def enviar_factura(data, idreserva=None, token=backend.DE_SESION):
+    """POST /facturas y, si viene de una reserva, PATCH /reservas/<id>/facturar.
+
+    Devuelve (response, mensajes) donde mensajes es una lista de
+    (categoria, texto) para `flash`. Los errores de conexión se propagan.
+    """
+    response = backend.post("/facturas", json=data, token=token)
+
+    if response.status_code not in [200, 201]:
+        return response, [("danger", f"❌ Error al crear factura: {response.text}")]
+
+    mensajes = [("success", "✅ Factura creada correctamente")]
+    try:
+        creada = response.json()
+        entidades.facturas.guardar(creada, token=token)
+        kpis.facturas.registrar(dict(creada, total=creada.get("total", _total(data))), dia=date.today(),
+                                token=token)
+    except (ValueError, AttributeError):
+        pass
+
+    # Si la factura viene de una reserva -> actualizar estado
+    if idreserva:
+        if marcar_reserva(idreserva, token=token):
+            mensajes.append(("info", "✅ Reserva asociada marcada como FACTURADA"))
+        else:
+            mensajes.append(("warning", "⚠️ La factura se creó pero no se pudo actualizar la reserva"))
+
+    return response, mensajes
+
+
+def marcar_reserva(idreserva, token=backend.DE_SESION):
+    """PATCH /reservas/<id>/facturar. True si el backend la marcó como FACTURADA."""
+    patch_resp = backend.patch(f"/reservas/{idreserva}/facturar", token=token)
+    if patch_resp.status_code != 200:
+        return False
+    reservas_dias.invalidar_reserva(idreserva)
+    kpis.reservas.cambiar_estado(idreserva, "FACTURADO", token=token)
+    return True
+
+
+def _total(data):
+    return sum(d.get("subtotal") or 0 for d in data.get("detalles", []))
+
+
+def factura_creada(response):
+    return response is not None and response.status_code in [200, 201]
+
+
+def sin_enviar(error):
+    """True si la petición seguro no llegó al backend (se puede repetir el POST).
+
+    Una conexión cortada (ProtocolError, RemoteDisconnected) también es un
+    requests.ConnectionError, pero llega después de enviar el cuerpo: no cuenta.
+    """
+    if isinstance(error, (Sobrecarga, CircuitoAbierto, requests.ConnectTimeout)):
+        return True
+    if not isinstance(error, requests.ConnectionError) or not error.args:
+        return False
+    causa = error.args[0]
+    return isinstance(getattr(causa, "reason", causa), NewConnectionError)
+
+
+def factura_rechazada(response):
+    """True si el backend seguro no creó la factura: 4xx o 503 (no la atendió).
+
+    Un 502/504 o un 500 pueden llegar después de que Siigo creó la factura.
+    """
+    return response is not None and (400 <= response.status_code < 500 or response.status_code == 503)
+
+
+def payload_desde_reserva(reserva, idusuario=1):
+    """Mismo payload que arma crear_factura.html en el modo "Desde una reserva".
+
+    Lanza ValueError si a la reserva le faltan el cliente, el producto, el medio,
+    el precio o el abono: no se adivinan montos a partir de otras columnas.
+    """
+    faltantes = [c for c in ("idcliente", "idproducto", "idmedio") if not reserva.get(c)]
+    faltantes += [c for c in ("precio", "abono") if reserva.get(c) in (None, "")]
+    if faltantes:
+        raise ValueError(f"A la reserva le falta {', '.join(faltantes)}")
+
+    montos = {}
+    for campo in ("precio", "abono"):
+        try:
+            montos[campo] = formularios.dinero(formularios.DECIMAL(str(reserva[campo])))
+        except ValueError as e:
+            raise ValueError(f"{campo} {e}")
+        if montos[campo] < 0:
+            raise ValueError(f"{campo} no puede ser negativo")
+    identificacion = reserva.get("identificacion") or reserva.get("cliente") or ""
+
+    return formularios.a_json({
+        "idcliente": reserva["idcliente"],
+        "idusuario": idusuario,
+        "observaciones": f"Factura generada desde reserva del cliente {identificacion}",
+        "detalles": [{
+            "idproducto": formularios.ENTERO(str(reserva["idproducto"])),
+            "cantidad": Decimal(1),
+            "valorunitario": montos["precio"],
+            "subtotal": montos["precio"],
+            "descripcion": None,
+            "descuento": Decimal(0),
+            "impuesto_id": None,
+        }],
+        "pagos": [{
+            "idmedio": formularios.ENTERO(str(reserva["idmedio"])),
+            "valor": montos["abono"],
+            "due_date": date.today(),
+            "siigo_pago_id": None,
+        }],
+    })
@@ -0,0 +1,71 @@
+# Ejecución concurrente de llamadas independientes al backend.
+#
+# Uso típico en una vista:
+#     r = fanout({"medios": lambda: backend.get("/medios").json(), ...})
+#     medios = r["medios"].valor if r["medios"].ok else []
+#
+# Cada llamada corre en un hilo de un pool acotado por worker y con una copia
+# del contexto de Flask, así que `session` (y el token) siguen disponibles.
+# Un error en una llamada no afecta a las demás.
+import contextvars
+import os
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import config
+
+
+class Resultado(namedtuple("Resultado", ["valor", "error"])):
+    __slots__ = ()
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+_estado = {"pid": None, "pool": None}
+_lock = threading.Lock()
+
+
+def _pool():
+    pid = os.getpid()
+    if _estado["pid"] != pid:
+        with _lock:
+            if _estado["pid"] != pid:
+                _estado["pool"] = ThreadPoolExecutor(
+                    max_workers=config.FANOUT_MAX_HILOS,
+                    thread_name_prefix="fanout",
+                )
+                _estado["pid"] = pid
+    return _estado["pool"]
+
+
+def _ejecutar(funcion):
+    try:
+        return Resultado(funcion(), None)
+    except Exception as e:
+        return Resultado(None, e)
+
+
+def fanout(llamadas, timeout=None):
+    """Ejecuta en paralelo un dict {nombre: callable} y devuelve {nombre: Resultado}."""
+    if len(llamadas) <= 1:
+        return {nombre: _ejecutar(f) for nombre, f in llamadas.items()}
+
+    pool = _pool()
+    futuros = {
+        nombre: pool.submit(contextvars.copy_context().run, _ejecutar, f)
+        for nombre, f in llamadas.items()
+    }
+
+    limite = None if timeout is None else time.monotonic() + timeout
+    resultados = {}
+    for nombre, futuro in futuros.items():
+        restante = None if limite is None else max(0, limite - time.monotonic())
+        try:
+            resultados[nombre] = futuro.result(timeout=restante)
+        except Exception as e:
+            resultados[nombre] = Resultado(None, e)
+    return resultados
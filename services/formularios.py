@@ -0,0 +1,255 @@
+# Decodificación de formularios con campos anidados: detalles[0][cantidad],
+# pagos[3][valor]...
+#
+# Un Esquema declara los campos sueltos y las colecciones con su tipo
+# (ENTERO, FLOTANTE, DECIMAL, FECHA, TEXTO) y si son obligatorios. decodificar()
+# recorre request.form una sola vez con un patrón precompilado, convierte cada
+# valor y junta los errores en vez de lanzar la primera excepción:
+#
+#     datos, errores = ESQUEMA.decodificar(request.form)
+#     errores -> [{"campo": "detalles[2][cantidad]", "mensaje": "debe ser un número"}]
+#
+# Solo el dinero se declara DECIMAL (cantidades y porcentajes van en FLOTANTE);
+# a_json() lo pasa a float, en el mismo payload, justo antes de mandarlo al
+# backend.
+import re
+from datetime import date
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+import config
+
+_CLAVE = re.compile(r"([A-Za-z_]\w*)\[(\d+)\]\[([A-Za-z_]\w*)\]")
+CENTAVOS = Decimal("0.01")
+
+
+# ================== TIPOS ==================
+def ENTERO(texto):
+    try:
+        return int(texto)
+    except ValueError:
+        raise ValueError("debe ser un número entero")
+
+
+def FLOTANTE(texto):
+    try:
+        return float(texto)
+    except ValueError:
+        raise ValueError("debe ser un número")
+
+
+def DECIMAL(texto):
+    try:
+        valor = Decimal(texto)
+    except InvalidOperation:
+        raise ValueError("debe ser un número")
+    if not valor.is_finite():
+        raise ValueError("debe ser un número")
+    return valor
+
+
+def FECHA(texto):
+    try:
+        return date.fromisoformat(texto[:10])
+    except ValueError:
+        raise ValueError("debe ser una fecha AAAA-MM-DD")
+
+
+def TEXTO(texto):
+    return texto
+
+
+class Campo:
+    __slots__ = ("tipo", "requerido", "defecto", "origen")
+
+    def __init__(self, tipo=TEXTO, requerido=False, defecto=None, origen=None):
+        self.tipo = tipo
+        self.requerido = requerido
+        self.defecto = defecto
+        self.origen = origen      # nombre en el formulario si difiere de la clave del payload
+
+    def convertir(self, crudo):
+        """Valor convertido. Vacío -> defecto (o error si es obligatorio)."""
+        if crudo is None or (self.tipo is not TEXTO and crudo.strip() == ""):
+            if self.requerido:
+                raise ValueError("es obligatorio")
+            return self.defecto
+        if self.tipo is TEXTO:
+            if self.requerido and not crudo.strip():
+                raise ValueError("es obligatorio")
+            return crudo
+        return self.tipo(crudo.strip())
+
+
+# ================== ESQUEMA ==================
+# clave del formulario -> (colección, índice, campo), o None si no es anidada.
+# Los nombres se repiten entre peticiones (detalles[0][cantidad]...), así que
+# el patrón se evalúa una vez por nombre distinto.
+_claves = {}
+
+
+def _partir(clave):
+    m = _CLAVE.fullmatch(clave)
+    partes = (m[1], int(m[2]), m[3]) if m else None
+    if len(_claves) >= config.FORMULARIO_MAX_CLAVES:
+        _claves.clear()
+    _claves[clave] = partes
+    return partes
+
+
+class Esquema:
+    def __init__(self, campos=None, **colecciones):
+        self.campos = campos or {}
+        self.colecciones = colecciones
+        # origen en el formulario -> clave en el payload
+        self._origen = {c.origen or nombre: nombre for nombre, c in self.campos.items()}
+        # Campos de cada colección precompilados: (nombre, tipo, requerido, defecto)
+        self._filas = {
+            nombre: tuple((n, c.tipo, c.requerido, c.defecto) for n, c in esquema.items())
+            for nombre, esquema in colecciones.items()
+        }
+        # Columnas de cada colección que a_json() tiene que tocar
+        self._a_json = {
+            nombre: tuple(n for n, c in esquema.items() if c.tipo is DECIMAL or c.tipo is FECHA)
+            for nombre, esquema in colecciones.items()
+        }
+
+    def decodificar(self, form):
+        """Devuelve (datos, errores). Cada colección queda como lista ordenada por índice."""
+        crudos = {}
+        filas = {nombre: {} for nombre in self.colecciones}
+        llenas = set()
+        errores = []
+        origen = self._origen
+        claves = _claves
+        maximo = config.FORMULARIO_MAX_FILAS
+
+        # Una sola pasada por el formulario
+        for clave, valor in form.items():
+            if "[" not in clave:
+                if clave in origen:
+                    crudos[origen[clave]] = valor
+                continue
+            partes = claves.get(clave, False)
+            if partes is False:
+                partes = _partir(clave)
+            if partes is None:
+                continue
+            coleccion, indice, campo = partes
+            destino = filas.get(coleccion)
+            if destino is None:
+                continue
+            fila = destino.get(indice)
+            if fila is None:
+                if len(destino) >= maximo:
+                    if coleccion not in llenas:
+                        llenas.add(coleccion)
+                        errores.append(_error(coleccion, f"no puede tener más de {maximo} filas"))
+                    continue
+                fila = destino[indice] = {}
+            fila[campo] = valor
+
+        datos = {}
+        for nombre, campo in self.campos.items():
+            try:
+                datos[nombre] = campo.convertir(crudos.get(nombre))
+            except ValueError as e:
+                errores.append(_error(nombre, str(e)))
+                datos[nombre] = campo.defecto
+
+        # Las colecciones se convierten por columna: el tipo de cada campo se
+        # resuelve una vez y el bucle interno solo toca los valores
+        for nombre, columnas in self._filas.items():
+            crudas = filas[nombre]
+            indices = sorted(crudas)
+            fuentes = [crudas[i] for i in indices]
+            datos[nombre] = salidas = [{} for _ in indices]
+            for campo, tipo, requerido, defecto in columnas:
+                if tipo is TEXTO and not requerido:
+                    for fila, salida in zip(fuentes, salidas):
+                        salida[campo] = fila.get(campo)
+                    continue
+                for indice, fila, salida in zip(indices, fuentes, salidas):
+                    crudo = fila.get(campo)
+                    if crudo is not None:
+                        crudo = crudo.strip()
+                    if not crudo:
+                        if requerido:
+                            errores.append(_error(f"{nombre}[{indice}][{campo}]", "es obligatorio"))
+                        salida[campo] = defecto
+                        continue
+                    try:
+                        salida[campo] = tipo(crudo)
+                    except ValueError as e:
+                        errores.append(_error(f"{nombre}[{indice}][{campo}]", str(e)))
+                        salida[campo] = defecto
+
+        return datos, errores
+
+    def a_json(self, datos):
+        """Como a_json(), pero en las colecciones solo recorre las columnas DECIMAL y FECHA.
+
+        Un valor que se agregue a las filas después de decodificar (un subtotal)
+        tiene que llegar ya apto para json.
+        """
+        for nombre, valor in datos.items():
+            columnas = self._a_json.get(nombre)
+            if columnas is None or type(valor) is not list:
+                datos[nombre] = a_json(valor)
+                continue
+            for campo in columnas:
+                for fila in valor:
+                    v = fila.get(campo)
+                    if type(v) is Decimal:
+                        fila[campo] = float(v)
+                    elif type(v) is date:
+                        fila[campo] = v.isoformat()
+        return datos
+
+
+def _error(campo, mensaje):
+    return {"campo": campo, "mensaje": mensaje}
+
+
+# ================== AYUDAS ==================
+def dinero(valor):
+    """Redondea a centavos (mitad hacia arriba)."""
+    return Decimal(valor).quantize(CENTAVOS, rounding=ROUND_HALF_UP)
+
+
+def a_json(valor):
+    """Deja `valor` apto para json, en el sitio: Decimal -> float, date -> "AAAA-MM-DD".
+
+    Modifica los dict y listas que recibe (son payloads recién armados) y
+    devuelve `valor`; un Decimal o date suelto se devuelve convertido.
+    """
+    tipo = type(valor)
+    if tipo is dict:
+        for k, v in valor.items():
+            tipo = type(v)
+            if tipo is Decimal:
+                valor[k] = float(v)
+            elif tipo is date:
+                valor[k] = v.isoformat()
+            elif tipo is dict or tipo is list:
+                a_json(v)
+        return valor
+    if tipo is list:
+        for i, v in enumerate(valor):
+            tipo = type(v)
+            if tipo is Decimal:
+                valor[i] = float(v)
+            elif tipo is date:
+                valor[i] = v.isoformat()
+            elif tipo is dict or tipo is list:
+                a_json(v)
+        return valor
+    if tipo is Decimal:
+        return float(valor)
+    if tipo is date:
+        return valor.isoformat()
+    return valor
+
+
+def mensajes_error(errores):
+    """Textos listos para `flash`."""
+    return [f"❌ {e['campo']}: {e['mensaje']}" for e in errores]
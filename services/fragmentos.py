@@ -0,0 +1,58 @@
+# Respuestas parciales para las escrituras hechas desde static/js/app.js.
+#
+# Los formularios marcados con data-fragmento se envían con fetch y piden
+# JSON (Accept: application/json / X-Fragmento: json); también se puede pedir
+# solo la fila en HTML con X-Fragmento: html. En ambos casos la vista
+# responde únicamente la fila nueva o modificada, renderizada con el mismo
+# macro de templates/_filas.html que usa el listado, y el navegador la pega
+# en la tabla sin volver a pedir ni dibujar el listado completo.
+#
+# Sin esos encabezados todo sigue como antes: flash + redirect.
+from flask import flash, get_template_attribute, jsonify, redirect, request
+
+PLANTILLA = "_filas.html"
+
+
+def pedido():
+    """"json", "html" o None (petición normal de formulario)."""
+    modo = request.headers.get("X-Fragmento", "").lower()
+    if modo in ("json", "html"):
+        return modo
+    if request.accept_mimetypes.best == "application/json":
+        return "json"
+    return None
+
+
+def fila(macro, entidad):
+    """HTML de la fila de `entidad` con el macro `macro` de _filas.html."""
+    return str(get_template_attribute(PLANTILLA, macro)(entidad))
+
+
+def responder(mensaje, categoria, destino, macro=None, entidad=None, status=None):
+    """Cierra una escritura: fila (fragmento) o flash + redirect a `destino`.
+
+    `macro` va solo cuando la escritura salió bien; si además no se pudo armar
+    la fila (`entidad` None) el navegador recarga `destino`. Sin `macro`, en
+    modo fragmento se responde `status` (400 por defecto) con el mensaje.
+    """
+    modo = pedido()
+    if modo is None:
+        flash(mensaje, categoria)
+        return redirect(destino)
+
+    if macro is None:
+        status = status or 400
+        if modo == "html":
+            return mensaje, status, {"Content-Type": "text/plain; charset=utf-8"}
+        return jsonify({"error": mensaje, "categoria": categoria}), status
+
+    if entidad is None:
+        flash(mensaje, categoria)
+        if modo == "html":
+            return redirect(destino)
+        return jsonify({"recargar": destino}), 200
+
+    html = fila(macro, entidad)
+    if modo == "html":
+        return html, status or 200, {"Content-Type": "text/html; charset=utf-8"}
+    return jsonify({"html": html, "mensaje": mensaje, "categoria": categoria, "fila": entidad}), status or 200
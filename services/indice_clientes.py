@@ -0,0 +1,232 @@
+# Índice en memoria para el autocompletado de clientes.
+#
+# Arreglo ordenado de (clave, idcliente) sobre la identificación y sobre cada
+# palabra del nombre / razón social normalizados (minúsculas, sin tildes).
+# Una consulta por prefijo es un bisect + recorrido de los primeros N.
+#
+# - La primera consulta de cada usuario lanza GET /clientes en segundo plano;
+#   mientras el índice se construye, las rutas consultan el backend como antes.
+# - clientes.crear_cliente / actualizar_cliente lo actualizan al escribir.
+# - Cada INDICE_CLIENTES_RECONCILIAR segundos se reconstruye en segundo plano.
+#
+# Hay un índice por token (backend.alcance), como en las cachés y el mapa de
+# identidad: cada usuario solo busca entre los clientes que el backend le
+# devolvió con su token. Se guardan los INDICE_CLIENTES_MAX_ALCANCES más usados.
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, insort
+from collections import OrderedDict
+
+import config
+from services import backend
+
+# Campos del backend que se conservan para poder recalcular el nombre
+_CAMPOS = ("idcliente", "identificacion", "tipo_local", "nombres", "apellidos",
+           "razonsocial", "nombrecompleto", "email", "contact_email")
+
+
+def _fuente(c):
+    """Campos relevantes del cliente, tolerando claves como `razonSocial` o `tipo`."""
+    c = {k.lower(): v for k, v in c.items()}
+    if "tipo_local" not in c and c.get("tipo"):
+        c["tipo_local"] = c["tipo"]
+    return {k: c[k] for k in _CAMPOS if c.get(k) is not None}
+
+
+def normalizar(texto):
+    texto = unicodedata.normalize("NFKD", str(texto or "")).lower()
+    return "".join(ch for ch in texto if not unicodedata.combining(ch)).strip()
+
+
+def _nombre(c):
+    razon = c.get("razonsocial")
+    personas = " ".join(filter(None, [c.get("nombres"), c.get("apellidos")]))
+    if c.get("tipo_local") == "JURIDICA":
+        return razon or personas
+    return c.get("nombrecompleto") or personas or razon or ""
+
+
+def _claves(c):
+    claves = set()
+    identificacion = normalizar(c.get("identificacion"))
+    if identificacion:
+        claves.add(identificacion)
+    palabras = normalizar(_nombre(c)).split()
+    for i in range(len(palabras)):
+        claves.add(" ".join(palabras[i:]))
+    return claves
+
+
+class IndiceClientes:
+    def __init__(self, token=None):
+        self.token = token
+        self._lock = threading.Lock()
+        # Los ids se guardan como str: el backend los manda como int, los
+        # formularios y las URLs como texto
+        self._claves = []       # [(clave, idcliente)] ordenado
+        self._fuentes = {}      # idcliente -> campos del cliente
+        self._resumenes = {}    # idcliente -> dict que recibe el dropdown
+        self._claves_por_id = {}
+        self.construido_en = None
+        self._cargando = False
+
+    # ---------- construcción ----------
+    def construir(self, clientes):
+        claves, fuentes, resumenes, por_id = [], {}, {}, {}
+        for c in clientes:
+            fuente = _fuente(c)
+            if fuente.get("idcliente") is None:
+                continue
+            idc = str(fuente["idcliente"])
+            fuentes[idc] = fuente
+            resumenes[idc] = self._resumen(fuente)
+            por_id[idc] = _claves(fuente)
+            claves.extend((k, idc) for k in por_id[idc])
+        claves.sort()
+
+        with self._lock:
+            self._claves, self._fuentes = claves, fuentes
+            self._resumenes, self._claves_por_id = resumenes, por_id
+            self.construido_en = time.monotonic()
+
+    def cargar_desde_backend(self):
+        resp = backend.get("/clientes", token=self.token)
+        resp.raise_for_status()
+        self.construir(resp.json())
+
+    @property
+    def listo(self):
+        return self.construido_en is not None
+
+    def asegurar(self):
+        """True si el índice se puede consultar ya.
+
+        Si no está construido, o le toca reconciliarse, lo carga en segundo plano;
+        la petición no espera el GET /clientes completo.
+        """
+        listo = self.listo
+        if listo and time.monotonic() - self.construido_en <= config.INDICE_CLIENTES_RECONCILIAR:
+            return True
+        with self._lock:
+            if self._cargando:
+                return listo
+            self._cargando = True
+        threading.Thread(target=self._cargar, name="indice-clientes", daemon=True).start()
+        return listo
+
+    def _cargar(self):
+        try:
+            self.cargar_desde_backend()
+        except Exception as e:
+            print("⚠️ Error cargando índice de clientes:", e)
+            if self.listo:
+                self.construido_en = time.monotonic()  # reintentar en el próximo ciclo
+        finally:
+            with self._lock:
+                self._cargando = False
+
+    # ---------- escrituras ----------
+    def guardar(self, cliente):
+        """Agrega o reemplaza un cliente (respuesta del backend tras crear)."""
+        if cliente.get("idcliente") is None:
+            return
+        self._aplicar(str(cliente["idcliente"]), _fuente(cliente))
+
+    def actualizar(self, idcliente, cambios):
+        """Mezcla campos editados sobre lo que ya se conoce del cliente."""
+        with self._lock:
+            fuente = dict(self._fuentes.get(str(idcliente), {"idcliente": idcliente}))
+        cambios = _fuente(cambios)
+        if {"nombres", "apellidos", "razonsocial"} & cambios.keys():
+            fuente.pop("nombrecompleto", None)
+        fuente.update(cambios)
+        self._aplicar(str(idcliente), fuente)
+
+    def _aplicar(self, idcliente, fuente):
+        nuevas = _claves(fuente)
+        with self._lock:
+            for clave in self._claves_por_id.get(idcliente, ()):
+                i = bisect_left(self._claves, (clave, idcliente))
+                if i < len(self._claves) and self._claves[i] == (clave, idcliente):
+                    del self._claves[i]
+            for clave in nuevas:
+                insort(self._claves, (clave, idcliente))
+            self._claves_por_id[idcliente] = nuevas
+            self._fuentes[idcliente] = fuente
+            self._resumenes[idcliente] = self._resumen(fuente)
+
+    # ---------- consultas ----------
+    def buscar(self, texto, limite=None):
+        limite = limite or config.AUTOCOMPLETAR_LIMITE
+        prefijo = normalizar(texto)
+        encontrados, vistos = [], set()
+        with self._lock:
+            i = bisect_left(self._claves, (prefijo,))
+            while i < len(self._claves) and len(encontrados) < limite:
+                clave, idc = self._claves[i]
+                if not clave.startswith(prefijo):
+                    break
+                if idc not in vistos:
+                    vistos.add(idc)
+                    encontrados.append(self._resumenes[idc])
+                i += 1
+        # Coincidencia exacta de identificación primero
+        encontrados.sort(key=lambda c: c["identificacion"] != prefijo)
+        return encontrados
+
+    def resumen(self, idcliente):
+        """Resumen (nombre, identificación) de un cliente indexado, o None."""
+        with self._lock:
+            return self._resumenes.get(str(idcliente))
+
+    @staticmethod
+    def _resumen(c):
+        return {
+            "idcliente": c.get("idcliente"),
+            "identificacion": str(c.get("identificacion") or ""),
+            "nombrecompleto": _nombre(c),
+            "email": c.get("email") or c.get("contact_email"),
+        }
+
+
+class IndicesPorAlcance:
+    """Un IndiceClientes por token. Los métodos usan el token de la sesión salvo que se pase otro."""
+
+    def __init__(self, max_alcances):
+        self.max_alcances = max_alcances
+        self._indices = OrderedDict()   # alcance -> IndiceClientes
+        self._lock = threading.Lock()
+
+    def para(self, token=backend.DE_SESION):
+        if token is backend.DE_SESION:
+            token = backend.token_actual()
+        alcance = backend.alcance(token)
+        with self._lock:
+            indice = self._indices.get(alcance)
+            if indice is None:
+                indice = self._indices[alcance] = IndiceClientes(token)
+                while len(self._indices) > self.max_alcances:
+                    self._indices.popitem(last=False)
+            else:
+                indice.token = token
+                self._indices.move_to_end(alcance)
+            return indice
+
+    def asegurar(self, token=backend.DE_SESION):
+        return self.para(token).asegurar()
+
+    def guardar(self, cliente, token=backend.DE_SESION):
+        self.para(token).guardar(cliente)
+
+    def actualizar(self, idcliente, cambios, token=backend.DE_SESION):
+        self.para(token).actualizar(idcliente, cambios)
+
+    def buscar(self, texto, limite=None, token=backend.DE_SESION):
+        return self.para(token).buscar(texto, limite)
+
+    def resumen(self, idcliente, token=backend.DE_SESION):
+        return self.para(token).resumen(idcliente)
+
+
+indice = IndicesPorAlcance(config.INDICE_CLIENTES_MAX_ALCANCES)
@@ -0,0 +1,414 @@
+# Indicadores del dashboard (KPIs) acumulados por día.
+#
+# Para cada entidad (facturas, egresos, reservas) se guarda, por día y estado,
+# cuántas filas hay y cuánto suman, más la contribución de cada fila por id.
+# Así la misma fila puede llegar varias veces (un listado, luego la respuesta
+# de una escritura, luego la reconciliación) sin contarse dos veces: se resta
+# lo que aportaba antes y se suma lo nuevo.
+#
+# Fuentes:
+#   - los listados: las filas que ya trajeron listar_facturas, listar_egresos
+#     y listar_reservas (solo la página o el rango que se pidió);
+#   - las escrituras: crear_egreso, actualizar_estado, enviar_factura,
+#     crear_reserva y marcar_reserva actualizan al momento;
+#   - la reconciliación: cada KPIS_RECONCILIAR segundos, al abrir el dashboard,
+#     un hilo pide los últimos KPIS_DIAS días de cada entidad con el token de
+#     quien lo abrió y reemplaza lo acumulado. Si el backend ignora
+#     fecha_inicio/fecha_fin (devuelve filas fuera de la ventana) esa ruta deja
+#     de reconciliarse en este worker: sería bajar toda la historia cada vez.
+#
+# Hay un acumulado por token (backend.alcance), como en el mapa de identidad:
+# cada usuario ve cifras armadas solo con las filas que el backend le devuelve
+# a él. Se guardan los KPIS_MAX_ALCANCES más usados.
+#
+# Solo se guardan los últimos KPIS_DIAS días, así que el dashboard se arma
+# sumando a lo sumo KPIS_DIAS cubetas sin importar cuánta historia exista, y
+# el resumen se recalcula solo cuando algo cambió. Es por worker.
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, timedelta
+from decimal import Decimal, InvalidOperation
+
+import config
+from services import backend
+from services.cache import registro
+
+CAMPOS_FECHA = ("fecha", "fecha_emision", "created_at")
+
+
+def _dia(fila):
+    for campo in CAMPOS_FECHA:
+        if fila.get(campo):
+            try:
+                return date.fromisoformat(str(fila[campo])[:10])
+            except ValueError:
+                return None
+    return None
+
+
+def _valor(texto):
+    try:
+        return Decimal(str(texto)) if texto not in (None, "") else Decimal(0)
+    except InvalidOperation:
+        return Decimal(0)
+
+
+# Distingue un acumulado recreado (tras salir del LRU) del anterior en la clave del resumen
+_generaciones = itertools.count()
+
+
+class Acumulado:
+    """Filas y cubetas por día de una entidad, para un token."""
+
+    def __init__(self, ruta, clave_id, campos_valor, estado_defecto):
+        self.ruta = ruta
+        self.clave_id = clave_id
+        self.campos_valor = campos_valor
+        self.estado_defecto = estado_defecto
+        self._filas = {}     # id -> (dia, estado, valor)
+        self._dias = {}      # dia -> {estado: [cantidad, total]}
+        self._escritas = {}  # id -> time.time() de las escrituras aún no reconciliadas
+        self._lock = threading.Lock()
+        self.generacion = next(_generaciones)
+        self.version = 0
+        self.reconciliado = None    # time.time() de la última reconciliación
+        self.reconciliaciones = 0
+        self.diferencias = 0        # filas que la reconciliación corrigió
+
+    def _id(self, fila):
+        valor = fila.get(self.clave_id) if isinstance(fila, dict) else None
+        return str(valor) if valor is not None else None
+
+    def _contribucion(self, fila, dia=None):
+        dia = _dia(fila) or dia
+        if dia is None:
+            return None
+        valor = next((fila[c] for c in self.campos_valor if fila.get(c) is not None), 0)
+        return dia, fila.get("estado") or self.estado_defecto, _valor(valor)
+
+    def _sumar(self, contribucion, signo):
+        dia, estado, valor = contribucion
+        cubeta = self._dias.setdefault(dia, {}).setdefault(estado, [0, Decimal(0)])
+        cubeta[0] += signo
+        cubeta[1] += signo * valor
+        if cubeta[0] == 0:
+            del self._dias[dia][estado]
+            if not self._dias[dia]:
+                del self._dias[dia]
+
+    def _poner(self, id_fila, contribucion, desde):
+        if contribucion is not None and contribucion[0] < desde:
+            contribucion = None
+        anterior = self._filas.pop(id_fila, None)
+        if anterior is not None:
+            self._sumar(anterior, -1)
+        if contribucion is not None:
+            self._filas[id_fila] = contribucion
+            self._sumar(contribucion, +1)
+        return anterior != contribucion
+
+    def _podar(self, desde):
+        viejos = [d for d in self._dias if d < desde]
+        if not viejos:
+            return
+        for d in viejos:
+            del self._dias[d]
+        self._filas = {i: c for i, c in self._filas.items() if c[0] >= desde}
+
+    def registrar_lista(self, filas, dia=None, escritura=False):
+        """Suma o actualiza filas del backend. `dia` sirve si la fila no trae fecha."""
+        desde = _inicio_ventana()
+        ahora = time.time()
+        cambios = 0
+        with self._lock:
+            for fila in filas or ():
+                id_fila = self._id(fila)
+                if id_fila is None:
+                    continue
+                cambios += self._poner(id_fila, self._contribucion(fila, dia), desde)
+                if escritura:
+                    self._escritas[id_fila] = ahora
+            if cambios:
+                self._podar(desde)
+                self.version += 1
+        return cambios
+
+    def registrar(self, fila, dia=None):
+        """Respuesta de una escritura (crear egreso, factura o reserva)."""
+        return self.registrar_lista([fila], dia=dia, escritura=True)
+
+    def cambiar_estado(self, id_fila, estado):
+        """Escritura que solo cambia el estado. False si la fila no está acumulada."""
+        id_fila = str(id_fila)
+        with self._lock:
+            anterior = self._filas.get(id_fila)
+            if anterior is None:
+                return False
+            if self._poner(id_fila, (anterior[0], estado, anterior[2]), _inicio_ventana()):
+                self.version += 1
+            self._escritas[id_fila] = time.time()
+            return True
+
+    def reemplazar(self, filas, pedido_en):
+        """Resultado de la reconciliación: pasa a ser la verdad para toda la ventana.
+
+        `pedido_en` es cuándo se pidió al backend; las escrituras posteriores
+        pueden no venir en la respuesta y se conservan.
+        """
+        desde = _inicio_ventana()
+        nuevas = {}
+        for fila in filas or ():
+            id_fila = self._id(fila)
+            contribucion = self._contribucion(fila) if id_fila is not None else None
+            if contribucion is not None and contribucion[0] >= desde:
+                nuevas[id_fila] = contribucion
+
+        with self._lock:
+            for id_fila, momento in self._escritas.items():
+                if momento >= pedido_en and id_fila in self._filas:
+                    nuevas[id_fila] = self._filas[id_fila]
+            self._escritas = {i: m for i, m in self._escritas.items() if m >= pedido_en}
+            self.diferencias += sum(1 for i, c in nuevas.items() if self._filas.get(i) != c)
+            self.diferencias += sum(1 for i in self._filas if i not in nuevas)
+            self._filas = nuevas
+            self._dias = {}
+            for contribucion in nuevas.values():
+                self._sumar(contribucion, +1)
+            self.version += 1
+            self.reconciliado = time.time()
+            self.reconciliaciones += 1
+
+    def totales(self, desde, hasta=None):
+        """{estado: (cantidad, total)} de desde..hasta (inclusive; sin hasta, hasta hoy)."""
+        hasta = hasta or date.today()
+        resultado = {}
+        with self._lock:
+            dia = desde
+            while dia <= hasta:
+                for estado, (cantidad, total) in self._dias.get(dia, {}).items():
+                    acumulado = resultado.setdefault(estado, [0, Decimal(0)])
+                    acumulado[0] += cantidad
+                    acumulado[1] += total
+                dia += timedelta(days=1)
+        return {estado: tuple(v) for estado, v in resultado.items()}
+
+    def invalidar(self, clave=None):
+        """Misma interfaz que CacheTTL: borra todo y fuerza una reconciliación."""
+        with self._lock:
+            borradas = len(self._filas)
+            self._filas, self._dias, self._escritas = {}, {}, {}
+            self.version += 1
+            self.reconciliado = None
+        return borradas
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                "filas": len(self._filas),
+                "dias": len(self._dias),
+                "version": self.version,
+                "reconciliaciones": self.reconciliaciones,
+                "diferencias": self.diferencias,
+                "reconciliado_hace": round(time.time() - self.reconciliado, 1) if self.reconciliado else None,
+            }
+
+
+class AcumuladosPorAlcance:
+    """Un Acumulado por token. Los métodos usan el token de la sesión salvo que se pase otro."""
+
+    def __init__(self, nombre, ruta, clave_id, campos_valor, estado_defecto, max_alcances):
+        self.nombre = nombre
+        self.ruta = ruta
+        self._argumentos = (ruta, clave_id, campos_valor, estado_defecto)
+        self.max_alcances = max_alcances
+        self._alcances = OrderedDict()   # alcance -> Acumulado
+        self._lock = threading.Lock()
+        registro[nombre] = self
+
+    def para(self, token=backend.DE_SESION):
+        if token is backend.DE_SESION:
+            token = backend.token_actual()
+        alcance = backend.alcance(token)
+        with self._lock:
+            acumulado = self._alcances.get(alcance)
+            if acumulado is None:
+                acumulado = self._alcances[alcance] = Acumulado(*self._argumentos)
+                while len(self._alcances) > self.max_alcances:
+                    self._alcances.popitem(last=False)
+            else:
+                self._alcances.move_to_end(alcance)
+            return acumulado
+
+    def registrar_lista(self, filas, dia=None, escritura=False, token=backend.DE_SESION):
+        return self.para(token).registrar_lista(filas, dia=dia, escritura=escritura)
+
+    def registrar(self, fila, dia=None, token=backend.DE_SESION):
+        return self.para(token).registrar(fila, dia=dia)
+
+    def cambiar_estado(self, id_fila, estado, token=backend.DE_SESION):
+        return self.para(token).cambiar_estado(id_fila, estado)
+
+    def totales(self, desde, hasta=None, token=backend.DE_SESION):
+        return self.para(token).totales(desde, hasta)
+
+    def invalidar(self, clave=None):
+        """Misma interfaz que CacheTTL: borra los acumulados de todos los tokens."""
+        with self._lock:
+            acumulados = list(self._alcances.values())
+            self._alcances.clear()
+        return sum(a.invalidar() for a in acumulados)
+
+    def estadisticas(self):
+        with self._lock:
+            acumulados = list(self._alcances.values())
+        datos = {"alcances": len(acumulados), "max_alcances": self.max_alcances,
+                 "sin_filtro_de_fechas": self.ruta in _sin_filtro}
+        for a in acumulados:
+            for campo, valor in a.estadisticas().items():
+                if campo not in ("version", "reconciliado_hace") and valor is not None:
+                    datos[campo] = datos.get(campo, 0) + valor
+        return datos
+
+
+facturas = AcumuladosPorAlcance("kpis_facturas", "/facturas", "idfactura", ("total",), "EMITIDA",
+                                config.KPIS_MAX_ALCANCES)
+egresos = AcumuladosPorAlcance("kpis_egresos", "/egresos", "idegreso", ("valor",), "PENDIENTE",
+                               config.KPIS_MAX_ALCANCES)
+reservas = AcumuladosPorAlcance("kpis_reservas", "/reservas", "id", ("valor", "valorreserva", "precio"),
+                                "RESERVADO", config.KPIS_MAX_ALCANCES)
+ACUMULADOS = (facturas, egresos, reservas)
+
+
+def _inicio_ventana():
+    return date.today() - timedelta(days=config.KPIS_DIAS - 1)
+
+
+# ================== RECONCILIACIÓN ==================
+_reconciliando = set()          # alcances con una reconciliación en curso
+_lock = threading.Lock()
+_sin_filtro = set()             # rutas cuyo backend ignora fecha_inicio/fecha_fin
+
+
+def _filas_de(datos):
+    if isinstance(datos, dict):
+        return datos.get("data", datos.get("items", [])), datos.get("total")
+    return datos, None
+
+
+def reconciliar(token):
+    """Pide la ventana completa de cada entidad y reemplaza lo acumulado de este token."""
+    desde, hoy = _inicio_ventana(), date.today()
+    for entidad in ACUMULADOS:
+        if entidad.ruta in _sin_filtro:
+            continue
+        acumulado = entidad.para(token)
+        pedido_en = time.time()
+        try:
+            response = backend.get(entidad.ruta, token=token, params={
+                "fecha_inicio": desde.isoformat(),
+                "fecha_fin": hoy.isoformat(),
+            })
+            if response.status_code != 200:
+                print(f"⚠️ KPIs: {entidad.ruta} respondió {response.status_code}")
+                continue
+            filas, total = _filas_de(response.json())
+        except Exception as e:
+            print(f"⚠️ KPIs: no se pudo reconciliar {entidad.ruta}:", e)
+            continue
+
+        if any(not desde <= dia <= hoy for dia in map(_dia, filas) if dia is not None):
+            # Ignoró el rango: esta vez se usa lo que cae en la ventana, pero no
+            # se vuelve a pedir toda la historia cada KPIS_RECONCILIAR segundos
+            _sin_filtro.add(entidad.ruta)
+            print(f"⚠️ KPIs: {entidad.ruta} ignora fecha_inicio/fecha_fin; se deja de reconciliar")
+
+        if total is not None and total > len(filas):
+            # El backend devolvió solo una página: sirve para sumar, no para reemplazar
+            acumulado.registrar_lista(filas)
+        else:
+            acumulado.reemplazar(filas, pedido_en)
+
+
+def reconciliar_si_toca(token):
+    """Lanza la reconciliación de este token en segundo plano si alguna entidad está vencida."""
+    limite = time.time() - config.KPIS_RECONCILIAR
+    pendientes = [e for e in ACUMULADOS if e.ruta not in _sin_filtro]
+    if all(a.reconciliado and a.reconciliado > limite for a in (e.para(token) for e in pendientes)):
+        return False
+    alcance = backend.alcance(token)
+    with _lock:
+        if alcance in _reconciliando:
+            return False
+        _reconciliando.add(alcance)
+
+    def correr():
+        try:
+            reconciliar(token)
+        finally:
+            with _lock:
+                _reconciliando.discard(alcance)
+
+    threading.Thread(target=correr, name="kpis-reconciliar", daemon=True).start()
+    return True
+
+
+# ================== RESUMEN PARA EL DASHBOARD ==================
+_resumenes = OrderedDict()      # alcance -> (clave, datos)
+
+
+def _suma(totales, excluir=()):
+    cantidad, total = 0, Decimal(0)
+    for estado, (c, t) in totales.items():
+        if estado not in excluir:
+            cantidad += c
+            total += t
+    return cantidad, total
+
+
+def resumen(token=backend.DE_SESION):
+    """Cifras del panel para este token. Se recalcula solo si cambió algún acumulado o el día."""
+    if token is backend.DE_SESION:
+        token = backend.token_actual()
+    alcance = backend.alcance(token)
+    acumulados = [e.para(token) for e in ACUMULADOS]
+    hoy = date.today()
+    clave = (hoy, tuple((a.generacion, a.version) for a in acumulados))
+    with _lock:
+        guardado = _resumenes.get(alcance)
+    if guardado is not None and guardado[0] == clave:
+        return guardado[1]
+
+    facturas_, egresos_, reservas_ = acumulados
+    excluidos = config.KPIS_ESTADOS_EXCLUIDOS
+    semana = hoy - timedelta(days=6)
+    ventana = _inicio_ventana()
+
+    facturado_hoy = _suma(facturas_.totales(hoy), excluidos)
+    facturado_semana = _suma(facturas_.totales(semana), excluidos)
+    egresos_hoy = _suma(egresos_.totales(hoy), excluidos)
+    egresos_semana = _suma(egresos_.totales(semana), excluidos)
+    egresos_ventana = egresos_.totales(ventana)
+    reservas_semana = reservas_.totales(semana)
+
+    datos = {
+        "facturado_hoy": facturado_hoy,
+        "facturado_semana": facturado_semana,
+        "egresos_hoy": egresos_hoy,
+        "egresos_semana": egresos_semana,
+        "egresos_pendientes": egresos_ventana.get("PENDIENTE", (0, Decimal(0))),
+        "flujo_hoy": facturado_hoy[1] - egresos_hoy[1],
+        "flujo_semana": facturado_semana[1] - egresos_semana[1],
+        "reservas_semana": _suma(reservas_semana),
+        "reservas_por_estado": dict(sorted(reservas_semana.items())),
+        "dias": config.KPIS_DIAS,
+        # Sin filtro de fechas la ruta no se reconcilia: sus cifras salen de listados y escrituras
+        "completo": all(a.reconciliado or e.ruta in _sin_filtro for e, a in zip(ACUMULADOS, acumulados)),
+    }
+    with _lock:
+        _resumenes[alcance] = (clave, datos)
+        _resumenes.move_to_end(alcance)
+        while len(_resumenes) > config.KPIS_MAX_ALCANCES:
+            _resumenes.popitem(last=False)
+    return datos
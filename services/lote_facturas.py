@@ -0,0 +1,337 @@
+# Facturación de reservas por lotes.
+#
+# Recibe una lista de reservas (selección o rango de fechas de
+# listar_reservas), arma cada factura con facturacion.payload_desde_reserva y
+# las envía con LOTE_FACTURAS_CONCURRENCIA hilos. El lote corre en segundo
+# plano y el reporte (resultado por reserva + throughput) queda en SQLite,
+# así cualquier worker puede mostrarlo. Si el worker se reinicia a mitad del
+# lote, el reporte lo da por interrumpido tras COLA_FACTURAS_BLOQUEO segundos
+# sin avance.
+#
+# Idempotencia: la tabla reservas_facturadas guarda, por reserva, si ya se
+# creó su factura. Antes del POST se reclama la reserva (INSERT), así dos
+# lotes no la facturan a la vez, y una reserva cuya factura se creó pero cuyo
+# PATCH falló solo reintenta el PATCH al volver a correr el lote. La reserva
+# se libera solo si el POST seguro no llegó (no conectó, admisión, circuito
+# abierto) o el backend lo rechazó (4xx, 503). Si termina sin saber si la
+# factura se creó (timeout de lectura, conexión cortada, 502/504, worker
+# caído, cualquier otro error después del POST), la reserva queda INCIERTA y
+# no se vuelve a facturar sola: hay que revisarla.
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+import config
+from services import backend
+from services.cola_facturas import conectar
+from services.facturacion import (
+    enviar_factura, factura_creada, factura_rechazada, marcar_reserva, payload_desde_reserva, sin_enviar,
+)
+
+# Resultados por reserva
+FACTURADA = "FACTURADA"        # factura creada y reserva marcada
+PARCIAL = "PARCIAL"            # factura creada, falta marcar la reserva
+OMITIDA = "OMITIDA"            # ya estaba facturada (o en otro lote)
+INCIERTA = "INCIERTA"          # no se sabe si se creó la factura
+ERROR = "ERROR"                # no se creó; se puede reintentar
+
+# Estados en reservas_facturadas (además de INCIERTA)
+EN_CURSO = "EN_CURSO"
+SIN_MARCAR = "SIN_MARCAR"
+MARCADA = "MARCADA"
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS reservas_facturadas (
+    idreserva TEXT PRIMARY KEY,
+    estado TEXT NOT NULL,
+    idfactura TEXT,
+    lote TEXT NOT NULL,
+    actualizado REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS lotes (
+    id TEXT PRIMARY KEY,
+    alcance TEXT NOT NULL,
+    total INTEGER NOT NULL,
+    concurrencia INTEGER NOT NULL,
+    inicio REAL NOT NULL,
+    fin REAL,
+    actualizado REAL
+);
+CREATE TABLE IF NOT EXISTS lote_items (
+    lote TEXT NOT NULL,
+    idreserva TEXT NOT NULL,
+    resultado TEXT NOT NULL,
+    mensaje TEXT,
+    idfactura TEXT,
+    segundos REAL,
+    PRIMARY KEY (lote, idreserva)
+);
+"""
+
+_inicializado = {"listo": False}
+_lock = threading.Lock()
+
+
+def _conexion():
+    if not _inicializado["listo"]:
+        with _lock:
+            if not _inicializado["listo"]:
+                conexion = conectar()
+                try:
+                    conexion.executescript(_ESQUEMA)
+                    _migrar(conexion)
+                finally:
+                    conexion.close()
+                _inicializado["listo"] = True
+    return conectar()
+
+
+def _migrar(conexion):
+    """Agrega lotes.actualizado a las bases creadas antes de esa columna."""
+    columnas = {fila["name"] for fila in conexion.execute("PRAGMA table_info(lotes)")}
+    if "actualizado" in columnas:
+        return
+    try:
+        conexion.execute("ALTER TABLE lotes ADD COLUMN actualizado REAL")
+    except sqlite3.OperationalError:
+        pass   # otro worker la agregó primero
+
+
+def _ejecutar(sql, parametros=()):
+    conexion = _conexion()
+    try:
+        return conexion.execute(sql, parametros).rowcount
+    finally:
+        conexion.close()
+
+
+def _consultar(sql, parametros=()):
+    conexion = _conexion()
+    try:
+        return conexion.execute(sql, parametros).fetchall()
+    finally:
+        conexion.close()
+
+
+# ================== API ==================
+def iniciar(reservas, idusuario=1, token=backend.DE_SESION):
+    """Lanza el lote en segundo plano y devuelve su id."""
+    if token is backend.DE_SESION:
+        token = backend.token_actual()
+
+    id_lote = uuid.uuid4().hex
+    ahora = time.time()
+    concurrencia = max(1, config.LOTE_FACTURAS_CONCURRENCIA)
+    _ejecutar(
+        "INSERT INTO lotes (id, alcance, total, concurrencia, inicio, actualizado) VALUES (?, ?, ?, ?, ?, ?)",
+        (id_lote, backend.alcance(token), len(reservas), concurrencia, ahora, ahora),
+    )
+    threading.Thread(
+        target=_correr, args=(id_lote, reservas, idusuario, token, concurrencia),
+        name=f"lote-facturas-{id_lote[:8]}", daemon=True,
+    ).start()
+    return id_lote
+
+
+def reporte(id_lote, token=backend.DE_SESION):
+    """Reporte del lote como dict, o None si no existe o es de otro usuario."""
+    if token is backend.DE_SESION:
+        token = backend.token_actual()
+
+    filas = _consultar("SELECT * FROM lotes WHERE id = ?", (id_lote,))
+    if not filas or filas[0]["alcance"] != backend.alcance(token):
+        return None
+    lote = filas[0]
+
+    items = [dict(f) for f in _consultar(
+        "SELECT idreserva, resultado, mensaje, idfactura, segundos FROM lote_items"
+        " WHERE lote = ? ORDER BY rowid", (id_lote,))]
+    conteo = {r: 0 for r in (FACTURADA, PARCIAL, OMITIDA, INCIERTA, ERROR)}
+    for item in items:
+        conteo[item["resultado"]] += 1
+
+    # Sin fin ni avance en COLA_FACTURAS_BLOQUEO segundos: el worker que lo
+    # corría se reinició y el lote no va a terminar solo
+    ultimo = lote["actualizado"] or lote["inicio"]
+    interrumpido = lote["fin"] is None and time.time() - ultimo > config.COLA_FACTURAS_BLOQUEO
+    terminado = lote["fin"] is not None or interrumpido
+    if lote["fin"] is not None:
+        duracion = lote["fin"] - lote["inicio"]
+    else:
+        duracion = (ultimo if interrumpido else time.time()) - lote["inicio"]
+    enviadas = [i["segundos"] for i in items if i["segundos"] is not None]
+    return {
+        "id": id_lote,
+        "terminado": terminado,
+        "interrumpido": interrumpido,
+        "total": lote["total"],
+        "procesadas": len(items),
+        "concurrencia": lote["concurrencia"],
+        "conteo": conteo,
+        "items": items,
+        "duracion": round(duracion, 3),
+        "por_segundo": round(len(items) / duracion, 2) if duracion > 0 else 0.0,
+        "latencia_p50": _percentil(enviadas, 0.50),
+        "latencia_p95": _percentil(enviadas, 0.95),
+    }
+
+
+def olvidar(idreserva):
+    """Borra el registro de una reserva (tras revisar a mano una INCIERTA) para poder refacturarla."""
+    return _ejecutar("DELETE FROM reservas_facturadas WHERE idreserva = ?", (str(idreserva),))
+
+
+def estadisticas():
+    filas = _consultar("SELECT estado, COUNT(*) AS n FROM reservas_facturadas GROUP BY estado")
+    return {fila["estado"]: fila["n"] for fila in filas}
+
+
+def _percentil(valores, p):
+    if not valores:
+        return None
+    valores = sorted(valores)
+    return round(valores[min(len(valores) - 1, int(p * len(valores)))], 3)
+
+
+# ================== EJECUCIÓN ==================
+def _correr(id_lote, reservas, idusuario, token, concurrencia):
+    try:
+        with ThreadPoolExecutor(max_workers=concurrencia, thread_name_prefix="lote") as pool:
+            for reserva in reservas:
+                pool.submit(_item, id_lote, reserva, idusuario, token)
+    finally:
+        _ejecutar("UPDATE lotes SET fin = ? WHERE id = ?", (time.time(), id_lote))
+
+
+def _item(id_lote, reserva, idusuario, token):
+    idreserva = str(reserva.get("id", reserva.get("idreserva")))
+    inicio = time.perf_counter()
+    try:
+        resultado, mensaje, idfactura = _facturar(id_lote, idreserva, reserva, idusuario, token)
+    except Exception as e:
+        resultado, mensaje, idfactura = ERROR, f"❌ Error inesperado: {e}", None
+    segundos = round(time.perf_counter() - inicio, 4) if resultado != OMITIDA else None
+    _ejecutar(
+        "INSERT OR REPLACE INTO lote_items (lote, idreserva, resultado, mensaje, idfactura, segundos)"
+        " VALUES (?, ?, ?, ?, ?, ?)",
+        (id_lote, idreserva, resultado, mensaje, idfactura, segundos),
+    )
+    _ejecutar("UPDATE lotes SET actualizado = ? WHERE id = ?", (time.time(), id_lote))
+
+
+def _facturar(id_lote, idreserva, reserva, idusuario, token):
+    if reserva.get("estado") and reserva["estado"] != "RESERVADO":
+        return OMITIDA, f"La reserva está {reserva['estado']}", None
+
+    previo = _reclamar(id_lote, idreserva)
+    if previo is not None:
+        if previo["estado"] == SIN_MARCAR:
+            return _marcar(idreserva, previo["idfactura"], token)
+        if previo["estado"] == MARCADA:
+            return OMITIDA, "Ya facturada en un lote anterior", previo["idfactura"]
+        if previo["estado"] == INCIERTA:
+            return INCIERTA, "⚠️ Un lote anterior no supo si se creó esta factura: revísela en Siigo", None
+        if time.time() - previo["actualizado"] < config.COLA_FACTURAS_BLOQUEO:
+            return OMITIDA, "Se está facturando en otro lote", None
+        return INCIERTA, "⚠️ Un lote anterior se interrumpió enviando esta factura: revísela en Siigo", None
+
+    try:
+        payload = payload_desde_reserva(reserva, idusuario)
+    except Exception as e:
+        _liberar(idreserva)
+        return ERROR, f"❌ {e}", None
+
+    try:
+        return _enviar(idreserva, payload, token)
+    except Exception as e:
+        # Cuerpo inesperado, SQLite...: el POST ya pudo salir, así que la
+        # reserva no se libera, pero tampoco queda EN_CURSO hasta el bloqueo
+        print(f"❌ Error inesperado facturando la reserva {idreserva}:", e)
+        _incierta(idreserva, e)
+        return ERROR, f"❌ Error inesperado ({e}): la factura pudo crearse, revísela en Siigo", None
+
+
+def _enviar(idreserva, payload, token):
+    try:
+        response, mensajes = enviar_factura(payload, token=token)
+    except Exception as e:
+        if sin_enviar(e):
+            # No llegó a conectar (admisión, circuito abierto): no se creó nada
+            _liberar(idreserva)
+            return ERROR, f"❌ Error conectando al backend: {e}", None
+        if not isinstance(e, requests.RequestException):
+            raise
+        # Timeout de lectura o conexión cortada con el cuerpo ya enviado
+        return _incierta(idreserva, e)
+
+    if not factura_creada(response):
+        if factura_rechazada(response):
+            _liberar(idreserva)
+            return ERROR, mensajes[0][1], None
+        # 502/504/500: el backend pudo crearla antes de fallar
+        return _incierta(idreserva, f"HTTP {response.status_code}")
+
+    try:
+        idfactura = response.json().get("idfactura")
+    except (ValueError, AttributeError):
+        idfactura = None
+    idfactura = str(idfactura) if idfactura is not None else None
+    _ejecutar(
+        "UPDATE reservas_facturadas SET estado = ?, idfactura = ?, actualizado = ? WHERE idreserva = ?",
+        (SIN_MARCAR, idfactura, time.time(), idreserva),
+    )
+    return _marcar(idreserva, idfactura, token)
+
+
+def _marcar(idreserva, idfactura, token):
+    try:
+        marcada = marcar_reserva(idreserva, token=token)
+    except Exception as e:
+        print(f"⚠️ Error marcando reserva {idreserva} como facturada:", e)
+        marcada = False
+
+    if not marcada:
+        return PARCIAL, "⚠️ La factura se creó pero no se pudo actualizar la reserva", idfactura
+    _ejecutar(
+        "UPDATE reservas_facturadas SET estado = ?, actualizado = ? WHERE idreserva = ?",
+        (MARCADA, time.time(), idreserva),
+    )
+    return FACTURADA, "✅ Factura creada correctamente", idfactura
+
+
+def _reclamar(id_lote, idreserva):
+    """Reclama la reserva para este lote. Devuelve la fila previa si ya estaba reclamada."""
+    conexion = _conexion()
+    try:
+        conexion.execute("BEGIN IMMEDIATE")
+        fila = conexion.execute(
+            "SELECT * FROM reservas_facturadas WHERE idreserva = ?", (idreserva,)
+        ).fetchone()
+        if fila is None:
+            conexion.execute(
+                "INSERT INTO reservas_facturadas (idreserva, estado, lote, actualizado) VALUES (?, ?, ?, ?)",
+                (idreserva, EN_CURSO, id_lote, time.time()),
+            )
+        conexion.execute("COMMIT")
+        return fila
+    except Exception:
+        conexion.execute("ROLLBACK")
+        raise
+    finally:
+        conexion.close()
+
+
+def _incierta(idreserva, motivo):
+    _ejecutar(
+        "UPDATE reservas_facturadas SET estado = ?, actualizado = ? WHERE idreserva = ?",
+        (INCIERTA, time.time(), idreserva),
+    )
+    return INCIERTA, f"⚠️ No se sabe si la factura se creó ({motivo}): revísela en Siigo", None
+
+
+def _liberar(idreserva):
+    _ejecutar("DELETE FROM reservas_facturadas WHERE idreserva = ? AND estado = ?", (idreserva, EN_CURSO))
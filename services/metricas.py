@@ -0,0 +1,215 @@
+# Instrumentación de latencias (por worker).
+#
+# - Histograma por endpoint de Flask (tiempo total, incluido el streaming).
+# - Histograma por ruta del backend normalizada (/facturas/{id}) y contador
+#   de códigos de estado.
+# - Histograma de render por plantilla.
+#
+# Se expone en formato Prometheus en /metrics y, por petición, en la cabecera
+# Server-Timing (app, upstream, render).
+#
+# El registro es de cada proceso: con varios workers de gunicorn cada scrape
+# cae en uno al azar. Toda serie lleva la etiqueta `pid`, así los contadores
+# de cada worker no se mezclan (en Prometheus: sum without (pid) (...)).
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+
+from flask import g, has_app_context, request
+from flask.signals import before_render_template, template_rendered
+
+import config
+
+_NUMERO = re.compile(r"/\d+(?=/|$)")
+
+
+class Histograma:
+    __slots__ = ("limites", "conteos", "suma", "total", "_lock")
+
+    def __init__(self, limites):
+        self.limites = limites
+        self.conteos = [0] * (len(limites) + 1)
+        self.suma = 0.0
+        self.total = 0
+        self._lock = threading.Lock()
+
+    def observar(self, valor):
+        i = bisect_left(self.limites, valor)
+        with self._lock:
+            self.conteos[i] += 1
+            self.suma += valor
+            self.total += 1
+
+    def copia(self):
+        with self._lock:
+            return list(self.conteos), self.suma, self.total
+
+
+def _clave_etiquetas(etiquetas):
+    return tuple(sorted((k, str(v)) for k, v in etiquetas.items()))
+
+
+class Registro:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histogramas = {}   # (nombre, etiquetas) -> Histograma
+        self.contadores = {}    # (nombre, etiquetas) -> int
+        self.medidores = []     # funciones que generan (nombre, etiquetas, valor) al exportar
+        self.ayuda = {}
+
+    def histograma(self, nombre, **etiquetas):
+        clave = (nombre, _clave_etiquetas(etiquetas))
+        h = self.histogramas.get(clave)
+        if h is None:
+            with self._lock:
+                h = self.histogramas.setdefault(clave, Histograma(config.METRICAS_BUCKETS))
+        return h
+
+    def incrementar(self, nombre, cantidad=1, **etiquetas):
+        clave = (nombre, _clave_etiquetas(etiquetas))
+        with self._lock:
+            self.contadores[clave] = self.contadores.get(clave, 0) + cantidad
+
+    def medidor(self, funcion):
+        """Registra una función que produce (nombre, {etiquetas}, valor) en cada exportación."""
+        self.medidores.append(funcion)
+
+    def describir(self, nombre, tipo, texto):
+        self.ayuda[nombre] = (tipo, texto)
+
+    def exportar(self):
+        """Texto en formato de exposición de Prometheus."""
+        lineas = []
+        descritos = set()
+        proceso = (("pid", str(os.getpid())),)
+        # Copias: una petición puede agregar series nuevas mientras se exporta
+        with self._lock:
+            contadores = list(self.contadores.items())
+            histogramas = list(self.histogramas.items())
+
+        def cabecera(nombre):
+            if nombre in descritos or nombre not in self.ayuda:
+                return
+            tipo, texto = self.ayuda[nombre]
+            lineas.append(f"# HELP {nombre} {texto}")
+            lineas.append(f"# TYPE {nombre} {tipo}")
+            descritos.add(nombre)
+
+        for (nombre, etiquetas), valor in sorted(contadores):
+            cabecera(nombre)
+            lineas.append(f"{nombre}{_etiquetas(proceso + etiquetas)} {valor}")
+
+        medidas = sorted(
+            (nombre, proceso + _clave_etiquetas(etiquetas), valor)
+            for funcion in list(self.medidores)
+            for nombre, etiquetas, valor in funcion()
+        )
+        for nombre, etiquetas, valor in medidas:
+            cabecera(nombre)
+            lineas.append(f"{nombre}{_etiquetas(etiquetas)} {valor}")
+
+        for (nombre, etiquetas), h in sorted(histogramas, key=lambda x: x[0]):
+            cabecera(nombre)
+            etiquetas = proceso + etiquetas
+            conteos, suma, total = h.copia()
+            acumulado = 0
+            for limite, conteo in zip(h.limites, conteos):
+                acumulado += conteo
+                lineas.append(f"{nombre}_bucket{_etiquetas(etiquetas + (('le', repr(limite)),))} {acumulado}")
+            lineas.append(f"{nombre}_bucket{_etiquetas(etiquetas + (('le', '+Inf'),))} {total}")
+            lineas.append(f"{nombre}_sum{_etiquetas(etiquetas)} {suma:.6f}")
+            lineas.append(f"{nombre}_count{_etiquetas(etiquetas)} {total}")
+
+        return "\n".join(lineas) + "\n"
+
+
+def _escapar(valor):
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _etiquetas(pares):
+    if not pares:
+        return ""
+    return "{" + ",".join(f'{k}="{_escapar(v)}"' for k, v in pares) + "}"
+
+
+registro = Registro()
+registro.describir("flask_peticion_segundos", "histogram", "Latencia por endpoint de Flask")
+registro.describir("flask_respuestas_total", "counter", "Respuestas por endpoint y código")
+registro.describir("upstream_peticion_segundos", "histogram", "Latencia de llamadas al backend por ruta")
+registro.describir("upstream_respuestas_total", "counter", "Respuestas del backend por ruta y código")
+registro.describir("plantilla_render_segundos", "histogram", "Tiempo de render por plantilla")
+
+
+def normalizar_ruta(ruta):
+    """/facturas/15/estado -> /facturas/{id}/estado (sin query string)."""
+    return _NUMERO.sub("/{id}", ruta.split("?", 1)[0])
+
+
+def _acumular(nombre, segundos):
+    if has_app_context():
+        tiempos = g.setdefault("_tiempos", {})
+        tiempos[nombre] = tiempos.get(nombre, 0.0) + segundos
+
+
+# ================== BACKEND ==================
+def observar_upstream(metodo, ruta, estado, segundos):
+    if not config.METRICAS_HABILITADAS:
+        return
+    ruta = normalizar_ruta(ruta)
+    registro.histograma("upstream_peticion_segundos", metodo=metodo, ruta=ruta).observar(segundos)
+    registro.incrementar("upstream_respuestas_total", metodo=metodo, ruta=ruta, estado=estado)
+    _acumular("upstream", segundos)
+
+
+# ================== FLASK ==================
+def _inicio_peticion():
+    g._inicio = time.perf_counter()
+
+
+def _fin_peticion(response):
+    inicio = g.get("_inicio")
+    if inicio is None:
+        return response
+
+    endpoint = request.endpoint or "sin_endpoint"
+    metodo = request.method
+    estado = response.status_code
+    tiempos = g.get("_tiempos", {})
+
+    partes = [f"app;dur={(time.perf_counter() - inicio) * 1000:.1f}"]
+    partes += [f"{nombre};dur={segundos * 1000:.1f}" for nombre, segundos in tiempos.items()]
+    response.headers["Server-Timing"] = ", ".join(partes)
+
+    # Se mide al cerrar la respuesta para incluir el cuerpo en streaming
+    def registrar():
+        segundos = time.perf_counter() - inicio
+        registro.histograma("flask_peticion_segundos", endpoint=endpoint, metodo=metodo).observar(segundos)
+        registro.incrementar("flask_respuestas_total", endpoint=endpoint, metodo=metodo, estado=estado)
+
+    response.call_on_close(registrar)
+    return response
+
+
+def _antes_de_render(app, template, **extra):
+    g.setdefault("_render_inicio", {})[template.name] = time.perf_counter()
+
+
+def _despues_de_render(app, template, **extra):
+    inicio = g.get("_render_inicio", {}).pop(template.name, None)
+    if inicio is None:
+        return
+    segundos = time.perf_counter() - inicio
+    registro.histograma("plantilla_render_segundos", plantilla=template.name).observar(segundos)
+    _acumular("render", segundos)
+
+
+def init_app(app):
+    if not config.METRICAS_HABILITADAS:
+        return
+    app.before_request(_inicio_peticion)
+    app.after_request(_fin_peticion)
+    before_render_template.connect(_antes_de_render, app)
+    template_rendered.connect(_despues_de_render, app)
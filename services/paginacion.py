@@ -0,0 +1,159 @@
+# Paginación de listados y render en streaming.
+#
+# Los listados leen `pagina`, `por_pagina` y `cursor` de la URL y se los pasan
+# al backend como limit/offset/cursor. Si el backend no pagina la página se
+# recorta aquí y se recuerda para esa ruta (o se fija en config.BACKEND_PAGINA).
+# Se detecta de dos formas: devuelve más filas de las pedidas (ignora limit),
+# o una página después de la primera empieza con la misma fila que offset 0
+# (ignora offset; en ese caso se vuelve a pedir la colección completa).
+#
+# El backend puede responder una lista o un objeto {"data": [...], "total": N,
+# "next_cursor": "..."}; ambos se normalizan en `Pagina`.
+from flask import get_flashed_messages, request, stream_template, url_for
+
+import config
+from services import backend
+
+# ruta -> True/False cuando ya se sabe si el backend pagina (por worker)
+_soporta_paginacion = dict(config.BACKEND_PAGINA)
+
+
+class Pagina:
+    def __init__(self, items, numero, por_pagina, hay_siguiente, total=None, cursor_siguiente=None):
+        self.items = items
+        self.numero = numero
+        self.por_pagina = por_pagina
+        self.hay_siguiente = hay_siguiente
+        self.total = total
+        self.cursor_siguiente = cursor_siguiente
+
+    @property
+    def total_paginas(self):
+        if self.total is None:
+            return None
+        return max(1, -(-self.total // self.por_pagina))
+
+    def _url(self, **cambios):
+        args = request.args.to_dict()
+        args.update(cambios)
+        args = {k: v for k, v in args.items() if v is not None}
+        return url_for(request.endpoint, **(request.view_args or {}), **args)
+
+    @property
+    def url_anterior(self):
+        if self.numero <= 1 or self.cursor_siguiente:
+            return None
+        return self._url(pagina=self.numero - 1, cursor=None)
+
+    @property
+    def url_siguiente(self):
+        if self.cursor_siguiente:
+            return self._url(cursor=self.cursor_siguiente, pagina=None)
+        if not self.hay_siguiente:
+            return None
+        return self._url(pagina=self.numero + 1)
+
+
+def _entero(nombre, defecto, minimo, maximo):
+    try:
+        valor = int(request.args.get(nombre, defecto))
+    except (TypeError, ValueError):
+        valor = defecto
+    return min(max(valor, minimo), maximo)
+
+
+def argumentos():
+    """(pagina, por_pagina, cursor) de la petición actual."""
+    pagina = _entero("pagina", 1, 1, 10**6)
+    por_pagina = _entero("por_pagina", config.PAGINA_POR_DEFECTO, 1, config.PAGINA_MAXIMO)
+    return pagina, por_pagina, request.args.get("cursor") or None
+
+
+def obtener(ruta, params=None, **kwargs):
+    """Pide una página de `ruta` al backend.
+
+    Devuelve (response, Pagina). Si la respuesta no es 200, Pagina es None y
+    la vista decide cómo reportarlo, igual que antes.
+    """
+    pagina, por_pagina, cursor = argumentos()
+    offset = (pagina - 1) * por_pagina
+    filtros = dict(params or {})
+    params = dict(filtros)
+
+    soporta = _soporta_paginacion.get(ruta)
+    if soporta is not False:
+        # Una fila extra para saber si hay página siguiente sin pedir el total
+        params.update(limit=por_pagina + 1, offset=offset)
+        if cursor:
+            params["cursor"] = cursor
+
+    response = backend.get(ruta, params=params, **kwargs)
+    if response.status_code != 200:
+        return response, None
+    datos, total, cursor_siguiente = _normalizar(response.json())
+
+    if soporta is None and not backend.es_obsoleta(response):
+        if len(datos) > por_pagina + 1:
+            _soporta_paginacion[ruta] = soporta = False
+        elif offset > 0 and not cursor and datos:
+            primera = _primera_fila(ruta, filtros, kwargs)
+            if primera is not None:
+                _soporta_paginacion[ruta] = soporta = primera != datos[0]
+                if soporta is False:
+                    # Respetó limit pero no offset: hace falta la colección completa
+                    response = backend.get(ruta, params=filtros, **kwargs)
+                    if response.status_code != 200:
+                        return response, None
+                    datos, total, cursor_siguiente = _normalizar(response.json())
+
+    if soporta is False:
+        # Emulación local: el backend devolvió la colección completa
+        total = len(datos)
+        items = datos[offset:offset + por_pagina]
+        hay_siguiente = offset + por_pagina < total
+    else:
+        items = datos[:por_pagina]
+        hay_siguiente = len(datos) > por_pagina
+
+    return response, Pagina(items, pagina, por_pagina, hay_siguiente, total, cursor_siguiente)
+
+
+def _normalizar(datos):
+    """(filas, total, next_cursor) de una lista o de {"data": [...], "total": N, "next_cursor": ...}."""
+    if isinstance(datos, dict):
+        return datos.get("data", datos.get("items", [])), datos.get("total"), datos.get("next_cursor")
+    return datos, None, None
+
+
+def _primera_fila(ruta, filtros, kwargs):
+    """Primera fila de la colección (offset 0), para ver si el backend respeta offset."""
+    response = backend.get(ruta, params=dict(filtros, limit=1, offset=0), **kwargs)
+    if response.status_code != 200 or backend.es_obsoleta(response):
+        return None
+    filas = _normalizar(response.json())[0]
+    return filas[0] if filas else None
+
+
+def _agrupar(fragmentos, tamano):
+    buffer, acumulado = [], 0
+    for fragmento in fragmentos:
+        buffer.append(fragmento)
+        acumulado += len(fragmento)
+        if acumulado >= tamano:
+            yield "".join(buffer)
+            buffer, acumulado = [], 0
+    if buffer:
+        yield "".join(buffer)
+
+
+def render_streaming(plantilla, **contexto):
+    """Como render_template, pero envía el HTML a medida que se genera.
+
+    El encabezado de la tabla llega al navegador antes de que se construyan
+    todas las filas; los fragmentos se agrupan para no escribir byte a byte.
+    """
+    # La cookie de sesión se guarda antes de generar el cuerpo: los mensajes se
+    # sacan de la sesión ahora (quedan en el contexto de la petición para
+    # base.html), si no se volverían a mostrar en cada recarga
+    get_flashed_messages(with_categories=True)
+    return _agrupar(stream_template(plantilla, **contexto), config.STREAMING_FRAGMENTO)
@@ -0,0 +1,270 @@
+# Perfilador por muestreo de peticiones individuales.
+#
+# Se activa para una petición con el encabezado X-Perfilar: 1 o ?perfilar=1
+# (solo administradores), o al azar para 1 de cada PERFILADOR_MUESTREO
+# peticiones (0 = nunca). Mientras dura la petición, incluido el cuerpo en
+# streaming, un hilo por worker toma la pila del hilo que la atiende cada
+# PERFILADOR_INTERVALO segundos con sys._current_frames(); sin peticiones
+# perfiladas ese hilo duerme. El costo para la petición es el de ceder el GIL
+# en cada muestra.
+#
+# Cada perfil se guarda en PERFILADOR_DIR como <id>.folded (pilas colapsadas,
+# "a;b;c N" por línea, listo para flamegraph.pl o speedscope) y <id>.json con
+# la ruta, la duración y el reparto del tiempo por categoría (backend, JSON,
+# formulario, plantilla, resto) según la pila de cada muestra, más los tiempos
+# medidos por services/metricas.py. Se conservan los PERFILADOR_MAX_PERFILES
+# más recientes (entre todos los workers): los viejos se borran al guardar.
+import itertools
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+from flask import g, request, session
+
+import config
+
+# Primera coincidencia recorriendo la pila desde la hoja: JSON dentro de una
+# llamada al backend cuenta como JSON, no como backend. Esperar al pool de
+# services/fanout.py (llamadas concurrentes al backend) cuenta como backend.
+CATEGORIAS = (
+    ("json", ("json/", "requests/models.py:json", "services/exportacion.py:_elementos")),
+    ("formulario", ("werkzeug/formparser.py", "werkzeug/sansio/multipart.py", "services/formularios.py")),
+    ("plantilla", ("jinja2/", "markupsafe/", ".html:")),
+    ("backend", ("requests/", "urllib3/", "http/client.py", "socket.py", "ssl.py", "services/backend.py",
+                 "services/fanout.py")),
+)
+
+_RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_nombres = {}                    # code -> "archivo:función"
+_activos = {}                    # thread id -> Perfil
+_lock = threading.Lock()
+_hay_activos = threading.Event()
+_muestreador = {"pid": None}
+_secuencia = itertools.count()
+
+
+def _archivo(ruta):
+    if ruta.startswith(_RAIZ):
+        return os.path.relpath(ruta, _RAIZ)
+    for marca in ("site-packages" + os.sep, "lib" + os.sep + "python"):
+        i = ruta.rfind(marca)
+        if i >= 0:
+            resto = ruta[i + len(marca):]
+            return resto.split(os.sep, 1)[1] if marca.startswith("lib") and os.sep in resto else resto
+    return os.path.basename(ruta)
+
+
+def _nombre(code):
+    nombre = _nombres.get(code)
+    if nombre is None:
+        nombre = f"{_archivo(code.co_filename)}:{code.co_name}".replace(";", ",").replace(" ", "_")
+        _nombres[code] = nombre
+    return nombre
+
+
+def categoria(pila):
+    """Categoría de una pila (tupla raíz -> hoja de "archivo:función")."""
+    for marco in reversed(pila):
+        for nombre, patrones in CATEGORIAS:
+            if any(p in marco for p in patrones):
+                return nombre
+    return "resto"
+
+
+class Perfil:
+    def __init__(self, motivo):
+        self.motivo = motivo
+        self.inicio = time.time()
+        self.inicio_perf = time.perf_counter()
+        self.limite = self.inicio_perf + config.PERFILADOR_MAX_SEGUNDOS
+        self.pilas = Counter()
+        self.muestras = 0
+        self.endpoint = request.endpoint
+        self.metodo = request.method
+        self.ruta = request.full_path.rstrip("?")
+        self.tiempos = None      # g._tiempos de services/metricas.py
+
+    def muestra(self, frame):
+        pila = []
+        while frame is not None:
+            pila.append(_nombre(frame.f_code))
+            frame = frame.f_back
+        pila.reverse()
+        self.pilas[tuple(pila)] += 1
+        self.muestras += 1
+
+
+# ================== MUESTREO ==================
+def _muestrear():
+    while True:
+        _hay_activos.wait()
+        time.sleep(config.PERFILADOR_INTERVALO)
+        frames = sys._current_frames()
+        ahora = time.perf_counter()
+        with _lock:
+            for hilo, perfil in list(_activos.items()):
+                if ahora > perfil.limite:
+                    # Nadie cerró la respuesta (cliente colgado, error raro): se abandona
+                    del _activos[hilo]
+                    continue
+                frame = frames.get(hilo)
+                if frame is not None:
+                    perfil.muestra(frame)
+            if not _activos:
+                _hay_activos.clear()
+        del frames
+
+
+def _iniciar_muestreador():
+    pid = os.getpid()
+    if _muestreador["pid"] == pid:
+        return
+    with _lock:
+        if _muestreador["pid"] == pid:
+            return
+        threading.Thread(target=_muestrear, name="perfilador", daemon=True).start()
+        _muestreador["pid"] = pid
+
+
+# ================== PETICIONES ==================
+def _motivo():
+    if request.endpoint in config.PERFILADOR_EXCLUIDOS:
+        return None
+    pedido = request.headers.get("X-Perfilar") == "1" or request.args.get("perfilar") == "1"
+    if pedido and "token" in session and session.get("username") in config.ADMIN_USUARIOS:
+        return "pedido"
+    if config.PERFILADOR_MUESTREO and random.randrange(config.PERFILADOR_MUESTREO) == 0:
+        return "muestreo"
+    return None
+
+
+def _antes():
+    motivo = _motivo()
+    if motivo is None:
+        return
+    _iniciar_muestreador()
+    perfil = Perfil(motivo)
+    g._perfil = perfil
+    with _lock:
+        _activos[threading.get_ident()] = perfil
+        _hay_activos.set()
+
+
+def _despues(response):
+    perfil = g.pop("_perfil", None)
+    if perfil is None:
+        return response
+    hilo = threading.get_ident()
+    # El mismo dict que sigue llenando metricas mientras se manda el cuerpo
+    perfil.tiempos = g.setdefault("_tiempos", {})
+    estado = response.status_code
+    if perfil.motivo == "pedido":
+        response.headers["X-Perfil"] = _identificador(perfil)
+
+    # Se cierra al terminar de mandar la respuesta, para incluir el render en streaming
+    def cerrar():
+        with _lock:
+            _activos.pop(hilo, None)
+        try:
+            guardar(perfil, estado)
+        except OSError as e:
+            print("⚠️ No se pudo guardar el perfil:", e)
+
+    response.call_on_close(cerrar)
+    return response
+
+
+def _identificador(perfil):
+    if not hasattr(perfil, "id"):
+        marca = time.strftime("%Y%m%dT%H%M%S", time.localtime(perfil.inicio))
+        endpoint = (perfil.endpoint or "sin_endpoint").replace(".", "-")
+        perfil.id = f"{marca}-{os.getpid()}-{next(_secuencia)}-{endpoint}"
+    return perfil.id
+
+
+# ================== ALMACENAMIENTO ==================
+def guardar(perfil, estado):
+    segundos = time.perf_counter() - perfil.inicio_perf
+    reparto = Counter()
+    for pila, n in perfil.pilas.items():
+        reparto[categoria(pila)] += n
+    identificador = _identificador(perfil)
+
+    os.makedirs(config.PERFILADOR_DIR, exist_ok=True)
+    base = os.path.join(config.PERFILADOR_DIR, identificador)
+    with open(base + ".folded.tmp", "w", encoding="utf-8") as f:
+        for pila, n in perfil.pilas.most_common():
+            f.write(f"{';'.join(pila)} {n}\n")
+    meta = {
+        "id": identificador,
+        "motivo": perfil.motivo,
+        "inicio": perfil.inicio,
+        "endpoint": perfil.endpoint,
+        "metodo": perfil.metodo,
+        "ruta": perfil.ruta,
+        "estado": estado,
+        "pid": os.getpid(),
+        "segundos": round(segundos, 4),
+        "muestras": perfil.muestras,
+        "intervalo": config.PERFILADOR_INTERVALO,
+        # Tiempo estimado por categoría a partir de las muestras
+        "reparto_ms": {c: round(n * segundos / perfil.muestras * 1000, 1) for c, n in reparto.items()}
+        if perfil.muestras else {},
+        # Tiempo medido (services/metricas.py): backend y render de plantillas
+        "medido_ms": {k: round(v * 1000, 1) for k, v in (perfil.tiempos or {}).items()},
+    }
+    with open(base + ".json.tmp", "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    os.replace(base + ".folded.tmp", base + ".folded")
+    os.replace(base + ".json.tmp", base + ".json")
+    _recortar()
+    return meta
+
+
+def _recortar():
+    """Borra los perfiles más viejos por encima de PERFILADOR_MAX_PERFILES."""
+    try:
+        nombres = sorted(n[:-5] for n in os.listdir(config.PERFILADOR_DIR) if n.endswith(".json"))
+    except FileNotFoundError:
+        return
+    for viejo in nombres[:max(0, len(nombres) - config.PERFILADOR_MAX_PERFILES)]:
+        for extension in (".json", ".folded"):
+            try:
+                os.remove(os.path.join(config.PERFILADOR_DIR, viejo + extension))
+            except FileNotFoundError:
+                pass   # otro worker llegó primero
+
+
+def listar():
+    """Metadatos de los perfiles guardados, del más reciente al más viejo."""
+    try:
+        nombres = sorted((n for n in os.listdir(config.PERFILADOR_DIR) if n.endswith(".json")), reverse=True)
+    except FileNotFoundError:
+        return []
+    perfiles = []
+    for nombre in nombres:
+        try:
+            with open(os.path.join(config.PERFILADOR_DIR, nombre), encoding="utf-8") as f:
+                perfiles.append(json.load(f))
+        except (OSError, ValueError):
+            continue   # recién borrado por el recorte
+    return perfiles
+
+
+def ruta_archivo(identificador, extension):
+    """Ruta del perfil `identificador` si existe (el id no puede salir de PERFILADOR_DIR)."""
+    if os.path.basename(identificador) != identificador or identificador.startswith("."):
+        return None
+    ruta = os.path.join(config.PERFILADOR_DIR, identificador + extension)
+    return ruta if os.path.isfile(ruta) else None
+
+
+def init_app(app):
+    if not config.PERFILADOR_HABILITADO:
+        return
+    app.before_request(_antes)
+    app.after_request(_despues)
@@ -0,0 +1,138 @@
+# Caché de bytecode Jinja en disco y caché de fragmentos para las filas de los listados.
+#
+# Bytecode: las plantillas compiladas se guardan en PLANTILLAS_BYTECODE_DIR,
+# así un worker nuevo (o un reinicio) las carga sin volver a compilarlas.
+# Jinja invalida cada archivo solo si cambia el código fuente de la plantilla.
+#
+# Fragmentos: la etiqueta {% cache id, datos %} ... {% endcache %} guarda el
+# HTML del bloque por (plantilla:línea, id) junto con un blake2b de `datos`. Si
+# la fila no cambió se reutiliza el HTML tal cual; si cambió, se renderiza y
+# reemplaza la entrada anterior. Así volver a pintar una tabla de miles de
+# filas donde cambiaron pocas es casi solo concatenar cadenas. Las entradas
+# viven por worker, con LRU por número de entradas y por bytes.
+#
+# El bloque no puede depender de nada más que de `datos` (ni de la sesión ni
+# del usuario): lo que se guarda se sirve a cualquiera que pida esa fila.
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from jinja2 import FileSystemBytecodeCache, nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+
+import config
+from services.cache import registro
+
+
+class CacheFragmentos:
+    def __init__(self, nombre, max_entradas, max_bytes):
+        self.nombre = nombre
+        self.max_entradas = max_entradas
+        self.max_bytes = max_bytes
+        self._datos = OrderedDict()   # (bloque, id) -> (version, Markup)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.descartes = 0
+        registro[nombre] = self
+
+    def obtener(self, clave, version):
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None or entrada[0] != version:
+                self.misses += 1
+                return None
+            self._datos.move_to_end(clave)
+            self.hits += 1
+            return entrada[1]
+
+    def guardar(self, clave, version, html):
+        with self._lock:
+            anterior = self._datos.pop(clave, None)
+            if anterior is not None:
+                self._bytes -= len(anterior[1])
+            self._datos[clave] = (version, html)
+            self._bytes += len(html)
+            while self._datos and (len(self._datos) > self.max_entradas or self._bytes > self.max_bytes):
+                _, (_, viejo) = self._datos.popitem(last=False)
+                self._bytes -= len(viejo)
+                self.descartes += 1
+
+    def invalidar(self, clave=None):
+        """Misma interfaz que CacheTTL: `clave` es el id de la entidad (en todos los bloques); sin clave, todo."""
+        with self._lock:
+            if clave is None:
+                borradas = len(self._datos)
+                self._datos.clear()
+                self._bytes = 0
+                return borradas
+            id_entidad = str(clave)
+            claves = [c for c in self._datos if c[1] == id_entidad]
+            for c in claves:
+                self._bytes -= len(self._datos.pop(c)[1])
+            return len(claves)
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                "entradas": len(self._datos),
+                "max_entradas": self.max_entradas,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "descartes": self.descartes,
+            }
+
+
+fragmentos = CacheFragmentos("fragmentos_html", config.FRAGMENTOS_MAX_ENTRADAS, config.FRAGMENTOS_MAX_BYTES)
+
+
+def version(datos):
+    """blake2b de `datos` (dict de una fila del backend) serializado en JSON canónico.
+
+    Una colisión serviría el HTML de otra versión de la fila, por eso no se usa
+    hash(): 128 bits, y acepta valores anidados (listas, dicts).
+    """
+    texto = json.dumps(datos, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.blake2b(texto.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+
+
+class FragmentoCache(Extension):
+    """{% cache id_entidad, datos %} ... {% endcache %}"""
+
+    tags = {"cache"}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        bloque = nodes.Const(f"{parser.name}:{lineno}")
+        id_entidad = parser.parse_expression()
+        datos = nodes.Const(None)
+        if parser.stream.skip_if("comma"):
+            datos = parser.parse_expression()
+        cuerpo = parser.parse_statements(("name:endcache",), drop_needle=True)
+        llamada = self.call_method("_fragmento", [bloque, id_entidad, datos])
+        return nodes.CallBlock(llamada, [], [], cuerpo).set_lineno(lineno)
+
+    def _fragmento(self, bloque, id_entidad, datos, caller):
+        if not config.FRAGMENTOS_HABILITADO or id_entidad is None:
+            return caller()
+        clave = (bloque, str(id_entidad))
+        firma = version(datos)
+        html = fragmentos.obtener(clave, firma)
+        if html is None:
+            html = Markup(caller())
+            fragmentos.guardar(clave, firma, html)
+        return html
+
+
+def init_app(app):
+    """Antes de cargar cualquier plantilla (create_app)."""
+    if config.PLANTILLAS_BYTECODE_DIR:
+        os.makedirs(config.PLANTILLAS_BYTECODE_DIR, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(config.PLANTILLAS_BYTECODE_DIR)
+    app.jinja_env.add_extension(FragmentoCache)
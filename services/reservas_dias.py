@@ -0,0 +1,247 @@
+# Caché de reservas por día para las consultas por rango de fechas.
+#
+# Una consulta fecha_inicio..fecha_fin se arma con los días ya guardados y solo
+# se pide al backend el sub-rango contiguo que cubre los días que faltan. Los
+# días pasados viven RESERVAS_TTL_PASADO; hoy y días futuros viven
+# RESERVAS_TTL_HOY y además se invalidan al facturar una reserva; una reserva
+# creada se agrega directamente a su día (agregar).
+#
+# Las consultas sin ambas fechas, de más de RESERVAS_MAX_RANGO días, o cuyas
+# filas no caen dentro del rango pedido (fechas con zona horaria, por ejemplo),
+# van directo al backend sin cachear.
+#
+# Cada token (alcance) guarda a lo sumo RESERVAS_MAX_DIAS_ALCANCE días, así la
+# consulta de un año de un usuario no saca de la caché los días de los demás;
+# RESERVAS_MAX_ENTRADAS acota el total descartando el token usado hace más tiempo.
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, timedelta
+
+import config
+from services import backend
+from services.cache import registro
+
+
+class CacheDias:
+    def __init__(self, nombre, max_por_alcance, max_entradas):
+        self.nombre = nombre
+        self.max_por_alcance = max_por_alcance
+        self.max_entradas = max_entradas
+        self._alcances = OrderedDict()   # alcance -> OrderedDict(date -> (filas, expira))
+        self._entradas = 0
+        self._lock = threading.Lock()
+        self.dias_servidos = 0
+        self.dias_pedidos = 0
+        self.consultas_directas = 0
+        self.descartes = 0
+        registro[nombre] = self
+
+    def _ttl(self, dia):
+        return config.RESERVAS_TTL_PASADO if dia < date.today() else config.RESERVAS_TTL_HOY
+
+    def _vigentes(self, alcance, dias):
+        ahora = time.monotonic()
+        encontrados = {}
+        with self._lock:
+            guardados = self._alcances.get(alcance)
+            if guardados is None:
+                return encontrados
+            self._alcances.move_to_end(alcance)
+            for dia in dias:
+                entrada = guardados.get(dia)
+                if entrada is not None and ahora < entrada[1]:
+                    guardados.move_to_end(dia)
+                    encontrados[dia] = entrada[0]
+        return encontrados
+
+    def _guardar(self, alcance, por_dia):
+        ahora = time.monotonic()
+        with self._lock:
+            guardados = self._alcances.get(alcance)
+            if guardados is None:
+                guardados = self._alcances[alcance] = OrderedDict()
+            self._alcances.move_to_end(alcance)
+            for dia, filas in por_dia.items():
+                if dia not in guardados:
+                    self._entradas += 1
+                guardados[dia] = (filas, ahora + self._ttl(dia))
+                guardados.move_to_end(dia)
+            # Primero se descartan días del mismo token, luego los del token más viejo
+            while len(guardados) > self.max_por_alcance:
+                guardados.popitem(last=False)
+                self._entradas -= 1
+                self.descartes += 1
+            while self._entradas > self.max_entradas:
+                viejo, dias = next(iter(self._alcances.items()))
+                dias.popitem(last=False)
+                self._entradas -= 1
+                self.descartes += 1
+                if not dias:
+                    del self._alcances[viejo]
+
+    def _borrar(self, alcance, dia):
+        """Con el lock tomado."""
+        guardados = self._alcances[alcance]
+        del guardados[dia]
+        self._entradas -= 1
+        if not guardados:
+            del self._alcances[alcance]
+
+    def rango(self, alcance, desde, hasta, cargar):
+        """Filas de desde..hasta (inclusive), más recientes primero.
+
+        `cargar(desde, hasta)` devuelve la respuesta del backend para ese rango.
+        Retorna (filas, obsoleto).
+        """
+        dias = [desde + timedelta(days=i) for i in range((hasta - desde).days + 1)]
+        guardados = self._vigentes(alcance, dias)
+        faltantes = [d for d in dias if d not in guardados]
+        self.dias_servidos += len(dias) - len(faltantes)
+
+        if faltantes:
+            inicio, fin = faltantes[0], faltantes[-1]
+            response = cargar(inicio, fin)
+            response.raise_for_status()
+            filas = response.json()
+            if backend.es_obsoleta(response):
+                # Respaldo del circuit breaker: se muestra pero no se guarda por días
+                return filas, True
+
+            por_dia = {inicio + timedelta(days=i): [] for i in range((fin - inicio).days + 1)}
+            for fila in filas:
+                dia = _dia(fila)
+                if dia not in por_dia:
+                    # No se puede repartir por días con seguridad: devolver tal cual
+                    self.consultas_directas += 1
+                    return (filas if (inicio, fin) == (desde, hasta) else None), False
+                por_dia[dia].append(fila)
+
+            self.dias_pedidos += len(por_dia)
+            self._guardar(alcance, por_dia)
+            guardados.update(por_dia)
+
+        filas = []
+        for dia in reversed(dias):
+            filas.extend(guardados[dia])
+        return filas, False
+
+    def invalidar(self, clave=None):
+        """Misma interfaz que CacheTTL: `clave` es un día "YYYY-MM-DD"; sin clave, todo."""
+        if clave is None:
+            with self._lock:
+                borradas = self._entradas
+                self._alcances.clear()
+                self._entradas = 0
+            return borradas
+        dia = _fecha(clave)
+        return self.invalidar_dia(dia) if dia else 0
+
+    def invalidar_dia(self, dia):
+        with self._lock:
+            alcances = [a for a, dias in self._alcances.items() if dia in dias]
+            for alcance in alcances:
+                self._borrar(alcance, dia)
+        return len(alcances)
+
+    def agregar(self, fila):
+        """Pone una reserva recién creada al inicio de su día en cada alcance que lo tenga.
+
+        Devuelve False si la fila no trae una fecha reconocible.
+        """
+        dia = _dia(fila)
+        if dia is None:
+            return False
+        idreserva = str(fila.get("id", fila.get("idreserva")))
+        with self._lock:
+            for dias in self._alcances.values():
+                if dia in dias:
+                    filas, expira = dias[dia]
+                    otras = [f for f in filas if str(f.get("id", f.get("idreserva"))) != idreserva]
+                    dias[dia] = ([fila] + otras, expira)
+        return True
+
+    def invalidar_reserva(self, idreserva):
+        """Borra los días que contienen la reserva (por ejemplo tras facturarla)."""
+        idreserva = str(idreserva)
+        with self._lock:
+            claves = [(alcance, dia) for alcance, dias in self._alcances.items()
+                      for dia, (filas, _) in dias.items()
+                      if any(str(f.get("id", f.get("idreserva"))) == idreserva for f in filas)]
+            for alcance, dia in claves:
+                self._borrar(alcance, dia)
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                "entradas": self._entradas,
+                "max_entradas": self.max_entradas,
+                "alcances": len(self._alcances),
+                "max_por_alcance": self.max_por_alcance,
+                "descartes": self.descartes,
+                "dias_servidos": self.dias_servidos,
+                "dias_pedidos": self.dias_pedidos,
+                "consultas_directas": self.consultas_directas,
+            }
+
+
+def _dia(fila):
+    try:
+        return date.fromisoformat(str(fila.get("fecha"))[:10])
+    except ValueError:
+        return None
+
+
+def _fecha(texto):
+    try:
+        return date.fromisoformat(texto) if texto else None
+    except ValueError:
+        return None
+
+
+cache = CacheDias("reservas_dias", config.RESERVAS_MAX_DIAS_ALCANCE, config.RESERVAS_MAX_ENTRADAS)
+
+
+def consultar(fecha_inicio=None, fecha_fin=None):
+    """Reservas filtradas como GET /reservas?fecha_inicio=&fecha_fin=. Retorna (filas, obsoleto)."""
+    params = {}
+    if fecha_inicio:
+        params["fecha_inicio"] = fecha_inicio
+    if fecha_fin:
+        params["fecha_fin"] = fecha_fin
+
+    def directo():
+        response = backend.get("/reservas", params=params, respaldo=True)
+        return response.json(), backend.es_obsoleta(response)
+
+    desde, hasta = _fecha(fecha_inicio), _fecha(fecha_fin)
+    maximo = min(config.RESERVAS_MAX_RANGO, cache.max_por_alcance)
+    if not desde or not hasta or hasta < desde or (hasta - desde).days >= maximo:
+        cache.consultas_directas += 1
+        return directo()
+
+    def cargar(inicio, fin):
+        return backend.get("/reservas", respaldo=True, params={
+            "fecha_inicio": inicio.isoformat(),
+            "fecha_fin": fin.isoformat(),
+        })
+
+    filas, obsoleto = cache.rango(backend.alcance(backend.token_actual()), desde, hasta, cargar)
+    if filas is None:
+        return directo()
+    return filas, obsoleto
+
+
+def invalidar_hoy():
+    cache.invalidar_dia(date.today())
+
+
+def agregar(fila):
+    """Escritura directa de una reserva creada; sin fecha en la fila se invalida hoy."""
+    if not cache.agregar(fila):
+        invalidar_hoy()
+
+
+def invalidar_reserva(idreserva):
+    cache.invalidar_reserva(idreserva)
+    cache.invalidar_dia(date.today())
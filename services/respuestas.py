@@ -0,0 +1,77 @@
+# Respuestas JSON de los proxies con ETag, 304 y gzip.
+#
+# json_condicional(datos) serializa igual que jsonify (claves ordenadas, así el
+# mismo contenido da siempre los mismos bytes), calcula un ETag fuerte sobre el
+# cuerpo y responde 304 si el navegador ya lo tiene (If-None-Match). Con
+# ?fields=a,b solo se mandan esas claves de cada elemento. Por encima de
+# COMPRESION_MINIMO bytes, y si el cliente acepta gzip, se comprime; el cuerpo
+# comprimido se guarda por ETag para no recomprimir el mismo catálogo.
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+
+from flask import current_app, request
+
+import config
+
+_comprimidos = OrderedDict()     # etag -> bytes gzip
+_lock = threading.Lock()
+
+
+def proyectar(datos, campos):
+    """Deja solo `campos` en cada dict de una lista (o en el dict)."""
+    if not campos:
+        return datos
+    if isinstance(datos, list):
+        return [{k: d[k] for k in campos if k in d} if isinstance(d, dict) else d for d in datos]
+    if isinstance(datos, dict):
+        return {k: datos[k] for k in campos if k in datos}
+    return datos
+
+
+def campos_pedidos():
+    """Campos de ?fields=a,b,c en orden, sin vacíos ni repetidos."""
+    crudo = request.args.get("fields", "")
+    return list(dict.fromkeys(c.strip() for c in crudo.split(",") if c.strip()))
+
+
+def json_condicional(datos, status=200):
+    datos = proyectar(datos, campos_pedidos())
+    cuerpo = current_app.json.dumps(datos).encode("utf-8")
+    resumen = hashlib.sha256(cuerpo).hexdigest()[:32]
+
+    gzip_ok = len(cuerpo) >= config.COMPRESION_MINIMO and request.accept_encodings.quality("gzip") > 0
+    # Cada representación (plana o gzip) lleva su propio ETag fuerte
+    etag = f"{resumen}-gz" if gzip_ok else resumen
+
+    if status == 200 and request.if_none_match.contains_weak(etag):
+        respuesta = current_app.response_class(status=304)
+    else:
+        if gzip_ok:
+            cuerpo = _gzip(etag, cuerpo)
+        respuesta = current_app.response_class(cuerpo, status=status, mimetype="application/json")
+        if gzip_ok:
+            respuesta.headers["Content-Encoding"] = "gzip"
+
+    respuesta.set_etag(etag)
+    # Datos por usuario: el navegador puede guardarlos pero debe revalidar siempre
+    respuesta.headers["Cache-Control"] = "private, no-cache"
+    respuesta.vary.add("Accept-Encoding")
+    respuesta.vary.add("Cookie")
+    return respuesta
+
+
+def _gzip(etag, cuerpo):
+    with _lock:
+        comprimido = _comprimidos.get(etag)
+        if comprimido is not None:
+            _comprimidos.move_to_end(etag)
+            return comprimido
+
+    comprimido = gzip.compress(cuerpo, compresslevel=config.COMPRESION_NIVEL)
+    with _lock:
+        _comprimidos[etag] = comprimido
+        while len(_comprimidos) > config.COMPRESION_MAX_ENTRADAS:
+            _comprimidos.popitem(last=False)
+    return comprimido
@@ -0,0 +1,62 @@
+# Single-flight: peticiones idénticas y simultáneas comparten una sola llamada.
+#
+# El primer hilo que pide una clave ejecuta la función; los que lleguen con la
+# misma clave mientras tanto esperan y reciben el mismo resultado (o la misma
+# excepción). Al terminar, la clave se libera y la siguiente petición vuelve a
+# llamar al backend: esto no es una caché.
+import threading
+
+
+class _Llamada:
+    __slots__ = ("evento", "resultado", "error", "esperando")
+
+    def __init__(self):
+        self.evento = threading.Event()
+        self.resultado = None
+        self.error = None
+        self.esperando = 0
+
+
+class Grupo:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._en_vuelo = {}
+        self.ejecutadas = 0
+        self.colapsadas = 0
+
+    def hacer(self, clave, funcion):
+        with self._lock:
+            llamada = self._en_vuelo.get(clave)
+            if llamada is not None:
+                llamada.esperando += 1
+                self.colapsadas += 1
+                lider = False
+            else:
+                llamada = self._en_vuelo[clave] = _Llamada()
+                self.ejecutadas += 1
+                lider = True
+
+        if not lider:
+            llamada.evento.wait()
+            if llamada.error is not None:
+                raise llamada.error
+            return llamada.resultado
+
+        try:
+            llamada.resultado = funcion()
+        except BaseException as e:
+            llamada.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._en_vuelo[clave]
+            llamada.evento.set()
+        return llamada.resultado
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                "ejecutadas": self.ejecutadas,
+                "colapsadas": self.colapsadas,
+                "en_vuelo": len(self._en_vuelo),
+            }
@@ -0,0 +1,86 @@
+// Escrituras sin recargar el listado.
+//
+// Un formulario con data-fragmento se envía con fetch pidiendo JSON; el
+// servidor responde solo la fila nueva o modificada (services/fragmentos.py):
+//   data-fragmento="reemplazar"  la fila reemplaza a la que tiene el mismo id
+//   data-fragmento="agregar"     la fila va al inicio de data-destino (o
+//                                reemplaza la existente) y el formulario se limpia
+// Si fetch falla por red, el formulario se envía de la forma normal.
+
+function mostrarMensaje(texto, categoria) {
+  if (!texto) return;
+  let contenedor = document.querySelector(".flash-messages");
+  if (!contenedor) {
+    contenedor = document.createElement("div");
+    contenedor.className = "flash-messages";
+    document.body.prepend(contenedor);
+  }
+  const p = document.createElement("p");
+  p.className = categoria || "info";
+  p.textContent = texto;
+  contenedor.appendChild(p);
+  setTimeout(() => p.remove(), 6000);
+}
+
+function pegarFila(form, html) {
+  const plantilla = document.createElement("template");
+  plantilla.innerHTML = html.trim();
+  const fila = plantilla.content.firstElementChild;
+  const actual = fila.id && document.getElementById(fila.id);
+  if (actual) {
+    actual.replaceWith(fila);
+  } else {
+    const destino = document.querySelector(form.dataset.destino);
+    if (!destino) return;
+    destino.querySelector(".fila-vacia")?.remove();
+    destino.prepend(fila);
+  }
+  fila.classList.add("fila-nueva");
+}
+
+document.addEventListener("submit", async (evento) => {
+  const form = evento.target.closest("form[data-fragmento]");
+  if (!form) return;
+  evento.preventDefault();
+
+  const boton = form.querySelector("[type=submit]");
+  if (boton) boton.disabled = true;
+  let respuesta;
+  try {
+    respuesta = await fetch(form.action, {
+      method: (form.getAttribute("method") || "POST").toUpperCase(),
+      body: new FormData(form),
+      headers: { "Accept": "application/json", "X-Fragmento": "json" },
+    });
+  } catch (err) {
+    console.error("❌ Error enviando formulario, se envía sin fragmentos:", err);
+    delete form.dataset.fragmento;
+    form.submit();
+    return;
+  } finally {
+    if (boton) boton.disabled = false;
+  }
+
+  if (!(respuesta.headers.get("Content-Type") || "").includes("application/json")) {
+    // Sesión vencida u otra redirección: seguir a la página que mandó el servidor
+    window.location = respuesta.url;
+    return;
+  }
+  const datos = await respuesta.json().catch(() => ({}));
+  if (!respuesta.ok) {
+    mostrarMensaje(datos.error || `❌ Error ${respuesta.status}`, datos.categoria || "danger");
+    return;
+  }
+  if (datos.recargar) {
+    // La escritura salió bien pero el servidor no pudo armar la fila
+    window.location = datos.recargar;
+    return;
+  }
+  pegarFila(form, datos.html);
+  mostrarMensaje(datos.mensaje, datos.categoria);
+  if (form.dataset.fragmento === "agregar") {
+    form.reset();
+    // Que los selects vuelvan a ajustar lo que dependa de ellos (tipo de cliente, precio...)
+    form.querySelectorAll("select").forEach((s) => s.dispatchEvent(new Event("change")));
+  }
+});
@@ -0,0 +1,57 @@
+# Fixtures compartidas por las pruebas de services/.
+#
+# Ninguna prueba llama al backend: cada una reemplaza backend.get/post/patch
+# (o la función del módulo que los usa) con monkeypatch.
+import os
+import sys
+
+import pytest
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config  # noqa: E402
+
+
+class Respuesta:
+    """Lo mínimo de requests.Response que usan los servicios."""
+
+    def __init__(self, status_code=200, datos=None, obsoleto=False):
+        self.status_code = status_code
+        self._datos = datos
+        if obsoleto:
+            self.obsoleto = True
+
+    def json(self):
+        if self._datos is None:
+            raise ValueError("sin cuerpo JSON")
+        return self._datos
+
+    @property
+    def text(self):
+        return repr(self._datos)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"HTTP {self.status_code}", response=self)
+
+
+@pytest.fixture
+def respuesta():
+    return Respuesta
+
+
+@pytest.fixture
+def app():
+    from app import app as aplicacion
+    return aplicacion
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """COLA_FACTURAS_DB en un archivo temporal (cola y lotes de facturas)."""
+    from services import lote_facturas
+
+    monkeypatch.setattr(config, "COLA_FACTURAS_DB", str(tmp_path / "cola_facturas.db"))
+    monkeypatch.setitem(lote_facturas._inicializado, "listo", False)
+    return tmp_path / "cola_facturas.db"
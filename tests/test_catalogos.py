@@ -0,0 +1,54 @@
+import pytest
+
+from services import backend, catalogos
+
+
+@pytest.fixture(autouse=True)
+def limpio():
+    catalogos.invalidar()
+
+
+class Backend:
+    """backend.get que responde según el token; recuerda (ruta, token, headers)."""
+
+    def __init__(self, monkeypatch, respuesta, etag=None):
+        self.respuesta = respuesta
+        self.etag = etag
+        self.llamadas = []
+        monkeypatch.setattr(backend, "get", self.get)
+
+    def get(self, ruta, token=None, headers=None, **kwargs):
+        self.llamadas.append((ruta, token, headers))
+        if self.etag and (headers or {}).get("If-None-Match") == self.etag:
+            r = self.respuesta(304)
+        else:
+            r = self.respuesta(200, [{"idproducto": 1, "nombre": f"de {token}"}])
+        r.headers = {"ETag": self.etag} if self.etag else {}
+        return r
+
+
+def test_cada_token_tiene_su_catalogo(monkeypatch, respuesta):
+    servidor = Backend(monkeypatch, respuesta)
+
+    assert catalogos.obtener("productos", token="a")[0]["nombre"] == "de a"
+    assert catalogos.obtener("productos", token="b")[0]["nombre"] == "de b"
+    assert catalogos.obtener("productos", token=None)[0]["nombre"] == "de None"
+    catalogos.obtener("productos", token="a")
+
+    assert [token for _, token, _ in servidor.llamadas] == ["a", "b", None]
+
+
+def test_invalidar_borra_el_catalogo_en_todos_los_tokens(monkeypatch, respuesta):
+    servidor = Backend(monkeypatch, respuesta, etag='"v1"')
+    catalogos.obtener("productos", token="a")
+    catalogos.obtener("productos", token="b")
+    catalogos.obtener("medios", token="a")
+
+    assert catalogos.cache.invalidar("productos") == 2
+    assert catalogos.invalidar("productos") == 0
+    servidor.llamadas.clear()
+    catalogos.obtener("productos", token="a")
+
+    # Sin validadores: se descarga de nuevo en vez de revalidar
+    assert servidor.llamadas == [("/productos", "a", None)]
+    assert catalogos.cache.estadisticas()["entradas"] == 2
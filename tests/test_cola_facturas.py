@@ -0,0 +1,236 @@
+import os
+import runpy
+import stat
+import time
+from http.client import RemoteDisconnected
+from types import SimpleNamespace
+
+import pytest
+import requests
+from urllib3.exceptions import MaxRetryError, NewConnectionError, ProtocolError
+
+import config
+from services import calentamiento, cola_facturas
+from services.admision import Sobrecarga
+from services.circuito import CircuitoAbierto
+from services.facturacion import sin_enviar
+
+TOKEN = "token-de-prueba"
+NO_CONECTO = requests.ConnectionError(MaxRetryError(None, "/facturas", NewConnectionError(None, "rechazada")))
+CORTADA = requests.ConnectionError(ProtocolError("Connection aborted.", RemoteDisconnected("cerrada")))
+
+
+@pytest.fixture(autouse=True)
+def cola(db, monkeypatch):
+    # Sin hilos: cada prueba reclama y procesa a mano
+    monkeypatch.setattr(cola_facturas, "iniciar_workers", cola_facturas.inicializar)
+    monkeypatch.setattr(config, "COLA_FACTURAS_REINTENTOS", 2)
+
+
+class Backend:
+    """Dobles de enviar_factura y marcar_reserva con resultados programados."""
+
+    def __init__(self, monkeypatch, envios=(), marcas=()):
+        self.envios = list(envios)
+        self.marcas = list(marcas)
+        self.posts = 0
+        self.patches = 0
+        monkeypatch.setattr(cola_facturas, "enviar_factura", self.enviar_factura)
+        monkeypatch.setattr(cola_facturas, "marcar_reserva", self.marcar_reserva)
+
+    def enviar_factura(self, data, token=None):
+        self.posts += 1
+        resultado = self.envios.pop(0)
+        if isinstance(resultado, Exception):
+            raise resultado
+        if resultado.status_code in (200, 201):
+            return resultado, [("success", "✅ Factura creada correctamente")]
+        return resultado, [("danger", f"❌ Error al crear factura: {resultado.text}")]
+
+    def marcar_reserva(self, idreserva, token=None):
+        self.patches += 1
+        resultado = self.marcas.pop(0)
+        if isinstance(resultado, Exception):
+            raise resultado
+        return resultado
+
+
+def correr(id_trabajo):
+    fila = cola_facturas._reclamar()
+    assert fila is not None and fila["id"] == id_trabajo
+    cola_facturas.procesar(fila)
+    return cola_facturas.consultar(id_trabajo, token=TOKEN)
+
+
+def token_guardado(id_trabajo):
+    conexion = cola_facturas.conectar()
+    try:
+        return conexion.execute("SELECT token FROM trabajos WHERE id = ?", (id_trabajo,)).fetchone()["token"]
+    finally:
+        conexion.close()
+
+
+def vencer(id_trabajo):
+    """Deja el reintento programado listo para reclamarse ya."""
+    conexion = cola_facturas.conectar()
+    try:
+        conexion.execute("UPDATE trabajos SET proximo_intento = 0 WHERE id = ?", (id_trabajo,))
+    finally:
+        conexion.close()
+
+
+def test_sin_enviar():
+    assert sin_enviar(NO_CONECTO)
+    assert sin_enviar(requests.ConnectTimeout())
+    assert sin_enviar(Sobrecarga("/facturas", 1.0))
+    assert sin_enviar(CircuitoAbierto("/facturas", 10))
+    assert not sin_enviar(CORTADA)
+    assert not sin_enviar(requests.ReadTimeout())
+    assert not sin_enviar(ValueError())
+
+
+def test_factura_creada_y_reserva_marcada(monkeypatch, respuesta):
+    backend = Backend(monkeypatch, envios=[respuesta(201, {"idfactura": 7})], marcas=[True])
+    id_trabajo = cola_facturas.encolar({"idcliente": 1}, idreserva="9", token=TOKEN)
+
+    trabajo = correr(id_trabajo)
+
+    assert trabajo["estado"] == cola_facturas.COMPLETADO
+    assert trabajo["factura"] == {"idfactura": 7}
+    assert (backend.posts, backend.patches) == (1, 1)
+
+
+def test_no_conecto_se_reintenta_y_luego_falla(monkeypatch, respuesta):
+    backend = Backend(monkeypatch, envios=[NO_CONECTO, NO_CONECTO, NO_CONECTO])
+    id_trabajo = cola_facturas.encolar({"idcliente": 1}, token=TOKEN)
+
+    assert correr(id_trabajo)["estado"] == cola_facturas.PENDIENTE
+    vencer(id_trabajo)
+    assert correr(id_trabajo)["estado"] == cola_facturas.PENDIENTE
+    vencer(id_trabajo)
+    assert correr(id_trabajo)["estado"] == cola_facturas.ERROR
+    assert backend.posts == 3
+
+
+@pytest.mark.parametrize("error", [CORTADA, requests.ReadTimeout("lectura")])
+def test_post_que_pudo_llegar_queda_incierta(monkeypatch, error):
+    backend = Backend(monkeypatch, envios=[error])
+    id_trabajo = cola_facturas.encolar({"idcliente": 1}, token=TOKEN)
+
+    assert correr(id_trabajo)["estado"] == cola_facturas.INCIERTA
+    assert cola_facturas._reclamar() is None
+    assert backend.posts == 1
+
+
+@pytest.mark.parametrize("status, estado", [
+    (502, cola_facturas.INCIERTA),
+    (504, cola_facturas.INCIERTA),
+    (503, cola_facturas.PENDIENTE),
+    (422, cola_facturas.ERROR),
+])
+def test_codigos_http(monkeypatch, respuesta, status, estado):
+    Backend(monkeypatch, envios=[respuesta(status, {"error": "x"})])
+    id_trabajo = cola_facturas.encolar({"idcliente": 1}, token=TOKEN)
+
+    assert correr(id_trabajo)["estado"] == estado
+
+
+def test_patch_fallido_no_reenvia_el_post(monkeypatch, respuesta):
+    backend = Backend(monkeypatch, envios=[respuesta(201, {"idfactura": 7})],
+                      marcas=[requests.ConnectionError("caída"), True])
+    id_trabajo = cola_facturas.encolar({"idcliente": 1}, idreserva="9", token=TOKEN)
+
+    assert correr(id_trabajo)["estado"] == cola_facturas.PENDIENTE
+    vencer(id_trabajo)
+    trabajo = correr(id_trabajo)
+
+    assert trabajo["estado"] == cola_facturas.COMPLETADO
+    assert (backend.posts, backend.patches) == (1, 2)
+
+
+def test_worker_caido_sin_factura_queda_incierta(monkeypatch):
+    Backend(monkeypatch)
+    id_trabajo = cola_facturas.encolar({"idcliente": 1}, token=TOKEN)
+    cola_facturas._reclamar()
+    conexion = cola_facturas.conectar()
+    try:
+        conexion.execute("UPDATE trabajos SET actualizado = ? WHERE id = ?",
+                         (time.time() - config.COLA_FACTURAS_BLOQUEO - 1, id_trabajo))
+    finally:
+        conexion.close()
+
+    assert cola_facturas._reclamar() is None
+    trabajo = cola_facturas.consultar(id_trabajo, token=TOKEN)
+    assert trabajo["estado"] == cola_facturas.INCIERTA
+
+
+def test_worker_caido_con_factura_solo_reintenta_el_patch(monkeypatch):
+    backend = Backend(monkeypatch, marcas=[True])
+    id_trabajo = cola_facturas.encolar({"idcliente": 1}, idreserva="9", token=TOKEN)
+    cola_facturas._reclamar()
+    cola_facturas._guardar_factura(id_trabajo, {"idfactura": 7})
+    conexion = cola_facturas.conectar()
+    try:
+        conexion.execute("UPDATE trabajos SET actualizado = ? WHERE id = ?",
+                         (time.time() - config.COLA_FACTURAS_BLOQUEO - 1, id_trabajo))
+    finally:
+        conexion.close()
+
+    trabajo = correr(id_trabajo)
+
+    assert trabajo["estado"] == cola_facturas.COMPLETADO
+    assert (backend.posts, backend.patches) == (0, 1)
+
+
+def test_trabajo_de_otro_usuario():
+    id_trabajo = cola_facturas.encolar({"idcliente": 1}, token=TOKEN)
+
+    assert cola_facturas.consultar(id_trabajo, token="otro") is None
+    assert cola_facturas.consultar(id_trabajo, token=TOKEN)["estado"] == cola_facturas.PENDIENTE
+
+
+@pytest.mark.parametrize("envio, estado", [
+    ((201, {"idfactura": 7}), cola_facturas.COMPLETADO),
+    (CORTADA, cola_facturas.INCIERTA),
+    ((422, {"error": "x"}), cola_facturas.ERROR),
+    ((503, {"error": "x"}), cola_facturas.PENDIENTE),
+])
+def test_el_token_solo_queda_mientras_hay_llamadas_pendientes(monkeypatch, respuesta, envio, estado):
+    Backend(monkeypatch, envios=[respuesta(*envio) if isinstance(envio, tuple) else envio])
+    id_trabajo = cola_facturas.encolar({"idcliente": 1}, token=TOKEN)
+
+    assert correr(id_trabajo)["estado"] == estado
+    assert token_guardado(id_trabajo) == (TOKEN if estado == cola_facturas.PENDIENTE else None)
+
+
+def test_base_solo_legible_por_el_proceso(db):
+    cola_facturas.encolar({"idcliente": 1}, token=TOKEN)
+
+    for sufijo in ("", "-wal", "-shm"):
+        ruta = f"{db}{sufijo}"
+        if os.path.exists(ruta):
+            assert stat.S_IMODE(os.stat(ruta).st_mode) == 0o600, ruta
+
+
+def test_inicializar_borra_tokens_de_trabajos_terminados():
+    id_trabajo = cola_facturas.encolar({"idcliente": 1}, token=TOKEN)
+    conexion = cola_facturas.conectar()
+    try:
+        conexion.execute("UPDATE trabajos SET estado = ? WHERE id = ?", (cola_facturas.ERROR, id_trabajo))
+    finally:
+        conexion.close()
+
+    cola_facturas.inicializar()
+
+    assert token_guardado(id_trabajo) is None
+
+
+def test_gunicorn_arranca_la_cola_con_cada_worker(monkeypatch):
+    arrancada = []
+    monkeypatch.setattr(calentamiento, "calentar", lambda app, latido=None: None)
+    monkeypatch.setattr(cola_facturas, "iniciar_workers", lambda: arrancada.append(True))
+    conf = runpy.run_path(os.path.join(os.path.dirname(os.path.dirname(__file__)), "gunicorn.conf.py"))
+
+    conf["post_worker_init"](SimpleNamespace(wsgi=None, notify=lambda: None))
+
+    assert arrancada == [True]
@@ -0,0 +1,28 @@
+from services import exportacion
+
+FILAS = [{"idfactura": 1, "total": "150000.50", "estado": "EMITIDA"}]
+COLUMNAS = [("idfactura", "ID"), ("total", "Total"), ("estado", "Estado")]
+
+
+def exportar(app, monkeypatch, formato):
+    monkeypatch.setattr(exportacion, "filas", lambda ruta, params=None, **kwargs: iter(FILAS))
+    with app.test_request_context(f"/facturas/exportar?formato={formato}"):
+        respuesta = exportacion.responder("/facturas", COLUMNAS, "facturas")
+        respuesta.direct_passthrough = False
+        return respuesta, respuesta.get_data()
+
+
+def test_csv_un_solo_charset(app, monkeypatch):
+    respuesta, cuerpo = exportar(app, monkeypatch, "csv")
+
+    assert respuesta.headers["Content-Type"] == "text/csv; charset=utf-8"
+    assert "150000.50" in cuerpo.decode("utf-8-sig")
+
+
+def test_xlsx_content_type(app, monkeypatch):
+    respuesta, cuerpo = exportar(app, monkeypatch, "xlsx")
+
+    assert respuesta.headers["Content-Type"] == (
+        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    )
+    assert cuerpo[:2] == b"PK"
@@ -0,0 +1,55 @@
+from datetime import date
+from decimal import Decimal
+
+from werkzeug.datastructures import ImmutableMultiDict
+
+from routes.facturas_routes import FORMULARIO_FACTURA
+from services import formularios
+
+
+def formulario(**extra):
+    campos = {
+        "idcliente": "1", "observaciones": "x",
+        "detalles[1][idproducto]": "2", "detalles[1][cantidad]": "3", "detalles[1][valorunitario]": "10.50",
+        "detalles[0][idproducto]": "4", "detalles[0][cantidad]": " 1 ", "detalles[0][valorunitario]": "0.10",
+        "pagos[0][idmedio]": "1", "pagos[0][valor]": "100", "pagos[0][due_date]": "2026-10-18",
+    }
+    campos.update(extra)
+    return ImmutableMultiDict(campos)
+
+
+def test_colecciones_por_indice_y_solo_dinero_en_decimal():
+    datos, errores = FORMULARIO_FACTURA.decodificar(formulario())
+
+    assert errores == []
+    assert [d["idproducto"] for d in datos["detalles"]] == [4, 2]
+    assert datos["detalles"][0]["cantidad"] == 1.0
+    assert datos["detalles"][0]["valorunitario"] == Decimal("0.10")
+    assert datos["detalles"][1]["descuento"] == 0.0
+    assert datos["pagos"][0]["due_date"] == date(2026, 10, 18)
+
+
+def test_errores_por_campo():
+    datos, errores = FORMULARIO_FACTURA.decodificar(formulario(**{
+        "detalles[1][cantidad]": "tres", "pagos[0][due_date]": "18/10/2026",
+    }))
+
+    assert {e["campo"] for e in errores} == {"detalles[1][cantidad]", "pagos[0][due_date]"}
+    assert datos["detalles"][1]["cantidad"] == 0.0
+
+
+def test_a_json_del_esquema():
+    datos, _ = FORMULARIO_FACTURA.decodificar(formulario())
+    datos["total"] = Decimal("1.5")
+
+    assert FORMULARIO_FACTURA.a_json(datos) is datos
+    assert datos["detalles"][1]["valorunitario"] == 10.5
+    assert datos["pagos"][0] == {"idmedio": 1, "valor": 100.0, "due_date": "2026-10-18", "siigo_pago_id": None}
+    assert datos["total"] == 1.5
+
+
+def test_a_json_generico():
+    valor = {"a": [Decimal("2.25"), {"b": date(2026, 1, 2)}], "c": "x"}
+
+    assert formularios.a_json(valor) == {"a": [2.25, {"b": "2026-01-02"}], "c": "x"}
+    assert formularios.a_json(Decimal("1")) == 1.0
@@ -0,0 +1,140 @@
+import threading
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+
+import pytest
+
+from services import backend, kpis
+
+HOY = date.today()
+
+
+@pytest.fixture(autouse=True)
+def limpio(monkeypatch):
+    for entidad in kpis.ACUMULADOS:
+        entidad.invalidar()
+    monkeypatch.setattr(kpis, "_sin_filtro", set())
+    monkeypatch.setattr(kpis, "_resumenes", kpis.OrderedDict())
+
+
+def factura(idfactura, total, dia=HOY, estado="EMITIDA"):
+    return {"idfactura": idfactura, "fecha": dia.isoformat(), "total": total, "estado": estado}
+
+
+class Backend:
+    """backend.get con filas por ruta; recuerda (ruta, token) de cada llamada."""
+
+    def __init__(self, monkeypatch, respuesta, filas=None):
+        self.respuesta = respuesta
+        self.filas = filas or {}
+        self.llamadas = []
+        monkeypatch.setattr(backend, "get", self.get)
+
+    def get(self, ruta, token=None, params=None, **kwargs):
+        self.llamadas.append((ruta, token))
+        return self.respuesta(200, self.filas.get(ruta, []))
+
+
+def test_la_misma_fila_no_se_cuenta_dos_veces():
+    kpis.facturas.registrar_lista([factura(1, 100), factura(2, 50)], token="a")
+    kpis.facturas.registrar_lista([factura(1, 120)], token="a")
+
+    assert kpis.facturas.totales(HOY, token="a") == {"EMITIDA": (2, Decimal(170))}
+
+
+def test_cambiar_estado():
+    kpis.facturas.registrar(factura(1, 100), token="a")
+
+    assert kpis.facturas.cambiar_estado(1, "ANULADA", token="a")
+    assert not kpis.facturas.cambiar_estado(99, "ANULADA", token="a")
+    assert kpis.facturas.totales(HOY, token="a") == {"ANULADA": (1, Decimal(100))}
+    assert kpis.resumen("a")["facturado_hoy"] == (0, Decimal(0))
+
+
+def test_filas_fuera_de_la_ventana_se_ignoran():
+    viejo = HOY - timedelta(days=400)
+    kpis.facturas.registrar_lista([factura(1, 100, dia=viejo)], token="a")
+
+    assert kpis.facturas.estadisticas()["filas"] == 0
+
+
+def test_cada_token_tiene_sus_cifras():
+    kpis.facturas.registrar_lista([factura(1, 100)], token="a")
+    kpis.facturas.registrar_lista([factura(2, 7)], token="b")
+
+    assert kpis.resumen("a")["facturado_hoy"] == (1, Decimal(100))
+    assert kpis.resumen("b")["facturado_hoy"] == (1, Decimal(7))
+    assert kpis.resumen("c")["facturado_hoy"] == (0, Decimal(0))
+
+
+def test_reemplazar_conserva_escrituras_posteriores():
+    acumulado = kpis.facturas.para("a")
+    acumulado.registrar_lista([factura(1, 100)])
+    pedido_en = time.time()
+    acumulado.registrar(factura(2, 30))
+
+    acumulado.reemplazar([factura(1, 90), factura(3, 10)], pedido_en)
+
+    assert acumulado.totales(HOY) == {"EMITIDA": (3, Decimal(130))}
+
+
+def test_reconciliar_usa_el_token_de_quien_pide(monkeypatch, respuesta):
+    servidor = Backend(monkeypatch, respuesta, {"/facturas": [factura(1, 100)]})
+    kpis.facturas.registrar_lista([factura(9, 5)], token="a")
+
+    kpis.reconciliar("a")
+
+    assert {token for _, token in servidor.llamadas} == {"a"}
+    assert kpis.facturas.totales(HOY, token="a") == {"EMITIDA": (1, Decimal(100))}
+    assert kpis.facturas.totales(HOY, token="b") == {}
+    assert kpis.resumen("a")["completo"]
+    assert not kpis.resumen("b")["completo"]
+
+
+def test_backend_sin_filtro_de_fechas_deja_de_reconciliarse(monkeypatch, respuesta):
+    viejo = HOY - timedelta(days=400)
+    servidor = Backend(monkeypatch, respuesta, {"/facturas": [factura(1, 100), factura(2, 80, dia=viejo)]})
+
+    kpis.reconciliar("a")
+    assert kpis._sin_filtro == {"/facturas"}
+    # Lo que cae en la ventana sí se usó
+    assert kpis.facturas.totales(HOY, token="a") == {"EMITIDA": (1, Decimal(100))}
+
+    servidor.llamadas.clear()
+    kpis.reconciliar("a")
+    assert "/facturas" not in [ruta for ruta, _ in servidor.llamadas]
+    assert kpis.resumen("a")["completo"]
+
+
+def test_respuesta_paginada_suma_sin_reemplazar(monkeypatch, respuesta):
+    Backend(monkeypatch, respuesta, {"/facturas": {"data": [factura(1, 100)], "total": 2}})
+    kpis.facturas.registrar_lista([factura(2, 50)], token="a")
+
+    kpis.reconciliar("a")
+
+    assert kpis.facturas.totales(HOY, token="a") == {"EMITIDA": (2, Decimal(150))}
+    assert not kpis.facturas.para("a").reconciliado
+
+
+def test_reconciliar_si_toca(monkeypatch):
+    corridas = []
+    monkeypatch.setattr(kpis, "reconciliar", corridas.append)
+    monkeypatch.setattr(kpis, "threading", SimpleNamespace(Thread=HiloInmediato, Lock=threading.Lock))
+
+    assert kpis.reconciliar_si_toca("a")
+    assert corridas == ["a"]
+
+    for entidad in kpis.ACUMULADOS:
+        entidad.para("a").reemplazar([], time.time())
+    assert not kpis.reconciliar_si_toca("a")
+    assert kpis.reconciliar_si_toca("b")
+
+
+class HiloInmediato:
+    def __init__(self, target, **kwargs):
+        self.target = target
+
+    def start(self):
+        self.target()
@@ -0,0 +1,206 @@
+import time
+from http.client import RemoteDisconnected
+from types import SimpleNamespace
+
+import pytest
+import requests
+from urllib3.exceptions import MaxRetryError, NewConnectionError, ProtocolError
+
+import config
+from services import lote_facturas
+from services.facturacion import payload_desde_reserva
+
+TOKEN = "token-de-prueba"
+NO_CONECTO = requests.ConnectionError(MaxRetryError(None, "/facturas", NewConnectionError(None, "rechazada")))
+CORTADA = requests.ConnectionError(ProtocolError("Connection aborted.", RemoteDisconnected("cerrada")))
+
+RESERVA = {
+    "id": 9, "estado": "RESERVADO", "idcliente": 3, "identificacion": "123",
+    "idproducto": 2, "idmedio": 1, "precio": "150000.50", "abono": "50000",
+}
+
+
+pytestmark = pytest.mark.usefixtures("db")
+
+
+class Backend:
+    """Dobles de enviar_factura y marcar_reserva con resultados programados."""
+
+    def __init__(self, monkeypatch, envios=(), marcas=()):
+        self.envios = list(envios)
+        self.marcas = list(marcas)
+        self.payloads = []
+        self.patches = 0
+        monkeypatch.setattr(lote_facturas, "enviar_factura", self.enviar_factura)
+        monkeypatch.setattr(lote_facturas, "marcar_reserva", self.marcar_reserva)
+
+    def enviar_factura(self, data, token=None):
+        self.payloads.append(data)
+        resultado = self.envios.pop(0)
+        if isinstance(resultado, Exception):
+            raise resultado
+        if resultado.status_code in (200, 201):
+            return resultado, [("success", "✅ Factura creada correctamente")]
+        return resultado, [("danger", f"❌ Error al crear factura: {resultado.text}")]
+
+    def marcar_reserva(self, idreserva, token=None):
+        self.patches += 1
+        return self.marcas.pop(0)
+
+
+def facturar(reserva=RESERVA, lote="lote"):
+    return lote_facturas._facturar(lote, str(reserva["id"]), reserva, 1, TOKEN)
+
+
+def test_payload_en_decimal_redondeado():
+    payload = payload_desde_reserva(dict(RESERVA, precio="1000.005"))
+
+    assert payload["detalles"][0]["valorunitario"] == 1000.01
+    assert payload["detalles"][0]["subtotal"] == 1000.01
+    assert payload["pagos"][0]["valor"] == 50000.0
+    assert payload["detalles"][0]["idproducto"] == 2
+
+
+@pytest.mark.parametrize("faltante", ["precio", "abono", "idproducto"])
+def test_payload_sin_montos_no_se_adivina(faltante):
+    reserva = dict(RESERVA, valor=100)
+    del reserva[faltante]
+
+    with pytest.raises(ValueError, match=faltante):
+        payload_desde_reserva(reserva)
+
+
+def test_reserva_sin_precio_no_se_envia(monkeypatch):
+    backend = Backend(monkeypatch)
+    reserva = {k: v for k, v in RESERVA.items() if k != "precio"}
+
+    resultado, _, _ = facturar(reserva)
+
+    assert resultado == lote_facturas.ERROR
+    assert backend.payloads == []
+    assert lote_facturas.estadisticas() == {}
+
+
+def test_facturada_y_luego_omitida(monkeypatch, respuesta):
+    backend = Backend(monkeypatch, envios=[respuesta(201, {"idfactura": 7})], marcas=[True])
+
+    assert facturar() == (lote_facturas.FACTURADA, "✅ Factura creada correctamente", "7")
+    resultado, _, idfactura = facturar(lote="otro")
+
+    assert (resultado, idfactura) == (lote_facturas.OMITIDA, "7")
+    assert len(backend.payloads) == 1
+
+
+def test_no_conecto_libera_la_reserva(monkeypatch, respuesta):
+    backend = Backend(monkeypatch, envios=[NO_CONECTO, respuesta(201, {"idfactura": 7})], marcas=[True])
+
+    assert facturar()[0] == lote_facturas.ERROR
+    assert facturar(lote="otro")[0] == lote_facturas.FACTURADA
+    assert len(backend.payloads) == 2
+
+
+@pytest.mark.parametrize("error", [CORTADA, requests.ReadTimeout("lectura")])
+def test_post_que_pudo_llegar_queda_incierta(monkeypatch, error):
+    backend = Backend(monkeypatch, envios=[error])
+
+    assert facturar()[0] == lote_facturas.INCIERTA
+    assert facturar(lote="otro")[0] == lote_facturas.INCIERTA
+    assert len(backend.payloads) == 1
+    assert lote_facturas.estadisticas() == {lote_facturas.INCIERTA: 1}
+
+
+@pytest.mark.parametrize("status, resultado", [
+    (502, lote_facturas.INCIERTA),
+    (504, lote_facturas.INCIERTA),
+    (500, lote_facturas.INCIERTA),
+    (503, lote_facturas.ERROR),
+    (422, lote_facturas.ERROR),
+])
+def test_codigos_http(monkeypatch, respuesta, status, resultado):
+    Backend(monkeypatch, envios=[respuesta(status, {"error": "x"})])
+
+    assert facturar()[0] == resultado
+    liberada = resultado == lote_facturas.ERROR
+    assert (lote_facturas.estadisticas() == {}) == liberada
+
+
+def test_error_inesperado_al_enviar_no_deja_la_reserva_en_curso(monkeypatch):
+    backend = Backend(monkeypatch, envios=[RuntimeError("cuerpo inesperado")])
+
+    resultado, mensaje, _ = facturar()
+
+    assert resultado == lote_facturas.ERROR and "Siigo" in mensaje
+    assert lote_facturas.estadisticas() == {lote_facturas.INCIERTA: 1}
+    assert facturar(lote="otro")[0] == lote_facturas.INCIERTA
+    assert len(backend.payloads) == 1
+
+
+def test_error_inesperado_antes_del_post_libera_la_reserva(monkeypatch):
+    backend = Backend(monkeypatch)
+
+    def payload_roto(reserva, idusuario=1):
+        raise KeyError("idcliente")
+
+    monkeypatch.setattr(lote_facturas, "payload_desde_reserva", payload_roto)
+    assert facturar()[0] == lote_facturas.ERROR
+    assert lote_facturas.estadisticas() == {}
+    assert backend.payloads == []
+
+
+def test_patch_fallido_solo_reintenta_el_patch(monkeypatch, respuesta):
+    backend = Backend(monkeypatch, envios=[respuesta(201, {"idfactura": 7})], marcas=[False, True])
+
+    assert facturar()[0] == lote_facturas.PARCIAL
+    assert facturar(lote="otro")[0] == lote_facturas.FACTURADA
+    assert len(backend.payloads) == 1 and backend.patches == 2
+
+
+def test_reserva_ya_facturada_se_omite(monkeypatch):
+    backend = Backend(monkeypatch)
+
+    assert facturar(dict(RESERVA, estado="FACTURADO"))[0] == lote_facturas.OMITIDA
+    assert backend.payloads == []
+
+
+def test_lote_completo_y_reporte(monkeypatch, respuesta):
+    Backend(monkeypatch, envios=[respuesta(201, {"idfactura": 7}), respuesta(422, {})], marcas=[True])
+    reservas = [RESERVA, dict(RESERVA, id=10)]
+    monkeypatch.setattr(config, "LOTE_FACTURAS_CONCURRENCIA", 1)
+    monkeypatch.setattr(lote_facturas, "threading", SimpleNamespace(Thread=HiloInmediato))
+
+    id_lote = lote_facturas.iniciar(reservas, token=TOKEN)
+    reporte = lote_facturas.reporte(id_lote, token=TOKEN)
+
+    assert reporte["terminado"] and not reporte["interrumpido"]
+    assert reporte["procesadas"] == 2
+    assert reporte["conteo"][lote_facturas.FACTURADA] == 1
+    assert reporte["conteo"][lote_facturas.ERROR] == 1
+    assert lote_facturas.reporte(id_lote, token="otro") is None
+
+
+def test_lote_sin_avance_se_reporta_interrumpido(monkeypatch):
+    monkeypatch.setattr(lote_facturas, "threading", SimpleNamespace(Thread=HiloQueNoCorre))
+    id_lote = lote_facturas.iniciar([RESERVA], token=TOKEN)
+
+    assert not lote_facturas.reporte(id_lote, token=TOKEN)["terminado"]
+
+    viejo = time.time() - config.COLA_FACTURAS_BLOQUEO - 1
+    lote_facturas._ejecutar("UPDATE lotes SET inicio = ?, actualizado = ? WHERE id = ?", (viejo, viejo, id_lote))
+    reporte = lote_facturas.reporte(id_lote, token=TOKEN)
+
+    assert reporte["terminado"] and reporte["interrumpido"]
+
+
+class HiloInmediato:
+    """Corre el lote en el hilo de la prueba (sus envíos siguen usando el pool)."""
+
+    def __init__(self, target, args=(), **kwargs):
+        self.target, self.args = target, args
+
+    def start(self):
+        self.target(*self.args)
+
+
+class HiloQueNoCorre(HiloInmediato):
+    def start(self):
+        pass
@@ -0,0 +1,108 @@
+import pytest
+
+from services import backend, paginacion
+
+FILAS = [{"idfactura": i} for i in range(1, 8)]
+
+
+@pytest.fixture(autouse=True)
+def sin_deteccion(monkeypatch):
+    monkeypatch.setattr(paginacion, "_soporta_paginacion", {})
+
+
+def backend_con(monkeypatch, respuesta, filas, limit=True, offset=True, obsoleto=False):
+    """backend.get que respeta (o ignora) limit/offset. Devuelve la lista de params recibidos."""
+    llamadas = []
+
+    def get(ruta, params=None, **kwargs):
+        params = dict(params or {})
+        llamadas.append(params)
+        inicio = params.get("offset", 0) if offset else 0
+        fin = inicio + params["limit"] if limit and "limit" in params else len(filas)
+        return respuesta(200, filas[inicio:fin], obsoleto=obsoleto)
+
+    monkeypatch.setattr(backend, "get", get)
+    return llamadas
+
+
+def pedir(app, pagina, por_pagina=2):
+    with app.test_request_context(f"/facturas?pagina={pagina}&por_pagina={por_pagina}"):
+        return paginacion.obtener("/facturas")[1]
+
+
+def ids(pagina):
+    return [f["idfactura"] for f in pagina.items]
+
+
+def test_backend_que_pagina(app, monkeypatch, respuesta):
+    llamadas = backend_con(monkeypatch, respuesta, FILAS)
+
+    pagina = pedir(app, 2)
+
+    assert ids(pagina) == [3, 4]
+    assert pagina.hay_siguiente
+    assert llamadas[0] == {"limit": 3, "offset": 2}
+    assert paginacion._soporta_paginacion["/facturas"] is True
+
+
+def test_ultima_pagina_sin_siguiente(app, monkeypatch, respuesta):
+    backend_con(monkeypatch, respuesta, FILAS)
+
+    pagina = pedir(app, 4)
+
+    assert ids(pagina) == [7]
+    assert not pagina.hay_siguiente
+
+
+def test_backend_que_ignora_limit(app, monkeypatch, respuesta):
+    backend_con(monkeypatch, respuesta, FILAS, limit=False, offset=False)
+
+    pagina = pedir(app, 1)
+
+    assert ids(pagina) == [1, 2]
+    assert pagina.total == 7
+    assert paginacion._soporta_paginacion["/facturas"] is False
+
+
+def test_coleccion_de_por_pagina_mas_una_sin_paginar(app, monkeypatch, respuesta):
+    # 3 filas con por_pagina=2: la página 1 no permite saber si el backend pagina
+    filas = FILAS[:3]
+    backend_con(monkeypatch, respuesta, filas, limit=False, offset=False)
+
+    assert ids(pedir(app, 1)) == [1, 2]
+    assert "/facturas" not in paginacion._soporta_paginacion
+
+    pagina = pedir(app, 2)
+    assert ids(pagina) == [3]
+    assert not pagina.hay_siguiente
+    assert paginacion._soporta_paginacion["/facturas"] is False
+
+
+def test_backend_que_respeta_limit_pero_ignora_offset(app, monkeypatch, respuesta):
+    llamadas = backend_con(monkeypatch, respuesta, FILAS, offset=False)
+
+    pagina = pedir(app, 3)
+
+    assert ids(pagina) == [5, 6]
+    assert pagina.hay_siguiente
+    # Página, primera fila (offset 0) y la colección completa
+    assert llamadas[-1] == {}
+    assert paginacion._soporta_paginacion["/facturas"] is False
+
+
+def test_respuesta_obsoleta_no_decide(app, monkeypatch, respuesta):
+    backend_con(monkeypatch, respuesta, FILAS, limit=False, offset=False, obsoleto=True)
+
+    pedir(app, 2)
+
+    assert "/facturas" not in paginacion._soporta_paginacion
+
+
+def test_configuracion_explicita(app, monkeypatch, respuesta):
+    monkeypatch.setattr(paginacion, "_soporta_paginacion", {"/facturas": False})
+    llamadas = backend_con(monkeypatch, respuesta, FILAS)
+
+    pagina = pedir(app, 2)
+
+    assert ids(pagina) == [3, 4]
+    assert llamadas == [{}]
@@ -0,0 +1,143 @@
+from datetime import date, timedelta
+
+import pytest
+
+import config
+from services import backend, reservas_dias
+from services.reservas_dias import CacheDias
+
+INICIO = date(2026, 3, 1)
+
+
+def dia(n):
+    return INICIO + timedelta(days=n)
+
+
+def reserva(idreserva, n):
+    return {"id": idreserva, "fecha": f"{dia(n).isoformat()}T10:00:00", "estado": "RESERVADO"}
+
+
+class Backend:
+    """cargar(desde, hasta) sobre una lista de reservas; recuerda los rangos pedidos."""
+
+    def __init__(self, respuesta, filas, obsoleto=False, filtra=True):
+        self.respuesta = respuesta
+        self.filas = filas
+        self.obsoleto = obsoleto
+        self.filtra = filtra
+        self.pedidos = []
+
+    def __call__(self, desde, hasta):
+        self.pedidos.append((desde, hasta))
+        filas = self.filas
+        if self.filtra:
+            filas = [f for f in filas if desde <= date.fromisoformat(f["fecha"][:10]) <= hasta]
+        return self.respuesta(200, filas, obsoleto=self.obsoleto)
+
+
+@pytest.fixture
+def cache():
+    return CacheDias("prueba_reservas_dias", max_por_alcance=30, max_entradas=100)
+
+
+def ids(filas):
+    return [f["id"] for f in filas]
+
+
+def test_arma_el_rango_con_dias_guardados(cache, respuesta):
+    cargar = Backend(respuesta, [reserva(1, 0), reserva(2, 1), reserva(3, 3)])
+
+    filas, obsoleto = cache.rango("a", dia(0), dia(1), cargar)
+    assert ids(filas) == [2, 1] and not obsoleto
+
+    # Solo falta el sub-rango contiguo dia(2)..dia(3)
+    filas, _ = cache.rango("a", dia(0), dia(3), cargar)
+    assert ids(filas) == [3, 2, 1]
+    assert cargar.pedidos == [(dia(0), dia(1)), (dia(2), dia(3))]
+
+    filas, _ = cache.rango("a", dia(1), dia(3), cargar)
+    assert ids(filas) == [3, 2]
+    assert len(cargar.pedidos) == 2
+
+
+def test_los_alcances_no_comparten_dias(cache, respuesta):
+    cargar = Backend(respuesta, [reserva(1, 0)])
+
+    cache.rango("a", dia(0), dia(0), cargar)
+    cache.rango("b", dia(0), dia(0), cargar)
+
+    assert len(cargar.pedidos) == 2
+
+
+def test_filas_fuera_del_rango_no_se_cachean(cache, respuesta):
+    cargar = Backend(respuesta, [reserva(1, 0), reserva(9, 10)], filtra=False)
+
+    filas, _ = cache.rango("a", dia(0), dia(1), cargar)
+
+    assert ids(filas) == [1, 9]
+    assert cache.estadisticas()["entradas"] == 0
+    assert cache.consultas_directas == 1
+
+
+def test_respaldo_obsoleto_no_se_guarda(cache, respuesta):
+    cargar = Backend(respuesta, [reserva(1, 0)], obsoleto=True)
+
+    filas, obsoleto = cache.rango("a", dia(0), dia(0), cargar)
+
+    assert ids(filas) == [1] and obsoleto
+    assert cache.estadisticas()["entradas"] == 0
+
+
+def test_un_rango_largo_no_desplaza_a_otros_alcances(respuesta):
+    cache = CacheDias("prueba_reservas_limite", max_por_alcance=5, max_entradas=100)
+    cargar = Backend(respuesta, [])
+
+    cache.rango("a", dia(0), dia(2), cargar)
+    cache.rango("b", dia(0), dia(20), cargar)
+
+    assert len(cache._vigentes("a", [dia(0), dia(1), dia(2)])) == 3
+    assert len(cache._vigentes("b", [dia(n) for n in range(21)])) == 5
+    assert cache.estadisticas()["entradas"] == 8
+
+
+def test_el_total_descarta_el_alcance_menos_usado(respuesta):
+    cache = CacheDias("prueba_reservas_total", max_por_alcance=5, max_entradas=6)
+    cargar = Backend(respuesta, [])
+
+    cache.rango("a", dia(0), dia(2), cargar)
+    cache.rango("b", dia(0), dia(2), cargar)
+    cache.rango("c", dia(0), dia(2), cargar)
+
+    assert cache._vigentes("a", [dia(0), dia(1), dia(2)]) == {}
+    assert len(cache._vigentes("c", [dia(0), dia(1), dia(2)])) == 3
+    assert cache.estadisticas()["entradas"] == 6
+
+
+def test_invalidar_reserva_y_agregar(cache, respuesta):
+    cargar = Backend(respuesta, [reserva(1, 0), reserva(2, 1)])
+    cache.rango("a", dia(0), dia(1), cargar)
+
+    cache.invalidar_reserva(1)
+    assert dia(0) not in cache._vigentes("a", [dia(0)])
+    assert dia(1) in cache._vigentes("a", [dia(1)])
+
+    assert cache.agregar(reserva(3, 1))
+    filas, _ = cache.rango("a", dia(1), dia(1), cargar)
+    assert ids(filas) == [3, 2]
+
+
+def test_consultar_rango_mayor_al_maximo_va_directo(monkeypatch, respuesta):
+    monkeypatch.setattr(config, "RESERVAS_MAX_RANGO", 3)
+    llamadas = []
+
+    def get(ruta, params=None, **kwargs):
+        llamadas.append(params)
+        return respuesta(200, [])
+
+    monkeypatch.setattr(backend, "get", get)
+    antes = reservas_dias.cache.consultas_directas
+
+    reservas_dias.consultar(dia(0).isoformat(), dia(5).isoformat())
+
+    assert llamadas == [{"fecha_inicio": dia(0).isoformat(), "fecha_fin": dia(5).isoformat()}]
+    assert reservas_dias.cache.consultas_directas == antes + 1
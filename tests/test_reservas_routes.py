@@ -0,0 +1,25 @@
+from services import backend, catalogos, kpis, reservas_dias
+from services.indice_clientes import indice
+
+TOKEN = "token-de-prueba"
+
+
+def test_reserva_creada_con_idcliente_del_formulario(app, monkeypatch, respuesta):
+    # El formulario manda el id como texto; el índice lo conoce como int del backend
+    indice.para(TOKEN).construir([{"idcliente": 3, "identificacion": "123", "nombrecompleto": "Ana Pérez"}])
+    monkeypatch.setattr(backend, "post", lambda ruta, json=None, **kwargs: respuesta(201, {"id": 9}))
+    monkeypatch.setattr(catalogos, "obtener", lambda nombre, **kwargs: [])
+    monkeypatch.setattr(kpis.reservas, "registrar", lambda *args, **kwargs: None)
+    agregadas = []
+    monkeypatch.setattr(reservas_dias, "agregar", agregadas.append)
+
+    cliente = app.test_client()
+    with cliente.session_transaction() as sesion:
+        sesion["token"] = TOKEN
+    r = cliente.post("/reservas/crear", headers={"X-Fragmento": "json"}, data={
+        "idcliente": "3", "identificacion": "123", "idproducto": "2", "valor": "50000", "idmedio": "1",
+    })
+
+    assert r.status_code == 201
+    assert r.get_json()["fila"]["cliente"] == "Ana Pérez"
+    assert agregadas[0]["cliente"] == "Ana Pérez"